@@ -0,0 +1,319 @@
+import hashlib
+import json
+import os
+import random
+import threading
+import time
+import uuid
+from datetime import datetime
+
+from metricas_remitos import obtener_metricas
+from publicacion_github import PublicadorCommits, sha_blob
+
+# Bandeja de salida persistente para los archivos que se suben a GitHub.
+# Cada archivo pendiente queda en disco hasta que se sube; si se vuelve a
+# encolar el mismo path antes de subirlo, sólo se sube la última versión.
+
+CARPETA_BANDEJA = os.getenv('REMITOS_BANDEJA', '.bandeja_salida')
+
+# 'commit': todos los pendientes van en un único commit (Git Data API)
+# 'archivos': un commit por archivo con la API de contenidos
+MODO_PUBLICACION = os.getenv('REMITOS_PUBLICACION', 'commit')
+
+
+class BandejaSalida:
+    def __init__(self, obtener_repo, carpeta=CARPETA_BANDEJA, espera_inicial=2.0, espera_maxima=300.0, modo=MODO_PUBLICACION,
+                 reconectar=None):
+        if modo not in ('commit', 'archivos'):
+            raise ValueError(f"Modo de publicación desconocido: {modo}")
+        self._obtener_repo = obtener_repo
+        self._reconectar = reconectar
+        self._repo = None
+        self._publicador = None
+        self.modo = modo
+        self.carpeta = carpeta
+        self.espera_inicial = espera_inicial
+        self.espera_maxima = espera_maxima
+        self.ultima_sincronizacion = None
+        self.ultimo_error = None
+        self._lock = threading.Lock()
+        self._evento = threading.Event()
+        self._hilo = None
+        self._suscriptores = []
+        self._metricas = obtener_metricas()
+        os.makedirs(self.carpeta, exist_ok=True)
+
+    # Función para recibir los paths cada vez que se confirma una subida (se registra una sola vez)
+    def suscribir(self, funcion):
+        if funcion not in self._suscriptores:
+            self._suscriptores.append(funcion)
+
+    def _ruta(self, nombre):
+        return os.path.join(self.carpeta, nombre)
+
+    def _escribir_atomico(self, ruta, contenido):
+        temporal = f"{ruta}.{uuid.uuid4().hex}.tmp"
+        with open(temporal, 'wb') as file:
+            file.write(contenido)
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(temporal, ruta)
+
+    def _leer_meta(self, clave):
+        try:
+            with open(self._ruta(f"{clave}.json"), 'r', encoding='utf-8') as file:
+                return json.load(file)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+
+    def _guardar_meta(self, meta):
+        datos = json.dumps(meta, ensure_ascii=False).encode('utf-8')
+        self._escribir_atomico(self._ruta(f"{meta['clave']}.json"), datos)
+
+    # Función para encolar un archivo; reemplaza cualquier versión pendiente del mismo path
+    def agregar(self, nombre_archivo, contenido, mensaje=None):
+        self.agregar_varios([(nombre_archivo, contenido)], mensaje or f"Actualiza {nombre_archivo}")
+
+    # Función para encolar varios archivos juntos (el hilo los ve siempre como grupo completo).
+    # Los anexos se agregan al final del archivo remoto en vez de reemplazarlo.
+    def agregar_varios(self, archivos, mensaje, anexos=()):
+        with self._lock:
+            entradas = [(nombre, contenido, False) for nombre, contenido in archivos]
+            entradas += [(nombre, contenido, True) for nombre, contenido in anexos]
+            for nombre_archivo, contenido, anexar in entradas:
+                if isinstance(contenido, str):
+                    contenido = contenido.encode('utf-8')
+                clave = hashlib.sha1(nombre_archivo.encode('utf-8')).hexdigest()
+                version = uuid.uuid4().hex
+
+                anterior = self._leer_meta(clave)
+                if anterior is not None and anexar:
+                    # Se acumula sobre lo que ya estaba pendiente para ese path
+                    with open(self._ruta(f"{clave}-{anterior['version']}.bin"), 'rb') as file:
+                        contenido = file.read() + contenido
+                    anexar = anterior.get('anexar', False)
+
+                # Primero el contenido y después la metadata: el reemplazo del .json es el que confirma la versión
+                self._escribir_atomico(self._ruta(f"{clave}-{version}.bin"), contenido)
+                self._guardar_meta({
+                    'clave': clave,
+                    'path': nombre_archivo,
+                    'mensaje': mensaje,
+                    'version': version,
+                    'anexar': anexar,
+                    'encolado': anterior['encolado'] if anterior is not None and anexar else time.time(),
+                    'intentos': 0,
+                    'proximo_intento': 0,
+                    'error': None,
+                })
+                if anterior is not None:
+                    self._borrar_contenido(clave, anterior['version'])
+
+        self._evento.set()
+
+    def _borrar_contenido(self, clave, version):
+        try:
+            os.remove(self._ruta(f"{clave}-{version}.bin"))
+        except FileNotFoundError:
+            pass
+
+    def _pendientes(self):
+        metas = []
+        for nombre in os.listdir(self.carpeta):
+            if nombre.endswith('.json'):
+                meta = self._leer_meta(nombre[:-5])
+                if meta is not None:
+                    metas.append(meta)
+        return sorted(metas, key=lambda meta: meta['encolado'])
+
+    # Función para obtener el contenido pendiente de un path (None si no hay nada encolado);
+    # para los anexos es sólo lo que falta agregar al archivo remoto
+    def pendiente(self, nombre_archivo):
+        clave = hashlib.sha1(nombre_archivo.encode('utf-8')).hexdigest()
+        with self._lock:
+            meta = self._leer_meta(clave)
+            if meta is None:
+                return None
+            with open(self._ruta(f"{clave}-{meta['version']}.bin"), 'rb') as file:
+                return file.read()
+
+    # Función para listar los paths que todavía no se subieron
+    def paths_pendientes(self):
+        return [meta['path'] for meta in self._pendientes()]
+
+    def cantidad_pendiente(self):
+        return len(self._pendientes())
+
+    def estado(self):
+        pendientes = self._pendientes()
+        return {
+            'pendientes': len(pendientes),
+            'ultima_sincronizacion': self.ultima_sincronizacion,
+            'ultimo_error': self.ultimo_error,
+            'reintentando': sum(1 for meta in pendientes if meta['intentos'] > 0),
+        }
+
+    def _conectar(self):
+        if self._repo is None:
+            self._repo = self._obtener_repo()
+            self._publicador = PublicadorCommits(self._repo)
+        return self._repo
+
+    def _subir(self, meta, contenido):
+        from github import UnknownObjectException
+
+        repo = self._conectar()
+        try:
+            existente = repo.get_contents(meta['path'])
+        except UnknownObjectException:
+            repo.create_file(meta['path'], meta['mensaje'], contenido)
+        else:
+            if meta.get('anexar'):
+                # Un anexo que ya está al final del archivo se publicó y no llegó a confirmarse
+                if existente.decoded_content.endswith(contenido):
+                    return
+                contenido = existente.decoded_content + contenido
+            # El mismo contenido que ya está publicado no se vuelve a subir (sería un commit vacío)
+            if existente.sha == sha_blob(contenido):
+                self._metricas.contar('remitos_subidas_omitidas_total')
+                return
+            repo.update_file(existente.path, meta['mensaje'], contenido, existente.sha)
+
+    def _publicar(self, metas, contenidos):
+        self._conectar()
+        mensajes = list(dict.fromkeys(meta['mensaje'] for meta in metas))
+        mensaje = mensajes[0] if len(mensajes) == 1 else f"Publica {len(metas)} archivos\n\n" + "\n".join(mensajes)
+        archivos = {meta['path']: contenidos[meta['clave']] for meta in metas if not meta.get('anexar')}
+        anexos = {meta['path']: contenidos[meta['clave']] for meta in metas if meta.get('anexar')}
+        omitidos = self._publicador.omitidos
+        self._publicador.publicar(archivos, mensaje, anexos=anexos)
+        if self._publicador.omitidos > omitidos:
+            self._metricas.contar('remitos_subidas_omitidas_total', self._publicador.omitidos - omitidos)
+
+    def _manejar_error(self, metas, error):
+        from github import BadCredentialsException, GithubException
+
+        if not isinstance(error, GithubException) or isinstance(error, BadCredentialsException):
+            # Error de red o de token: se reconecta (vuelve a leer el token) para el próximo intento
+            self._repo = None
+            self._publicador = None
+            if self._reconectar:
+                self._reconectar()
+        for meta in metas:
+            self._registrar_falla(meta, error)
+
+    def _confirmar(self, metas, contenidos):
+        with self._lock:
+            for meta in metas:
+                actual = self._leer_meta(meta['clave'])
+                if actual is None:
+                    continue
+                if actual['version'] == meta['version']:
+                    os.remove(self._ruta(f"{meta['clave']}.json"))
+                    self._borrar_contenido(meta['clave'], meta['version'])
+                elif meta.get('anexar') and actual.get('anexar'):
+                    # Llegaron más líneas mientras se subía: queda pendiente sólo lo que no se publicó
+                    with open(self._ruta(f"{actual['clave']}-{actual['version']}.bin"), 'rb') as file:
+                        resto = file.read()[len(contenidos[meta['clave']]):]
+                    version = uuid.uuid4().hex
+                    self._escribir_atomico(self._ruta(f"{actual['clave']}-{version}.bin"), resto)
+                    anterior = actual['version']
+                    actual['version'] = version
+                    self._guardar_meta(actual)
+                    self._borrar_contenido(actual['clave'], anterior)
+        self.ultima_sincronizacion = datetime.now()
+        self.ultimo_error = None
+        for funcion in self._suscriptores:
+            try:
+                funcion([meta['path'] for meta in metas])
+            except Exception as e:
+                self.ultimo_error = str(e)
+
+    # Función para subir los pendientes cuyo próximo intento ya venció; devuelve cuántos se subieron
+    def procesar_pendientes(self):
+        # La lista y los contenidos se leen bajo el lock para no ver grupos a medio encolar
+        with self._lock:
+            ahora = time.time()
+            pendientes = self._pendientes()
+            metas = [meta for meta in pendientes if meta['proximo_intento'] <= ahora]
+            if self.modo == 'commit' and metas:
+                # Se publica todo lo pendiente junto, para que nunca llegue un grupo nuevo sin uno anterior
+                metas = pendientes
+            contenidos = {}
+            for meta in metas:
+                with open(self._ruta(f"{meta['clave']}-{meta['version']}.bin"), 'rb') as file:
+                    contenidos[meta['clave']] = file.read()
+        if not metas:
+            return 0
+
+        if self.modo == 'commit':
+            try:
+                with self._metricas.etapa('subida', archivos=len(metas)):
+                    self._publicar(metas, contenidos)
+            except Exception as e:
+                self._manejar_error(metas, e)
+                return 0
+            self._confirmar(metas, contenidos)
+            return len(metas)
+
+        subidos = 0
+        for meta in metas:
+            try:
+                with self._metricas.etapa('subida', archivos=1):
+                    self._subir(meta, contenidos[meta['clave']])
+            except Exception as e:
+                self._manejar_error([meta], e)
+                continue
+            self._confirmar([meta], contenidos)
+            subidos += 1
+        return subidos
+
+    def _registrar_falla(self, meta, error):
+        espera = min(self.espera_maxima, self.espera_inicial * 2 ** meta['intentos'])
+        espera *= random.uniform(0.8, 1.2)
+        self.ultimo_error = f"{meta['path']}: {error}"
+        with self._lock:
+            actual = self._leer_meta(meta['clave'])
+            if actual is None or actual['version'] != meta['version']:
+                return
+            actual['intentos'] += 1
+            actual['proximo_intento'] = time.time() + espera
+            actual['error'] = str(error)
+            self._guardar_meta(actual)
+
+    def _proxima_espera(self):
+        proximos = [meta['proximo_intento'] for meta in self._pendientes()]
+        if not proximos:
+            return 60.0
+        return max(0.0, min(proximos) - time.time())
+
+    def _ciclo(self):
+        while True:
+            self._evento.clear()
+            try:
+                self.procesar_pendientes()
+            except Exception as e:
+                self.ultimo_error = str(e)
+            self._evento.wait(timeout=max(0.5, self._proxima_espera()))
+
+    # Función para arrancar el hilo que sube los pendientes en segundo plano
+    def iniciar(self):
+        if self._hilo is None or not self._hilo.is_alive():
+            self._hilo = threading.Thread(target=self._ciclo, name="bandeja-salida", daemon=True)
+            self._hilo.start()
+        self._evento.set()
+        return self
+
+
+# Una sola bandeja por proceso, compartida por todas las sesiones de Streamlit
+_bandeja = None
+_bandeja_lock = threading.Lock()
+
+
+# Función para obtener (y arrancar la primera vez) la bandeja de salida del proceso
+def obtener_bandeja(obtener_repo, carpeta=CARPETA_BANDEJA, reconectar=None):
+    global _bandeja
+    with _bandeja_lock:
+        if _bandeja is None:
+            _bandeja = BandejaSalida(obtener_repo, carpeta=carpeta, reconectar=reconectar).iniciar()
+        return _bandeja
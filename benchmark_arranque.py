@@ -0,0 +1,141 @@
+import argparse
+import ast
+import json
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+
+# Benchmark del arranque de la app: cuánto tardan las importaciones de remito.py
+# y cuánto tarda la primera ejecución completa del script (lo que ve el usuario
+# al abrir la página) y una re-ejecución. Cada medición corre en un proceso
+# nuevo, sin nada importado de antes, contra el servidor falso de GitHub.
+# benchmark_remitos lo corre como una suite más, junto con los del PDF, el libro,
+# la numeración y el botón "Generar Remito".
+
+CARPETA = os.path.dirname(os.path.abspath(__file__))
+SCRIPT_APP = os.path.join(CARPETA, 'remito.py')
+LOGO = os.path.join(CARPETA, 'logo motoya curvas-1.jpg')
+
+# Presupuesto por defecto en milisegundos (mediana de las repeticiones)
+PRESUPUESTO = {
+    'importacion_app_ms': 300,
+    'primer_render_ms': 3000,
+    're_render_ms': 500,
+}
+
+_MEDIR_IMPORTACION = """
+import json, sys, time
+inicio = time.perf_counter()
+import streamlit
+streamlit_ms = (time.perf_counter() - inicio) * 1000
+inicio = time.perf_counter()
+for modulo in sys.argv[1:]:
+    __import__(modulo)
+app_ms = (time.perf_counter() - inicio) * 1000
+pesados = [m for m in ('pandas', 'pyarrow', 'github', 'reportlab.pdfgen.canvas', 'requests') if m in sys.modules]
+print(json.dumps({'streamlit_ms': streamlit_ms, 'importacion_app_ms': app_ms, 'importados_al_arrancar': pesados}))
+"""
+
+_MEDIR_RENDER = """
+import json, os, sys, time
+sys.path.insert(0, sys.argv[2])
+from github_falso import ServidorGithubFalso
+from streamlit.testing.v1 import AppTest
+servidor = ServidorGithubFalso().iniciar()
+os.environ['GITHUB_API_URL'] = servidor.url
+os.environ.setdefault('PAT_GITHUB', 'benchmark')
+app = AppTest.from_file(sys.argv[1], default_timeout=120)
+inicio = time.perf_counter()
+app.run()
+primer_ms = (time.perf_counter() - inicio) * 1000
+llamadas = len(servidor.llamadas)
+inicio = time.perf_counter()
+app.run()
+re_ms = (time.perf_counter() - inicio) * 1000
+print(json.dumps({'primer_render_ms': primer_ms, 're_render_ms': re_ms, 'llamadas_re_render': len(servidor.llamadas) - llamadas,
+                  'errores': [str(e.value) for e in app.exception]}))
+"""
+
+
+# Función para leer los módulos propios que importa remito.py (todo menos streamlit)
+def modulos_app(script=SCRIPT_APP):
+    with open(script, 'r', encoding='utf-8') as file:
+        arbol = ast.parse(file.read())
+    modulos = []
+    for nodo in arbol.body:
+        if isinstance(nodo, ast.Import):
+            modulos += [alias.name for alias in nodo.names]
+        elif isinstance(nodo, ast.ImportFrom) and nodo.module:
+            modulos.append(nodo.module)
+    return [modulo for modulo in dict.fromkeys(modulos) if modulo.split('.')[0] != 'streamlit']
+
+
+# Función para correr una medición en un proceso nuevo; devuelve el JSON de la última línea que imprime
+def ejecutar_medicion(codigo, argumentos, carpeta, entorno):
+    resultado = subprocess.run([sys.executable, '-c', codigo] + argumentos, cwd=carpeta, env=entorno,
+                               capture_output=True, text=True, timeout=600)
+    if resultado.returncode != 0:
+        raise RuntimeError(f"La medición falló:\n{resultado.stderr[-2000:]}")
+    return json.loads(resultado.stdout.strip().splitlines()[-1])
+
+
+# Función para medir el arranque; devuelve la mediana de cada métrica y las mediciones sueltas
+def medir(repeticiones=3):
+    mediciones = []
+    for _ in range(repeticiones):
+        # Cada repetición arranca en una carpeta vacía, como un contenedor recién creado
+        carpeta = tempfile.mkdtemp(prefix='arranque_')
+        try:
+            shutil.copy(LOGO, carpeta)
+            entorno = dict(os.environ, PYTHONPATH=CARPETA, PYTHONDONTWRITEBYTECODE='1')
+            medicion = ejecutar_medicion(_MEDIR_IMPORTACION, modulos_app(), carpeta, entorno)
+            medicion.update(ejecutar_medicion(_MEDIR_RENDER, [SCRIPT_APP, CARPETA], carpeta, entorno))
+            mediciones.append(medicion)
+        finally:
+            shutil.rmtree(carpeta, ignore_errors=True)
+
+    numericas = [clave for clave, valor in mediciones[0].items() if isinstance(valor, (int, float))]
+    resumen = {clave: round(statistics.median(medicion[clave] for medicion in mediciones), 1) for clave in numericas}
+    resumen['importados_al_arrancar'] = mediciones[-1]['importados_al_arrancar']
+    resumen['errores'] = mediciones[-1]['errores']
+    return {'resumen': resumen, 'mediciones': mediciones}
+
+
+# Función para comparar el resumen con el presupuesto; devuelve la lista de métricas que se pasaron
+def excedidos(resumen, presupuesto=PRESUPUESTO):
+    return [f"{clave}: {resumen[clave]} ms (presupuesto {limite} ms)" for clave, limite in presupuesto.items()
+            if clave in resumen and resumen[clave] > limite]
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Mide el tiempo de arranque de la app y lo compara con un presupuesto.")
+    parser.add_argument('--repeticiones', type=int, default=3)
+    parser.add_argument('--presupuesto', default=None, help="Archivo JSON con los límites en ms (por defecto, los del script)")
+    parser.add_argument('--salida', default=None, help="Archivo JSON donde guardar el resultado")
+    args = parser.parse_args()
+
+    presupuesto = PRESUPUESTO
+    if args.presupuesto:
+        with open(args.presupuesto, 'r', encoding='utf-8') as file:
+            presupuesto = json.load(file)
+
+    resultado = medir(args.repeticiones)
+    resultado['presupuesto'] = presupuesto
+    if args.salida:
+        with open(args.salida, 'w', encoding='utf-8') as file:
+            json.dump(resultado, file, indent=2, ensure_ascii=False)
+
+    resumen = resultado['resumen']
+    print(f"streamlit: {resumen['streamlit_ms']} ms")
+    print(f"Módulos de la app: {resumen['importacion_app_ms']} ms (cargados al arrancar: {', '.join(resumen['importados_al_arrancar']) or 'ninguno pesado'})")
+    print(f"Primera pantalla: {resumen['primer_render_ms']} ms")
+    print(f"Re-ejecución: {resumen['re_render_ms']} ms, {resumen['llamadas_re_render']} llamadas a la API")
+    if resumen['errores']:
+        print(f"Errores en la app: {resumen['errores']}")
+    fuera = excedidos(resumen, presupuesto)
+    for linea in fuera:
+        print(f"Fuera de presupuesto: {linea}")
+    sys.exit(1 if fuera or resumen['errores'] else 0)
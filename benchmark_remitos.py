@@ -0,0 +1,331 @@
+import argparse
+import json
+import os
+import platform
+import random
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+from datetime import date, datetime, timedelta
+
+from benchmark_arranque import CARPETA, LOGO, SCRIPT_APP, ejecutar_medicion
+
+# Benchmarks de la app con datos de prueba realistas: el PDF de remitos de 1 a
+# 20 direcciones con todas las combinaciones de lluvia, exclusividad y bultos;
+# el libro (Parquet y SQLite) con un mes de 10.000 remitos; la reserva de números
+# de remito; el click en "Generar Remito" de punta a punta contra el servidor
+# falso de GitHub (con la demora por llamada que se pida) y el arranque de la
+# app (benchmark_arranque). El resultado va a un JSON con una métrica por clave
+# ("suite.metrica") y se compara con una base guardada: una métrica que empeora
+# más que el umbral es una regresión y el script termina con error.
+
+SUITES = ('pdf', 'libro', 'numeracion', 'click', 'arranque')
+
+ARCHIVO_BASE = os.path.join(CARPETA, 'benchmark_base.json')
+
+# Cuánto puede empeorar una métrica respecto de la base antes de contarla como regresión (0.25 = 25%)
+UMBRAL = 0.25
+
+# Diferencias de tiempo menores a esto (ms) se consideran ruido aunque superen el umbral
+MINIMO_MS = 1.0
+
+TAMANOS_DETALLE = (1, 5, 10, 20)
+COMBINACIONES = [(lluvia, exclusividad, bultos) for lluvia in (False, True) for exclusividad in (False, True) for bultos in (0, 3)]
+
+
+# Función para armar remitos de prueba de un mes: clientes repetidos, de 1 a 20 direcciones y todas las combinaciones de recargos
+def remitos_prueba(cantidad, mes='2025-03', numero_inicial=1, direcciones=None, semilla=0):
+    from modelo_remito import ItemRemito, Remito
+
+    azar = random.Random(semilla)
+    anio, numero_mes = (int(parte) for parte in mes.split('-'))
+    inicio = date(anio, numero_mes, 1)
+    dias = (date(anio + numero_mes // 12, numero_mes % 12 + 1, 1) - inicio).days
+    clientes = [f"Cliente {indice:03d}" for indice in range(300)]
+    remitos = []
+    for indice in range(cantidad):
+        lluvia, exclusividad, bultos = COMBINACIONES[indice % len(COMBINACIONES)]
+        cliente = azar.choice(clientes)
+        items = tuple(ItemRemito(f"Av. Corrientes {azar.randint(100, 9999)}, CABA", azar.randint(500, 5000) * 100)
+                      for _ in range(direcciones or azar.randint(1, 20)))
+        remitos.append(Remito(numero_inicial + indice, inicio + timedelta(days=azar.randrange(dias)), cliente,
+                              f"Domicilio de {cliente}", f"Sector {azar.randint(1, 5)}", f"Solicitante {azar.randint(1, 40)}",
+                              f"Moto {azar.randint(1, 12)}", items, lluvia, exclusividad, bultos))
+    return remitos
+
+
+# Función para resumir una lista de tiempos: mediana y percentil 95
+def estadisticas(prefijo, tiempos):
+    p95 = statistics.quantiles(tiempos, n=20, method='inclusive')[18] if len(tiempos) > 1 else tiempos[0]
+    return {f"{prefijo}_ms": round(statistics.median(tiempos), 3), f"{prefijo}_p95_ms": round(p95, 3)}
+
+
+def _cronometrar(funcion, *argumentos):
+    inicio = time.perf_counter()
+    resultado = funcion(*argumentos)
+    return (time.perf_counter() - inicio) * 1000, resultado
+
+
+# Función para medir el PDF: generación por cantidad de direcciones, registro y PDF desde la caché
+def medir_pdf(carpeta, repeticiones=3):
+    from cache_descargas import CacheDescargas
+    from pdf_remito import generar_pdf
+    from plantilla_pdf import limpiar_cache
+    from registro_remito import pdf_registro, serializar_registro
+
+    metricas = {}
+    # El primer PDF del proceso prepara el logo
+    limpiar_cache()
+    metricas['primer_pdf_ms'] = round(_cronometrar(generar_pdf, remitos_prueba(1)[0], LOGO)[0], 3)
+
+    for direcciones in TAMANOS_DETALLE:
+        remitos = remitos_prueba(len(COMBINACIONES), direcciones=direcciones)
+        tiempos = []
+        for _ in range(repeticiones):
+            for remito in remitos:
+                milisegundos, pdf_bytes = _cronometrar(generar_pdf, remito, LOGO)
+                tiempos.append(milisegundos)
+        metricas.update(estadisticas(f"pdf_{direcciones}_items", tiempos))
+        metricas[f"pdf_{direcciones}_items_bytes"] = len(pdf_bytes)
+
+    remitos = remitos_prueba(50)
+    tiempos = [_cronometrar(serializar_registro, remito)[0] for remito in remitos]
+    metricas.update(estadisticas('registro', tiempos))
+    registros = [serializar_registro(remito) for remito in remitos]
+    metricas['registro_bytes'] = round(statistics.mean(len(registro) for registro in registros))
+
+    cache = CacheDescargas(None, 'benchmark/remitos', carpeta=os.path.join(carpeta, 'cache'))
+    metricas.update(estadisticas('pdf_desde_registro', [_cronometrar(pdf_registro, registro, LOGO, cache)[0] for registro in registros]))
+    metricas.update(estadisticas('pdf_cache', [_cronometrar(pdf_registro, registro, LOGO, cache)[0] for registro in registros]))
+    return metricas
+
+
+# Función para medir el libro (Parquet y SQLite): carga de un mes entero, altas de a un remito, lectura y CSV del mes
+def medir_libro(carpeta, remitos_mes=10000, altas=200, repeticiones=3):
+    from libro_columnar import LibroRemitos
+    from libro_sql import obtener_libro
+
+    mes = '2025-03'
+    registros = [remito.registro_libro() for remito in remitos_prueba(remitos_mes, mes)]
+    nuevos = [remito.registro_libro() for remito in remitos_prueba(altas, mes, numero_inicial=remitos_mes + 1, semilla=1)]
+    desde, hasta = date(2025, 3, 1), date(2025, 3, 31)
+
+    metricas = {}
+    for nombre, libro in (('parquet', LibroRemitos(os.path.join(carpeta, 'libro'))),
+                          ('sqlite', obtener_libro(f"sqlite:///{os.path.join(carpeta, 'libro.db')}"))):
+        metricas[f"{nombre}_carga_mes_ms"] = round(_cronometrar(libro.agregar, registros)[0], 3)
+        # Como en la app: un remito por llamada, con el mes ya cargado
+        metricas.update(estadisticas(f"{nombre}_alta", [_cronometrar(libro.agregar, [registro])[0] for registro in nuevos]))
+        metricas.update(estadisticas(f"{nombre}_lectura_mes", [_cronometrar(libro.leer, desde, hasta)[0] for _ in range(repeticiones)]))
+        metricas.update(estadisticas(f"{nombre}_lectura_items_mes",
+                                     [_cronometrar(libro.leer, desde, hasta, 'items')[0] for _ in range(repeticiones)]))
+        metricas.update(estadisticas(f"{nombre}_csv_mes", [_cronometrar(libro.exportar_csv, mes)[0] for _ in range(repeticiones)]))
+    return metricas
+
+
+# Función para medir la reserva de números: de a uno (una operación del almacén por número) y por bloque
+def medir_numeracion(carpeta, latencia=0.0, reservas=10):
+    from conexion_github import RecursosGithub
+    from github_falso import ServidorGithubFalso
+    from libro_sql import obtener_libro
+    from numeracion_remitos import AlmacenGithub, AlmacenLocal, AlmacenSQL, Numerador
+
+    metricas = {}
+    with ServidorGithubFalso(latencia=latencia) as servidor:
+        recursos = RecursosGithub(lambda: 'benchmark', f"{servidor.owner}/{servidor.repo}", servidor.url)
+        almacenes = {
+            'local': lambda: AlmacenLocal(os.path.join(carpeta, 'numeracion.json')),
+            # La tabla de la numeración la crea el libro, como en la app
+            'sqlite': lambda: AlmacenSQL(obtener_libro(f"sqlite:///{os.path.join(carpeta, 'numeracion.db')}").pool),
+            'github': lambda: AlmacenGithub(recursos.repo),
+        }
+        for nombre, almacen in almacenes.items():
+            numerador = Numerador(almacen(), tamano_bloque=1)
+            metricas.update(estadisticas(f"{nombre}_reserva", [_cronometrar(numerador.siguiente)[0] for _ in range(reservas)]))
+            numerador = Numerador(almacen())
+            metricas.update(estadisticas(f"{nombre}_siguiente", [_cronometrar(numerador.siguiente)[0] for _ in range(reservas)]))
+            numerador.liberar()
+    return metricas
+
+
+_MEDIR_CLICK = """
+import json, os, sys, time
+sys.path.insert(0, sys.argv[2])
+from github_falso import ServidorGithubFalso
+from streamlit.testing.v1 import AppTest
+clics, latencia, direcciones = int(sys.argv[3]), float(sys.argv[4]), int(sys.argv[5])
+servidor = ServidorGithubFalso(latencia=latencia).iniciar()
+os.environ['GITHUB_API_URL'] = servidor.url
+os.environ.setdefault('PAT_GITHUB', 'benchmark')
+
+def lineas_indice():
+    return sum(contenido.count(b'\\n') for path, contenido in servidor.archivos.items() if path.startswith('indice_remitos/'))
+
+app = AppTest.from_file(sys.argv[1], default_timeout=120).run()
+for indice, valor in enumerate(['Cliente Benchmark', 'Domicilio', 'Sector', 'Solicitante', 'Moto']):
+    app.text_input[indice].input(valor)
+next(numero for numero in app.number_input if numero.label == 'Cantidad de filas').set_value(direcciones)
+app.run()
+for indice in range(direcciones):
+    app.text_input(key=f'direccion_{indice}').input(f'Av. Corrientes {1000 + indice}')
+    app.text_input(key=f'monto_{indice}').input('1500')
+app.checkbox[0].check()
+app.run()
+
+clic_ms, publicacion_ms, llamadas = [], [], []
+for numero in range(clics):
+    antes = len(servidor.llamadas)
+    inicio = time.perf_counter()
+    next(boton for boton in app.button if boton.label == 'Generar Remito').click().run()
+    clic_ms.append((time.perf_counter() - inicio) * 1000)
+    # El remito está publicado cuando su línea llega al índice del mes
+    limite = time.monotonic() + 60
+    while lineas_indice() < numero + 1 and time.monotonic() < limite:
+        time.sleep(0.005)
+    publicacion_ms.append((time.perf_counter() - inicio) * 1000)
+    llamadas.append(len(servidor.llamadas) - antes)
+print(json.dumps({'clic_ms': clic_ms, 'publicacion_ms': publicacion_ms, 'llamadas': llamadas,
+                  'publicados': lineas_indice(), 'errores': [str(e.value) for e in app.exception]}))
+"""
+
+
+# Función para medir el click en "Generar Remito" de punta a punta (numeración, registro, libro y bandeja)
+# y el tiempo hasta que el remito queda publicado, en un proceso nuevo contra el servidor falso
+def medir_click(carpeta, latencia=0.0, clics=5, direcciones=10):
+    carpeta_app = os.path.join(carpeta, 'app')
+    os.makedirs(carpeta_app)
+    shutil.copy(LOGO, carpeta_app)
+    entorno = dict(os.environ, PYTHONPATH=CARPETA, PYTHONDONTWRITEBYTECODE='1', REMITOS_SQL='')
+    medicion = ejecutar_medicion(_MEDIR_CLICK, [SCRIPT_APP, CARPETA, str(clics), str(latencia), str(direcciones)], carpeta_app, entorno)
+    if medicion['errores'] or medicion['publicados'] < clics:
+        raise RuntimeError(f"El click falló: {medicion['errores'] or 'no se publicaron todos los remitos'}")
+
+    metricas = {}
+    # El primer click paga la primera reserva de números y la carga de reportlab y del libro
+    metricas['primer_clic_ms'] = round(medicion['clic_ms'][0], 3)
+    metricas.update(estadisticas('clic', medicion['clic_ms'][1:] or medicion['clic_ms']))
+    metricas.update(estadisticas('publicacion', medicion['publicacion_ms']))
+    metricas['llamadas_por_remito'] = statistics.median(medicion['llamadas'])
+    return metricas
+
+
+# Función para medir el arranque de la app con benchmark_arranque
+def medir_arranque(repeticiones=3):
+    from benchmark_arranque import medir
+
+    resumen = medir(repeticiones)['resumen']
+    return {clave: valor for clave, valor in resumen.items() if isinstance(valor, (int, float))}
+
+
+# Función para correr las suites pedidas; devuelve el resultado con las métricas y los parámetros usados
+def correr(suites=SUITES, repeticiones=3, remitos_mes=10000, latencia_ms=0.0, clics=5):
+    parametros = {'repeticiones': repeticiones, 'remitos_mes': remitos_mes, 'latencia_ms': latencia_ms, 'clics': clics}
+    mediciones = {
+        'pdf': lambda carpeta: medir_pdf(carpeta, repeticiones),
+        'libro': lambda carpeta: medir_libro(carpeta, remitos_mes, repeticiones=repeticiones),
+        'numeracion': lambda carpeta: medir_numeracion(carpeta, latencia_ms / 1000),
+        'click': lambda carpeta: medir_click(carpeta, latencia_ms / 1000, clics),
+        'arranque': lambda carpeta: medir_arranque(repeticiones),
+    }
+
+    metricas = {}
+    segundos = {}
+    directorio = os.getcwd()
+    for suite in suites:
+        # Cada suite trabaja en una carpeta vacía (tarifas, libro y cachés de la carpeta actual no cuentan)
+        carpeta = tempfile.mkdtemp(prefix=f'benchmark_{suite}_')
+        inicio = time.perf_counter()
+        try:
+            os.chdir(carpeta)
+            for clave, valor in mediciones[suite](carpeta).items():
+                metricas[f"{suite}.{clave}"] = valor
+        finally:
+            os.chdir(directorio)
+            shutil.rmtree(carpeta, ignore_errors=True)
+        segundos[suite] = round(time.perf_counter() - inicio, 1)
+
+    return {
+        'fecha': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'plataforma': platform.platform(),
+        'procesadores': os.cpu_count(),
+        'parametros': parametros,
+        'segundos': segundos,
+        'metricas': metricas,
+    }
+
+
+# Función para comparar las métricas con la base; devuelve (regresiones, mejoras) como listas de textos.
+# Los tiempos y los tamaños pueden empeorar hasta el umbral; las llamadas a la API no pueden aumentar.
+def comparar(metricas, base, umbral=UMBRAL, umbrales=None):
+    regresiones, mejoras = [], []
+    for clave, valor in sorted(metricas.items()):
+        anterior = base.get(clave)
+        if not isinstance(anterior, (int, float)) or not isinstance(valor, (int, float)):
+            continue
+        limite = (umbrales or {}).get(clave, 0.0 if 'llamadas' in clave else umbral)
+        diferencia = valor - anterior
+        if clave.endswith('_ms') and abs(diferencia) < MINIMO_MS:
+            continue
+        cambio = diferencia / anterior if anterior else (1.0 if diferencia else 0.0)
+        texto = f"{clave}: {anterior} -> {valor} ({cambio:+.0%})"
+        if diferencia > 0 and cambio > limite:
+            regresiones.append(texto)
+        elif diferencia < 0 and -cambio > limite:
+            mejoras.append(texto)
+    return regresiones, mejoras
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Mide el PDF, el libro, la numeración, el click en 'Generar Remito' y el arranque, "
+                                                 "y compara el resultado con una base guardada.")
+    parser.add_argument('--suites', default=','.join(SUITES), help=f"Suites a correr, separadas por coma ({', '.join(SUITES)})")
+    parser.add_argument('--repeticiones', type=int, default=3)
+    parser.add_argument('--remitos-mes', type=int, default=10000, help="Remitos del mes de prueba del libro")
+    parser.add_argument('--latencia', type=float, default=0.0, help="Demora en ms de cada llamada al servidor falso de GitHub")
+    parser.add_argument('--clics', type=int, default=5, help="Remitos a generar en la suite click")
+    parser.add_argument('--salida', default='benchmark_resultado.json', help="Archivo JSON donde guardar el resultado")
+    parser.add_argument('--base', default=ARCHIVO_BASE, help="Resultado guardado con el que comparar")
+    parser.add_argument('--umbral', type=float, default=UMBRAL, help="Empeoramiento tolerado respecto de la base (0.25 = 25%%)")
+    parser.add_argument('--umbrales', default=None, help="Archivo JSON con umbrales por métrica ({\"pdf.pdf_10_items_ms\": 0.1})")
+    parser.add_argument('--guardar-base', action='store_true', help="Guardar el resultado como nueva base")
+    args = parser.parse_args()
+
+    suites = [suite.strip() for suite in args.suites.split(',') if suite.strip()]
+    desconocidas = sorted(set(suites) - set(SUITES))
+    if desconocidas:
+        parser.error(f"Suites desconocidas: {', '.join(desconocidas)}")
+
+    resultado = correr(suites, args.repeticiones, args.remitos_mes, args.latencia, args.clics)
+    with open(args.salida, 'w', encoding='utf-8') as file:
+        json.dump(resultado, file, indent=2, ensure_ascii=False)
+    for clave, valor in resultado['metricas'].items():
+        print(f"{clave}: {valor}")
+    print(f"Resultado en {args.salida} ({', '.join(f'{suite} {segundos} s' for suite, segundos in resultado['segundos'].items())})")
+
+    if args.guardar_base:
+        with open(args.base, 'w', encoding='utf-8') as file:
+            json.dump(resultado, file, indent=2, ensure_ascii=False)
+        print(f"Base guardada en {args.base}")
+        sys.exit(0)
+
+    if not os.path.exists(args.base):
+        print(f"No hay base en {args.base}: se puede guardar con --guardar-base")
+        sys.exit(0)
+    with open(args.base, 'r', encoding='utf-8') as file:
+        base = json.load(file)
+    umbrales = None
+    if args.umbrales:
+        with open(args.umbrales, 'r', encoding='utf-8') as file:
+            umbrales = json.load(file)
+    if base.get('parametros') != resultado['parametros']:
+        print(f"Aviso: la base se midió con otros parámetros ({base.get('parametros')})")
+
+    regresiones, mejoras = comparar(resultado['metricas'], base['metricas'], args.umbral, umbrales)
+    for linea in mejoras:
+        print(f"Mejora: {linea}")
+    for linea in regresiones:
+        print(f"Regresión: {linea}")
+    sys.exit(1 if regresiones else 0)
@@ -0,0 +1,185 @@
+import argparse
+import os
+import re
+import sqlite3
+import threading
+import time
+from decimal import Decimal
+
+from libro_columnar import a_fecha, a_moneda
+from modelo_remito import a_pesos
+from registro_remito import ruta_registro
+
+# Índice de búsqueda de remitos en SQLite con FTS5. Cada remito guardado se
+# agrega al índice (cliente, solicitante, moto y todas sus direcciones), así que
+# encontrar un remito viejo no depende de cuántos meses haya: la búsqueda de
+# texto va al índice invertido de FTS5 y los rangos de fecha e importe a índices
+# comunes. El tokenizador ignora acentos y mayúsculas, y cada palabra buscada
+# vale como prefijo ("gonz" encuentra "González").
+
+ARCHIVO_BUSQUEDA = os.getenv('REMITOS_BUSQUEDA', 'busqueda_remitos.db')
+
+TABLAS = [
+    """CREATE TABLE IF NOT EXISTS remitos (
+        numero INTEGER PRIMARY KEY, fecha TEXT NOT NULL, cliente TEXT, solicitante TEXT, moto TEXT,
+        total_centavos INTEGER NOT NULL, path TEXT)""",
+    "CREATE INDEX IF NOT EXISTS remitos_fecha ON remitos (fecha)",
+    "CREATE INDEX IF NOT EXISTS remitos_total ON remitos (total_centavos)",
+    """CREATE VIRTUAL TABLE IF NOT EXISTS texto USING fts5(
+        cliente, solicitante, moto, direcciones, tokenize='unicode61 remove_diacritics 2', prefix='2 3')""",
+]
+
+
+# Función para pasar el texto buscado a una consulta de FTS5 (todas las palabras, cada una como prefijo)
+def consulta_texto(texto):
+    palabras = re.findall(r'\w+', texto or '')
+    return ' '.join(f'"{palabra}"*' for palabra in palabras)
+
+
+def _centavos(importe):
+    return int(a_moneda(importe) * 100)
+
+
+class IndiceBusqueda:
+    def __init__(self, ruta=ARCHIVO_BUSQUEDA):
+        self.ruta = ruta
+        self._conexion = sqlite3.connect(ruta, timeout=30, isolation_level=None, check_same_thread=False)
+        self._conexion.execute("PRAGMA journal_mode=WAL")
+        self._lock = threading.Lock()
+        with self._lock:
+            for sentencia in TABLAS:
+                self._conexion.execute(sentencia)
+
+    # Función para agregar o reemplazar remitos del libro en el índice (path = registro de cada remito)
+    def agregar(self, remitos):
+        filas = [
+            (remito['numero'], a_fecha(remito['fecha']).isoformat(), remito['cliente'], remito['solicitante'], remito['moto'],
+             _centavos(remito['total']), remito.get('path') or ruta_registro(remito['numero'], a_fecha(remito['fecha'])))
+            for remito in remitos
+        ]
+        textos = [
+            (remito['numero'], remito['cliente'], remito['solicitante'], remito['moto'],
+             ' | '.join(direccion for direccion, _ in remito['detalle'] if direccion))
+            for remito in remitos
+        ]
+        with self._lock:
+            self._conexion.execute("BEGIN IMMEDIATE")
+            try:
+                self._conexion.executemany("DELETE FROM texto WHERE rowid = ?", [(fila[0],) for fila in filas])
+                self._conexion.executemany("INSERT OR REPLACE INTO remitos VALUES (?, ?, ?, ?, ?, ?, ?)", filas)
+                self._conexion.executemany("INSERT INTO texto (rowid, cliente, solicitante, moto, direcciones) VALUES (?, ?, ?, ?, ?)", textos)
+                self._conexion.execute("COMMIT")
+            except BaseException:
+                self._conexion.execute("ROLLBACK")
+                raise
+
+    # Función para buscar remitos por texto y rangos de fecha e importe, del número más alto al más bajo.
+    # Devuelve (registros de la página, total de coincidencias); los registros tienen la forma del índice mensual.
+    def buscar(self, texto='', desde=None, hasta=None, minimo=None, maximo=None, pagina=1, por_pagina=50):
+        condiciones = []
+        parametros = []
+        consulta = consulta_texto(texto)
+        if consulta:
+            condiciones.append("numero IN (SELECT rowid FROM texto WHERE texto MATCH ?)")
+            parametros.append(consulta)
+        if desde:
+            condiciones.append("fecha >= ?")
+            parametros.append(a_fecha(desde).isoformat())
+        if hasta:
+            condiciones.append("fecha <= ?")
+            parametros.append(a_fecha(hasta).isoformat())
+        if minimo is not None:
+            condiciones.append("total_centavos >= ?")
+            parametros.append(_centavos(minimo))
+        if maximo is not None:
+            condiciones.append("total_centavos <= ?")
+            parametros.append(_centavos(maximo))
+        donde = f" WHERE {' AND '.join(condiciones)}" if condiciones else ""
+
+        with self._lock:
+            total = self._conexion.execute(f"SELECT COUNT(*) FROM remitos{donde}", parametros).fetchone()[0]
+            filas = self._conexion.execute(
+                f"SELECT numero, fecha, cliente, solicitante, moto, total_centavos, path FROM remitos{donde} "
+                "ORDER BY numero DESC LIMIT ? OFFSET ?", parametros + [por_pagina, (max(1, pagina) - 1) * por_pagina]).fetchall()
+        registros = [
+            {'numero': numero, 'fecha': fecha, 'cliente': cliente, 'solicitante': solicitante, 'moto': moto,
+             'total_centavos': centavos, 'path': path}
+            for numero, fecha, cliente, solicitante, moto, centavos, path in filas
+        ]
+        return registros, total
+
+    # Función para saber cuántos remitos hay en el índice
+    def cantidad(self):
+        with self._lock:
+            return self._conexion.execute("SELECT COUNT(*) FROM remitos").fetchone()[0]
+
+    # Función para cargar en el índice todos los remitos del libro (leer devuelve tablas de Arrow)
+    def reconstruir(self, libro, desde=None, hasta=None):
+        remitos = libro.leer(desde, hasta, 'remitos', ['numero', 'fecha', 'cliente', 'solicitante', 'moto', 'total']).to_pylist()
+        detalles = {}
+        for item in libro.leer(desde, hasta, 'items', ['numero', 'orden', 'direccion']).sort_by('orden').to_pylist():
+            detalles.setdefault(item['numero'], []).append((item['direccion'], None))
+        for remito in remitos:
+            remito['detalle'] = detalles.get(remito['numero'], [])
+        self.agregar(remitos)
+        return len(remitos)
+
+
+# Una sola conexión al índice por proceso
+_busqueda = None
+_busqueda_lock = threading.Lock()
+
+
+# Función para obtener el índice de búsqueda del proceso; la primera vez, si está vacío, se llena con el libro
+def obtener_busqueda(libro=None, ruta=ARCHIVO_BUSQUEDA):
+    global _busqueda
+    with _busqueda_lock:
+        if _busqueda is None:
+            _busqueda = IndiceBusqueda(ruta)
+            if libro is not None and not _busqueda.cantidad() and libro.meses():
+                _busqueda.reconstruir(libro)
+        return _busqueda
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Índice de búsqueda de remitos.")
+    parser.add_argument('--indice', default=ARCHIVO_BUSQUEDA, help="Archivo SQLite del índice")
+    subcomandos = parser.add_subparsers(dest='comando', required=True)
+    reconstruir = subcomandos.add_parser('reconstruir', help="Carga el índice desde el libro o desde los CSV publicados en GitHub")
+    reconstruir.add_argument('--libro', default=None, help="Carpeta del libro en Parquet o URL de la base SQL")
+    reconstruir.add_argument('--github', action='store_true', help="Leer los CSV mensuales publicados en GitHub")
+    reconstruir.add_argument('--repo', default="jgonzalohernandez/ArchivosGenerados")
+    reconstruir.add_argument('--api', default=os.getenv('GITHUB_API_URL', 'https://api.github.com'))
+    buscar = subcomandos.add_parser('buscar', help="Busca remitos por texto, fecha e importe")
+    buscar.add_argument('texto', nargs='?', default='')
+    buscar.add_argument('--desde', default=None)
+    buscar.add_argument('--hasta', default=None)
+    buscar.add_argument('--minimo', type=Decimal, default=None)
+    buscar.add_argument('--maximo', type=Decimal, default=None)
+    buscar.add_argument('--cantidad', type=int, default=20)
+    args = parser.parse_args()
+
+    indice = IndiceBusqueda(args.indice)
+    if args.comando == 'reconstruir':
+        if args.github:
+            from indice_remitos import SIN_FECHA, IndiceRemitos
+            from libro_columnar import remitos_csv
+            from libro_publicado import leer_mes_publicado
+
+            cliente = IndiceRemitos(os.getenv('PAT_GITHUB'), args.repo, args.api)
+            for mes in cliente.meses():
+                contenido = leer_mes_publicado(cliente, mes) if mes != SIN_FECHA else None
+                if contenido:
+                    remitos = remitos_csv(contenido)
+                    indice.agregar(remitos)
+                    print(f"{mes}: {len(remitos)} remitos")
+        else:
+            from libro_sql import URL_SQL, obtener_libro
+
+            print(f"{indice.reconstruir(obtener_libro(args.libro or URL_SQL))} remitos en el índice")
+    else:
+        inicio = time.perf_counter()
+        registros, total = indice.buscar(args.texto, args.desde, args.hasta, args.minimo, args.maximo, por_pagina=args.cantidad)
+        for registro in registros:
+            print(f"N° {registro['numero']}  {registro['fecha']}  {registro['cliente']}  {registro['moto']}  ${a_pesos(registro['total_centavos'])}")
+        print(f"{total} remitos ({(time.perf_counter() - inicio) * 1000:.1f} ms)")
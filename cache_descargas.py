@@ -0,0 +1,178 @@
+import hashlib
+import os
+import threading
+import uuid
+from collections import OrderedDict
+
+from publicacion_github import sha_blob
+
+# Caché local de los archivos descargados del repositorio (registros y PDFs de remitos).
+# Cada copia se guarda con el path y el sha del blob en el nombre: el sha sale
+# del índice de remitos, así que si el archivo cambió en el repositorio el sha
+# es otro y la copia vieja nunca se sirve. Las descargas van por la API de
+# blobs (o la de contenidos si no se conoce el sha) en formato raw y se escriben
+# al disco por partes, sin el límite de 1 MB de get_contents; antes de guardarlas
+# se verifica que el contenido dé el sha esperado. La carpeta tiene un tamaño
+# máximo y se descartan primero las copias usadas hace más tiempo. Los PDFs que
+# se arman a partir de un registro comparten la carpeta y el límite.
+
+CARPETA_DESCARGAS = os.getenv('REMITOS_CACHE_DESCARGAS', '.cache_descargas')
+LIMITE_DESCARGAS = int(os.getenv('REMITOS_CACHE_DESCARGAS_MB', '200')) * 1024 * 1024
+
+# Tamaño de cada parte al leer la respuesta
+TAMANO_PARTE = 256 * 1024
+
+
+class ShaInvalido(Exception):
+    pass
+
+
+class CacheDescargas:
+    def __init__(self, obtener_sesion, nombre_repo, base_url='https://api.github.com', carpeta=CARPETA_DESCARGAS,
+                 limite_bytes=LIMITE_DESCARGAS, rama=None, reconectar=None):
+        self.url = f"{base_url.rstrip('/')}/repos/{nombre_repo}"
+        self._obtener_sesion = obtener_sesion
+        self._reconectar = reconectar
+        self.carpeta = carpeta
+        self.limite_bytes = limite_bytes
+        self.rama = rama
+        self.aciertos = 0
+        self.descargas = 0
+        self._lock = threading.Lock()
+        os.makedirs(self.carpeta, exist_ok=True)
+
+        # Copias que ya estaban en disco, de la usada hace más tiempo a la más reciente
+        copias = []
+        for nombre in os.listdir(self.carpeta):
+            if nombre.endswith('.tmp'):
+                continue
+            estado = os.stat(os.path.join(self.carpeta, nombre))
+            copias.append((estado.st_mtime_ns, nombre, estado.st_size))
+        self._copias = OrderedDict((nombre, tamano) for _, nombre, tamano in sorted(copias))
+        self._total = sum(self._copias.values())
+
+    def _nombre(self, path, sha):
+        return f"{hashlib.sha1(path.encode('utf-8')).hexdigest()[:16]}-{sha}"
+
+    # Función para descartar las copias menos usadas hasta quedar dentro del límite (con el lock tomado)
+    def _liberar(self):
+        while self._total > self.limite_bytes and len(self._copias) > 1:
+            nombre, tamano = self._copias.popitem(last=False)
+            self._total -= tamano
+            try:
+                os.remove(os.path.join(self.carpeta, nombre))
+            except FileNotFoundError:
+                pass
+
+    # Función para descargar un archivo por partes a un temporal; devuelve la ruta del temporal y su sha de blob
+    def _descargar(self, path, sha):
+        if sha:
+            url, parametros = f"{self.url}/git/blobs/{sha}", None
+        else:
+            url, parametros = f"{self.url}/contents/{path}", ({'ref': self.rama} if self.rama else None)
+        temporal = os.path.join(self.carpeta, f"{uuid.uuid4().hex}.tmp")
+        try:
+            for intento in range(2):
+                with self._obtener_sesion().get(url, headers={'Accept': 'application/vnd.github.raw'}, params=parametros,
+                                                stream=True, timeout=60) as respuesta:
+                    # Token vencido o rotado: se reconecta (vuelve a leer el token) y se reintenta una vez
+                    if respuesta.status_code == 401 and intento == 0 and self._reconectar:
+                        self._reconectar()
+                        continue
+                    if respuesta.status_code == 404:
+                        raise FileNotFoundError(f"No existe {path} en el repositorio")
+                    respuesta.raise_for_status()
+                    with open(temporal, 'wb') as file:
+                        for parte in respuesta.iter_content(TAMANO_PARTE):
+                            file.write(parte)
+                    break
+
+            # El sha de git lleva el tamaño adelante, por eso se calcula con el archivo ya escrito
+            huella = hashlib.sha1(b"blob %d\0" % os.path.getsize(temporal))
+            with open(temporal, 'rb') as file:
+                for parte in iter(lambda: file.read(TAMANO_PARTE), b''):
+                    huella.update(parte)
+            return temporal, huella.hexdigest()
+        except BaseException:
+            if os.path.exists(temporal):
+                os.remove(temporal)
+            raise
+
+    # Función para leer la copia local de un archivo con ese sha, sin ir al repositorio (None si no está)
+    def leer(self, path, sha):
+        nombre = self._nombre(path, sha)
+        ruta = os.path.join(self.carpeta, nombre)
+        with self._lock:
+            if nombre not in self._copias:
+                return None
+            self._copias.move_to_end(nombre)
+        try:
+            with open(ruta, 'rb') as file:
+                contenido = file.read()
+            # El mtime guarda el orden de uso para la próxima vez que arranque el proceso
+            os.utime(ruta)
+        except FileNotFoundError:
+            # Otro proceso la descartó
+            with self._lock:
+                self._total -= self._copias.pop(nombre, 0)
+            return None
+        with self._lock:
+            self.aciertos += 1
+        return contenido
+
+    # Función para obtener un archivo: de la caché si hay una copia con ese sha, si no del repositorio.
+    # Sin sha (el archivo no está en el índice) siempre se descarga, y la copia queda para el sha que resulte.
+    def obtener(self, path, sha=None):
+        if sha:
+            contenido = self.leer(path, sha)
+            if contenido is not None:
+                return contenido
+
+        temporal, sha_descargado = self._descargar(path, sha)
+        if sha and sha_descargado != sha:
+            os.remove(temporal)
+            raise ShaInvalido(f"{path}: se esperaba el blob {sha} y llegó {sha_descargado}")
+        with open(temporal, 'rb') as file:
+            contenido = file.read()
+
+        nombre = self._nombre(path, sha_descargado)
+        os.replace(temporal, os.path.join(self.carpeta, nombre))
+        with self._lock:
+            self.descargas += 1
+            self._total += len(contenido) - self._copias.pop(nombre, 0)
+            self._copias[nombre] = len(contenido)
+            self._liberar()
+        return contenido
+
+    # Función para guardar en la caché un archivo que se acaba de generar (el primer pedido ya no lo descarga).
+    # Con sha, la copia queda bajo esa clave en lugar del sha del contenido (por ejemplo, el PDF armado de un registro).
+    def guardar(self, path, contenido, sha=None):
+        nombre = self._nombre(path, sha or sha_blob(contenido))
+        temporal = os.path.join(self.carpeta, f"{uuid.uuid4().hex}.tmp")
+        with open(temporal, 'wb') as file:
+            file.write(contenido)
+        os.replace(temporal, os.path.join(self.carpeta, nombre))
+        with self._lock:
+            self._total += len(contenido) - self._copias.pop(nombre, 0)
+            self._copias[nombre] = len(contenido)
+            self._liberar()
+
+    # Función para consultar el estado de la caché
+    def estado(self):
+        with self._lock:
+            return {'copias': len(self._copias), 'bytes': self._total, 'limite_bytes': self.limite_bytes,
+                    'aciertos': self.aciertos, 'descargas': self.descargas}
+
+
+# Una sola caché por proceso, compartida por todas las sesiones de Streamlit
+_cache = None
+_cache_lock = threading.Lock()
+
+
+# Función para obtener la caché de descargas del proceso
+def obtener_cache_descargas(obtener_sesion, nombre_repo, base_url='https://api.github.com', reconectar=None):
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = CacheDescargas(obtener_sesion, nombre_repo, base_url, reconectar=reconectar)
+        return _cache
@@ -0,0 +1,108 @@
+import os
+import threading
+import time
+
+from metricas_remitos import obtener_metricas
+
+# Conexión a GitHub compartida por todo el proceso: el cliente de PyGithub, el
+# repositorio y una sesión HTTP (para las lecturas con ETag) se crean la primera
+# vez que alguien los pide y después se reutilizan, con las conexiones abiertas
+# (keep-alive), en todas las sesiones de Streamlit y en los hilos de fondo.
+# Crearlos no hace ninguna llamada a la API; la conexión se verifica sólo cuando
+# se pide y, si falla el token o la red, se vuelve a armar todo.
+
+# Conexiones abiertas por host (la bandeja, el consolidador y las descargas pueden ir a la vez)
+TAMANO_POOL_HTTP = 10
+
+
+class RecursosGithub:
+    def __init__(self, obtener_token, nombre_repo, base_url='https://api.github.com'):
+        self._obtener_token = obtener_token
+        self.nombre_repo = nombre_repo
+        self.base_url = base_url.rstrip('/')
+        self._cliente = None
+        self._repo = None
+        self._sesion = None
+        self._lock = threading.Lock()
+        self.reconexiones = 0
+        self.ultima_verificacion = None
+
+    # Función para obtener el cliente de PyGithub (se crea la primera vez, sin llamar a la API)
+    def cliente(self):
+        from github import Github
+
+        with self._lock:
+            if self._cliente is None:
+                self._cliente = Github(self._obtener_token(), base_url=self.base_url, pool_size=TAMANO_POOL_HTTP)
+            return self._cliente
+
+    # Función para obtener el repositorio; es perezoso, la primera llamada a la API la hace quien lo usa
+    def repo(self):
+        cliente = self.cliente()
+        with self._lock:
+            if self._repo is None:
+                self._repo = cliente.get_repo(self.nombre_repo, lazy=True)
+            return self._repo
+
+    # Función para obtener la sesión HTTP con el token, para las lecturas que no pasan por PyGithub
+    def sesion(self):
+        import requests
+        from requests.adapters import HTTPAdapter
+
+        with self._lock:
+            if self._sesion is None:
+                sesion = requests.Session()
+                sesion.mount('https://', HTTPAdapter(pool_connections=1, pool_maxsize=TAMANO_POOL_HTTP))
+                sesion.mount('http://', HTTPAdapter(pool_connections=1, pool_maxsize=TAMANO_POOL_HTTP))
+                token = self._obtener_token()
+                if token:
+                    sesion.headers['Authorization'] = f"token {token}"
+                obtener_metricas().instrumentar_sesion(sesion)
+                self._sesion = sesion
+            return self._sesion
+
+    # Función para descartar el cliente, el repositorio y la sesión; el token se vuelve a leer al pedirlos.
+    # Quien ya tenía el repositorio lo sigue usando hasta que se reconecte por su cuenta.
+    def reconectar(self):
+        with self._lock:
+            self._cliente = None
+            self._repo = None
+            self._sesion = None
+            self.reconexiones += 1
+
+    # Función para verificar la conexión y el token (rate_limit no descuenta del límite de la API).
+    # Si el token no sirve o no hay red, reconecta; devuelve el estado para mostrarlo.
+    def verificar(self):
+        import requests
+
+        inicio = time.perf_counter()
+        estado = {'ok': False, 'restantes': None, 'error': None}
+        try:
+            respuesta = self.sesion().get(f"{self.base_url}/rate_limit", timeout=10)
+            if respuesta.status_code == 401:
+                estado['error'] = "El token de GitHub no es válido"
+                self.reconectar()
+            else:
+                respuesta.raise_for_status()
+                estado['ok'] = True
+                estado['restantes'] = respuesta.json()['resources']['core']['remaining']
+        except requests.RequestException as e:
+            estado['error'] = f"Sin conexión con GitHub: {e}"
+            self.reconectar()
+        estado['milisegundos'] = round((time.perf_counter() - inicio) * 1000, 1)
+        self.ultima_verificacion = estado
+        return estado
+
+
+# Un solo juego de recursos por proceso, compartido por todas las sesiones de Streamlit
+_recursos = None
+_recursos_lock = threading.Lock()
+
+
+# Función para obtener los recursos de GitHub del proceso (el token se lee de PAT_GITHUB al conectar)
+def obtener_recursos(nombre_repo, base_url='https://api.github.com', obtener_token=None):
+    global _recursos
+    with _recursos_lock:
+        if _recursos is None:
+            _recursos = RecursosGithub(obtener_token or (lambda: os.getenv('PAT_GITHUB')), nombre_repo, base_url)
+        return _recursos
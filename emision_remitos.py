@@ -0,0 +1,177 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import replace
+
+from indice_remitos import linea_indice, registro_indice, ruta_indice
+from libro_remitos import ruta_csv_mensual
+from metricas_remitos import obtener_metricas
+from registro_remito import huella_remito, ruta_registro, serializar_registro
+
+# Emisión de remitos, sin interfaz: lo mismo que hace el botón "Generar Remito"
+# y lo que hace el servicio HTTP con cada tanda de remitos que recibe. Se
+# numeran, se arma el registro de cada uno, se encola la publicación (registros
+# y líneas del índice; el registro es también la parte del libro publicado) en
+# la bandeja de salida como un solo grupo y recién después se guardan en el
+# libro y en la búsqueda. Una tanda de varios remitos hace una sola reserva de
+# números, una sola escritura en el libro y un solo commit.
+#
+# Encolado en la bandeja (que está en disco y lo sube aunque el proceso se
+# reinicie) el remito ya está emitido: si después falla el libro o la búsqueda
+# no se informa como error (un reintento lo facturaría dos veces), queda
+# pendiente y se vuelve a guardar con la próxima emisión.
+#
+# Un remito puede traer una clave de idempotencia (una por envío del formulario
+# o por remito del pedido HTTP). Si la clave ya se emitió hace poco, un doble
+# click o un reintento devuelve el mismo número y el mismo registro, sin tocar
+# el libro ni la bandeja. Dos remitos iguales sin clave, o con claves distintas,
+# son dos servicios y llevan dos números.
+
+# Segundos durante los que se recuerda la clave de un remito emitido
+VENTANA_REPETIDOS = float(os.getenv('REMITOS_VENTANA_REPETIDOS', '900'))
+# Claves emitidas que se recuerdan para reconocer los reintentos
+MAXIMO_RECIENTES = 1000
+
+
+class EmisorRemitos:
+    def __init__(self, numerador, libro, busqueda, bandeja, descargas=None, metricas=None, ventana_repetidos=VENTANA_REPETIDOS):
+        self.numerador = numerador
+        self.libro = libro
+        self.busqueda = busqueda
+        self.bandeja = bandeja
+        self.descargas = descargas
+        self.metricas = metricas or obtener_metricas()
+        self.ventana_repetidos = ventana_repetidos
+        # clave -> (instante, huella, (remito, registro_bytes, línea del índice))
+        self._recientes = OrderedDict()
+        # Remitos ya publicados que faltan guardar en el libro, y registros del libro que faltan en la búsqueda
+        self._sin_libro = []
+        self._sin_busqueda = []
+        # Último error al guardarlos (None si no queda ninguno pendiente)
+        self.error_guardado = None
+        self._lock = threading.Lock()
+
+    # Función para guardar remitos en el libro local; devuelve los registros del libro
+    def guardar_en_libro(self, remitos):
+        for fecha in sorted({remito.fecha.strftime('%Y-%m-%d') for remito in remitos}):
+            csv_path = ruta_csv_mensual(fecha)
+            # Un CSV de antes del libro se importa una sola vez (después queda renombrado) para no perder sus filas
+            if os.path.exists(csv_path):
+                self.libro.importar_csv(csv_path)
+                os.replace(csv_path, f'{csv_path}.importado')
+        registros = [remito.registro_libro() for remito in remitos]
+        self.libro.agregar(registros)
+        return registros
+
+    # Función para publicar en GitHub los registros y las líneas del índice en un solo commit
+    # (los PDFs no se suben: se arman a partir del registro cuando alguien los descarga); devuelve las líneas del índice
+    def publicar(self, registros, registros_bytes):
+        archivos = []
+        lineas = []
+        anexos = {}
+        for registro, registro_bytes in zip(registros, registros_bytes):
+            fecha = registro['fecha'].strftime('%Y-%m-%d')
+            path = ruta_registro(registro['numero'], fecha)
+            linea = registro_indice(registro['numero'], fecha, registro['cliente'], registro['total'], path, registro_bytes)
+            archivos.append((path, registro_bytes))
+            lineas.append(linea)
+            anexos[ruta_indice(fecha)] = anexos.get(ruta_indice(fecha), b'') + linea_indice(linea)
+        numeros = [registro['numero'] for registro in registros]
+        mensaje = f"Remito {numeros[0]}" if len(numeros) == 1 else f"Remitos {min(numeros)} a {max(numeros)} ({len(numeros)})"
+        self.bandeja.agregar_varios(archivos, mensaje, anexos=list(anexos.items()))
+        if self.descargas is not None:
+            for linea, registro_bytes in zip(lineas, registros_bytes):
+                self.descargas.guardar(linea['path'], registro_bytes)
+        return lineas
+
+    # Función para emitir remitos (con número 0, se numeran acá); devuelve [(remito, registro_bytes, línea del índice, repetido), ...].
+    # claves tiene una clave de idempotencia por remito (None = sin clave). Un remito cuya clave ya se emitió dentro
+    # de la ventana trae el remito ya emitido; los remitos de una misma llamada nunca se juntan.
+    def emitir(self, remitos, claves=None):
+        claves = [None] * len(remitos) if claves is None else list(claves)
+        if len(claves) != len(remitos):
+            raise ValueError(f"Hay {len(claves)} claves para {len(remitos)} remitos")
+        con_clave = [clave for clave in claves if clave is not None]
+        if len(set(con_clave)) != len(con_clave):
+            raise ValueError("La misma clave de idempotencia aparece en más de un remito")
+        # Se cotizan antes de numerar: un remito sin tarifa vigente no gasta número
+        huellas = [huella_remito(remito) for remito in remitos]
+
+        # Un solo emisor a la vez: dos clicks simultáneos con la misma clave no pueden pasar los dos como nuevos
+        with self._lock:
+            ahora = time.monotonic()
+            for clave, (instante, _, _) in list(self._recientes.items()):
+                if ahora - instante <= self.ventana_repetidos:
+                    break
+                del self._recientes[clave]
+            nuevos = []
+            for posicion, (clave, huella) in enumerate(zip(claves, huellas)):
+                reciente = self._recientes.get(clave) if clave is not None else None
+                if reciente is None:
+                    nuevos.append(posicion)
+                elif reciente[1] != huella:
+                    raise ValueError(f"La clave {clave} ya se usó para otro remito")
+            emitidos = dict(zip(nuevos, self._emitir([remitos[posicion] for posicion in nuevos]))) if nuevos else {}
+            for posicion, emitido in emitidos.items():
+                if claves[posicion] is not None:
+                    self._recientes[claves[posicion]] = (ahora, huellas[posicion], emitido)
+            while len(self._recientes) > MAXIMO_RECIENTES:
+                self._recientes.popitem(last=False)
+            resultados = [emitidos[posicion] + (False,) if posicion in emitidos else self._recientes[claves[posicion]][2] + (True,)
+                          for posicion in range(len(remitos))]
+        repetidos = sum(1 for resultado in resultados if resultado[3])
+        if repetidos:
+            self.metricas.contar('remitos_repetidos_total', repetidos)
+        return resultados
+
+    def _emitir(self, remitos):
+        with self.metricas.etapa('numeracion', remitos=len(remitos)):
+            numeros = self.numerador.siguientes(len(remitos))
+        try:
+            numerados = [replace(remito, numero=numero) for remito, numero in zip(remitos, numeros)]
+            with self.metricas.etapa('registro', remitos=len(remitos)):
+                registros_bytes = [serializar_registro(remito) for remito in numerados]
+            with self.metricas.etapa('publicacion', remitos=len(remitos)):
+                lineas = self.publicar([remito.registro_libro() for remito in numerados], registros_bytes)
+        except Exception:
+            # Los números no llegaron a usarse: vuelven al bloque para los próximos remitos
+            for numero in reversed(numeros):
+                self.numerador.reponer(numero)
+            raise
+        self._guardar(numerados)
+        self.metricas.contar('remitos_generados_total', len(remitos))
+        for registro_bytes in registros_bytes:
+            self.metricas.observar('remitos_bytes', len(registro_bytes), tipo='registro')
+        return list(zip(numerados, registros_bytes, lineas))
+
+    # Función para guardar en el libro y en la búsqueda remitos ya publicados, junto con los que quedaron pendientes
+    # de antes; si falla quedan pendientes (los dos reemplazan por número: guardar dos veces el mismo remito no lo duplica)
+    def _guardar(self, remitos):
+        self._sin_libro.extend(remitos)
+        try:
+            with self.metricas.etapa('libro', remitos=len(self._sin_libro) + len(self._sin_busqueda)):
+                if self._sin_libro:
+                    self._sin_busqueda.extend(self.guardar_en_libro(self._sin_libro))
+                    self._sin_libro = []
+                if self._sin_busqueda:
+                    self.busqueda.agregar(self._sin_busqueda)
+                    self._sin_busqueda = []
+            self.error_guardado = None
+        except Exception as e:
+            self.error_guardado = f"{type(e).__name__}: {e}"
+        self.metricas.fijar('remitos_sin_libro', len(self._sin_libro) + len(self._sin_busqueda))
+
+
+# Un solo emisor por proceso: los remitos recientes se comparten entre todas las sesiones de Streamlit
+_emisor = None
+_emisor_lock = threading.Lock()
+
+
+# Función para obtener el emisor del proceso
+def obtener_emisor(numerador, libro, busqueda, bandeja, descargas=None, metricas=None):
+    global _emisor
+    with _emisor_lock:
+        if _emisor is None:
+            _emisor = EmisorRemitos(numerador, libro, busqueda, bandeja, descargas, metricas)
+        return _emisor
@@ -0,0 +1,370 @@
+import argparse
+import base64
+import hashlib
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, unquote, urlparse
+
+from publicacion_github import sha_blob
+
+# Servidor local que imita la API de contenidos y la Git Data API de GitHub,
+# para probar la subida de remitos sin red ni token (Github(base_url=servidor.url)).
+
+
+class ServidorGithubFalso:
+    def __init__(self, owner="jgonzalohernandez", repo="ArchivosGenerados", puerto=0, latencia=0.0):
+        self.owner = owner
+        self.repo = repo
+        self.latencia = latencia
+        self.llamadas = []
+        self.no_modificados = 0
+        # Si se define, sólo se acepta este token (para probar reconexiones con un token nuevo)
+        self.token_valido = None
+
+        # Objetos git mínimos: blobs, árboles planos (path -> sha del blob) y commits
+        self.blobs = {}
+        self.arboles = {}
+        self.commits = {}
+        self.rama = 'main'
+        arbol_vacio = self._guardar_arbol({})
+        self.head = self._guardar_commit("Commit inicial", arbol_vacio, [])
+
+        self._fallas_pendientes = 0
+        self._lock = threading.Lock()
+        self._servidor = ThreadingHTTPServer(('127.0.0.1', puerto), self._crear_handler())
+        self._servidor.daemon_threads = True
+        self._hilo = None
+
+    # Archivos de la punta de la rama, como {path: bytes}
+    @property
+    def archivos(self):
+        return self._archivos_en(self.head)
+
+    def _archivos_en(self, commit):
+        arbol = self.arboles[self.commits[commit]['tree']]
+        return {path: self.blobs[sha] for path, sha in arbol.items()}
+
+    @property
+    def cantidad_commits(self):
+        cantidad = 0
+        sha = self.head
+        while sha:
+            cantidad += 1
+            padres = self.commits[sha]['parents']
+            sha = padres[0] if padres else None
+        return cantidad
+
+    def _guardar_blob(self, contenido):
+        sha = sha_blob(contenido)
+        self.blobs[sha] = contenido
+        return sha
+
+    def _guardar_arbol(self, entradas):
+        sha = hashlib.sha1(json.dumps(sorted(entradas.items())).encode('utf-8')).hexdigest()
+        self.arboles[sha] = dict(entradas)
+        return sha
+
+    def _guardar_commit(self, mensaje, arbol, padres):
+        sha = hashlib.sha1(f"{arbol}{padres}{mensaje}{time.time()}{len(self.commits)}".encode('utf-8')).hexdigest()
+        self.commits[sha] = {'tree': arbol, 'parents': list(padres), 'message': mensaje}
+        return sha
+
+    # Función para cambiar archivos directamente en la rama (como si otro cliente hubiera publicado)
+    def escribir(self, path, contenido, mensaje="Cambio externo"):
+        with self._lock:
+            self._escribir_en_rama({path: self._guardar_blob(contenido)}, mensaje)
+
+    def _escribir_en_rama(self, cambios, mensaje):
+        arbol = dict(self.arboles[self.commits[self.head]['tree']])
+        for path, sha in cambios.items():
+            if sha is None:
+                arbol.pop(path, None)
+            else:
+                arbol[path] = sha
+        self.head = self._guardar_commit(mensaje, self._guardar_arbol(arbol), [self.head])
+        return self.head
+
+    @property
+    def url(self):
+        host, puerto = self._servidor.server_address[:2]
+        return f"http://{host}:{puerto}"
+
+    # Función para hacer que las próximas n llamadas respondan con error 502
+    def fallar_proximas(self, cantidad):
+        with self._lock:
+            self._fallas_pendientes = cantidad
+
+    def iniciar(self):
+        self._hilo = threading.Thread(target=self._servidor.serve_forever, daemon=True)
+        self._hilo.start()
+        return self
+
+    def detener(self):
+        self._servidor.shutdown()
+        self._servidor.server_close()
+
+    def __enter__(self):
+        return self.iniciar()
+
+    def __exit__(self, *args):
+        self.detener()
+
+    def _consumir_falla(self):
+        with self._lock:
+            if self._fallas_pendientes > 0:
+                self._fallas_pendientes -= 1
+                return True
+            return False
+
+    def _json_repo(self):
+        return {
+            'id': 1,
+            'name': self.repo,
+            'full_name': f"{self.owner}/{self.repo}",
+            'url': f"{self.url}/repos/{self.owner}/{self.repo}",
+            'default_branch': 'main',
+            'private': True,
+            'owner': {'login': self.owner},
+        }
+
+    def _json_archivo(self, path, contenido, con_contenido=True):
+        datos = {
+            'type': 'file',
+            'name': path.rsplit('/', 1)[-1],
+            'path': path,
+            'sha': sha_blob(contenido),
+            'size': len(contenido),
+            'url': f"{self.url}/repos/{self.owner}/{self.repo}/contents/{path}",
+        }
+        if con_contenido:
+            datos['encoding'] = 'base64'
+            datos['content'] = base64.b64encode(contenido).decode('ascii')
+        return datos
+
+    def _listar(self, carpeta, archivos):
+        prefijo = f"{carpeta}/" if carpeta else ""
+        entradas = {}
+        for path in sorted(archivos):
+            if not path.startswith(prefijo):
+                continue
+            resto = path[len(prefijo):]
+            if '/' in resto:
+                nombre = resto.split('/', 1)[0]
+                entradas[nombre] = {'type': 'dir', 'name': nombre, 'path': prefijo + nombre, 'sha': '0' * 40, 'size': 0,
+                                    'url': f"{self.url}/repos/{self.owner}/{self.repo}/contents/{prefijo + nombre}"}
+            else:
+                entradas[resto] = self._json_archivo(path, archivos[path], con_contenido=False)
+        return list(entradas.values())
+
+    def _json_commit(self, sha):
+        commit = self.commits[sha]
+        base = f"{self.url}/repos/{self.owner}/{self.repo}/git"
+        return {
+            'sha': sha,
+            'url': f"{base}/commits/{sha}",
+            'message': commit['message'],
+            'tree': {'sha': commit['tree'], 'url': f"{base}/trees/{commit['tree']}"},
+            'parents': [{'sha': padre, 'url': f"{base}/commits/{padre}"} for padre in commit['parents']],
+        }
+
+    def _json_ref(self):
+        base = f"{self.url}/repos/{self.owner}/{self.repo}/git"
+        return {
+            'ref': f"refs/heads/{self.rama}",
+            'url': f"{base}/refs/heads/{self.rama}",
+            'object': {'sha': self.head, 'type': 'commit', 'url': f"{base}/commits/{self.head}"},
+        }
+
+    # Función que atiende la Git Data API (blobs, árboles, commits y refs)
+    def _atender_git(self, metodo, recurso, cuerpo):
+        base = f"{self.url}/repos/{self.owner}/{self.repo}/git"
+        partes = recurso.strip('/').split('/', 1)
+        tipo, resto = partes[0], (partes[1] if len(partes) > 1 else '')
+
+        if tipo == 'blobs' and metodo == 'POST':
+            if cuerpo.get('encoding') == 'base64':
+                contenido = base64.b64decode(cuerpo['content'])
+            else:
+                contenido = cuerpo['content'].encode('utf-8')
+            sha = self._guardar_blob(contenido)
+            return 201, {'sha': sha, 'url': f"{base}/blobs/{sha}"}
+
+        if tipo == 'blobs' and metodo == 'GET' and resto in self.blobs:
+            contenido = self.blobs[resto]
+            return 200, {'sha': resto, 'size': len(contenido), 'encoding': 'base64',
+                         'content': base64.b64encode(contenido).decode('ascii'), 'url': f"{base}/blobs/{resto}"}
+
+        if tipo == 'trees' and metodo == 'POST':
+            entradas = dict(self.arboles.get(cuerpo.get('base_tree'), {})) if cuerpo.get('base_tree') else {}
+            if cuerpo.get('base_tree') and cuerpo['base_tree'] not in self.arboles:
+                return 422, {'message': 'Invalid base_tree'}
+            for elemento in cuerpo.get('tree', []):
+                if elemento.get('content') is not None:
+                    entradas[elemento['path']] = self._guardar_blob(elemento['content'].encode('utf-8'))
+                elif elemento.get('sha') is None:
+                    entradas.pop(elemento['path'], None)
+                elif elemento['sha'] in self.blobs:
+                    entradas[elemento['path']] = elemento['sha']
+                else:
+                    return 422, {'message': f"Invalid sha for {elemento['path']}"}
+            sha = self._guardar_arbol(entradas)
+            return 201, {'sha': sha, 'url': f"{base}/trees/{sha}",
+                         'tree': [{'path': path, 'mode': '100644', 'type': 'blob', 'sha': blob}
+                                  for path, blob in sorted(entradas.items())]}
+
+        if tipo == 'commits' and metodo == 'POST':
+            if cuerpo.get('tree') not in self.arboles or any(padre not in self.commits for padre in cuerpo.get('parents', [])):
+                return 422, {'message': 'Invalid tree or parents'}
+            sha = self._guardar_commit(cuerpo.get('message', ''), cuerpo['tree'], cuerpo.get('parents', []))
+            return 201, self._json_commit(sha)
+
+        if tipo == 'commits' and metodo == 'GET' and resto in self.commits:
+            return 200, self._json_commit(resto)
+
+        if tipo in ('ref', 'refs') and resto == f"heads/{self.rama}":
+            if metodo == 'GET':
+                return 200, self._json_ref()
+            if metodo == 'PATCH':
+                nuevo = cuerpo.get('sha')
+                if nuevo not in self.commits:
+                    return 422, {'message': 'Object does not exist'}
+                if not cuerpo.get('force') and self.head not in self.commits[nuevo]['parents']:
+                    return 422, {'message': 'Update is not a fast forward'}
+                self.head = nuevo
+                return 200, self._json_ref()
+
+        return 404, {'message': 'Not Found'}
+
+    # Función que atiende cada pedido; devuelve (código, cuerpo). ref puede ser un sha de commit o la rama
+    def atender(self, metodo, path, cuerpo, ref=None):
+        base = f"/repos/{self.owner}/{self.repo}"
+        if path == "/rate_limit" and metodo == 'GET':
+            restantes = max(0, 5000 - len(self.llamadas) + self.no_modificados)
+            return 200, {'resources': {'core': {'limit': 5000, 'remaining': restantes}}, 'rate': {'limit': 5000, 'remaining': restantes}}
+        if path == base and metodo == 'GET':
+            return 200, self._json_repo()
+        if path.startswith(base + "/git/"):
+            with self._lock:
+                return self._atender_git(metodo, path[len(base + "/git/"):], cuerpo)
+        if not path.startswith(base + "/contents"):
+            return 404, {'message': 'Not Found'}
+
+        archivo = unquote(path[len(base + "/contents"):]).strip('/')
+        with self._lock:
+            archivos = self.archivos
+            if metodo == 'GET':
+                if ref in self.commits:
+                    archivos = self._archivos_en(ref)
+                if archivo in archivos:
+                    return 200, self._json_archivo(archivo, archivos[archivo])
+                listado = self._listar(archivo, archivos)
+                if listado or archivo == "":
+                    return 200, listado
+                return 404, {'message': 'Not Found'}
+
+            if metodo == 'PUT':
+                contenido = base64.b64decode(cuerpo.get('content', ''))
+                sha_actual = sha_blob(archivos[archivo]) if archivo in archivos else None
+                if sha_actual is not None and cuerpo.get('sha') != sha_actual:
+                    return 409, {'message': f"{archivo} does not match {cuerpo.get('sha')}"}
+                if sha_actual is None and cuerpo.get('sha'):
+                    return 422, {'message': 'sha was supplied but the file does not exist'}
+                commit = self._escribir_en_rama({archivo: self._guardar_blob(contenido)}, cuerpo.get('message', ''))
+                codigo = 200 if sha_actual else 201
+                return codigo, {'content': self._json_archivo(archivo, contenido, con_contenido=False),
+                                'commit': self._json_commit(commit)}
+
+            if metodo == 'DELETE':
+                if archivo not in archivos:
+                    return 404, {'message': 'Not Found'}
+                commit = self._escribir_en_rama({archivo: None}, cuerpo.get('message', ''))
+                return 200, {'content': None, 'commit': self._json_commit(commit)}
+
+        return 405, {'message': 'Method Not Allowed'}
+
+    def _crear_handler(self):
+        servidor = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+            disable_nagle_algorithm = True
+
+            def _responder(self, metodo):
+                largo = int(self.headers.get('Content-Length') or 0)
+                cuerpo = json.loads(self.rfile.read(largo) or b'{}') if largo else {}
+                partes_url = urlparse(self.path)
+                path = partes_url.path
+                ref = parse_qs(partes_url.query).get('ref', [None])[0]
+                servidor.llamadas.append((metodo, path))
+                if servidor.latencia:
+                    time.sleep(servidor.latencia)
+
+                if servidor._consumir_falla():
+                    codigo, datos = 502, {'message': 'Bad Gateway'}
+                elif servidor.token_valido and self.headers.get('Authorization', '').split(' ')[-1] != servidor.token_valido:
+                    codigo, datos = 401, {'message': 'Bad credentials'}
+                else:
+                    codigo, datos = servidor.atender(metodo, path, cuerpo, ref)
+
+                # Con Accept: application/vnd.github.raw las APIs de contenidos y de blobs devuelven el archivo tal cual
+                if codigo == 200 and 'raw' in self.headers.get('Accept', '') and isinstance(datos, dict) and datos.get('encoding') == 'base64':
+                    respuesta = base64.b64decode(datos['content'])
+                    tipo = 'application/octet-stream'
+                else:
+                    respuesta = json.dumps(datos).encode('utf-8')
+                    tipo = 'application/json; charset=utf-8'
+
+                etag = None
+                if metodo == 'GET' and codigo == 200:
+                    etag = f'"{hashlib.sha1(respuesta).hexdigest()}"'
+                    if self.headers.get('If-None-Match') == etag:
+                        codigo, respuesta = 304, b''
+                        servidor.no_modificados += 1
+
+                self.send_response(codigo)
+                self.send_header('Content-Type', tipo)
+                self.send_header('Content-Length', str(len(respuesta)))
+                if etag:
+                    self.send_header('ETag', etag)
+                self.send_header('X-RateLimit-Limit', '5000')
+                # Como en GitHub, las respuestas 304 no descuentan del límite
+                restantes = 5000 - len(servidor.llamadas) + servidor.no_modificados
+                self.send_header('X-RateLimit-Remaining', str(max(0, restantes)))
+                self.end_headers()
+                self.wfile.write(respuesta)
+
+            def do_GET(self):
+                self._responder('GET')
+
+            def do_PUT(self):
+                self._responder('PUT')
+
+            def do_POST(self):
+                self._responder('POST')
+
+            def do_PATCH(self):
+                self._responder('PATCH')
+
+            def do_DELETE(self):
+                self._responder('DELETE')
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Servidor local que imita la API de contenidos de GitHub.")
+    parser.add_argument('--puerto', type=int, default=8765)
+    parser.add_argument('--latencia', type=float, default=0.0, help="Demora en segundos agregada a cada llamada")
+    args = parser.parse_args()
+
+    servidor = ServidorGithubFalso(puerto=args.puerto, latencia=args.latencia)
+    print(f"GitHub falso escuchando en {servidor.url} (usar GITHUB_API_URL={servidor.url})")
+    try:
+        servidor._servidor.serve_forever()
+    except KeyboardInterrupt:
+        pass
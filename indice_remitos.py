@@ -0,0 +1,280 @@
+import argparse
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+from modelo_remito import a_centavos
+from publicacion_github import sha_blob
+
+# Índice de remitos guardado en el repositorio junto a los PDFs: un archivo JSON
+# Lines por mes (indice_remitos/AAAA-MM.jsonl) con número, fecha, cliente, total
+# en centavos, path y sha del blob de cada remito (su registro o, en los remitos anteriores a
+# los registros, su PDF). Cada publicación agrega una línea al mes que corresponde,
+# así que leerlo no depende de cuántos remitos haya en el repositorio.
+
+CARPETA_INDICE = 'indice_remitos'
+CARPETA_CACHE = os.getenv('REMITOS_CACHE_INDICE', '.cache_indice')
+
+# Segundos durante los que se usa la copia en memoria sin volver a consultar a GitHub
+# (lo que sube este proceso la invalida enseguida; lo de otros despachadores aparece al vencer)
+VIGENCIA_MEMORIA = float(os.getenv('REMITOS_VIGENCIA_INDICE', '300'))
+# Tamaño máximo de la copia en memoria (índices, listados y registros leídos); se descartan primero los usados hace más tiempo
+LIMITE_MEMORIA = int(os.getenv('REMITOS_MEMORIA_INDICE_MB', '32')) * 1024 * 1024
+
+# Índice de los remitos viejos que no tienen fila en ningún CSV mensual
+SIN_FECHA = 'sin-fecha'
+
+
+# Función para obtener el path del índice del mes de una fecha (AAAA-MM-DD)
+def ruta_indice(fecha):
+    return f"{CARPETA_INDICE}/{fecha[:7]}.jsonl"
+
+
+# Función para armar el registro del índice de un remito
+def registro_indice(remito_numero, fecha, cliente, total_importe, path, contenido):
+    return {
+        'numero': int(remito_numero),
+        'fecha': fecha,
+        'cliente': cliente,
+        'total_centavos': a_centavos(total_importe),
+        'path': path,
+        'sha': sha_blob(contenido),
+        'bytes': len(contenido),
+    }
+
+
+# Función para convertir un registro en una línea del índice
+def linea_indice(registro):
+    return (json.dumps(registro, ensure_ascii=False, separators=(',', ':')) + '\n').encode('utf-8')
+
+
+# Función para leer las líneas de un índice; si un número aparece dos veces vale la última.
+# Las líneas anteriores traen el total en pesos ('total'): se pasa a centavos.
+def leer_lineas(contenido):
+    registros = {}
+    for linea in contenido.decode('utf-8').splitlines():
+        if linea.strip():
+            registro = json.loads(linea)
+            if 'total_centavos' not in registro:
+                registro['total_centavos'] = a_centavos(registro.pop('total', 0))
+            registros[registro['numero']] = registro
+    return list(registros.values())
+
+
+class IndiceRemitos:
+    def __init__(self, token, nombre_repo, base_url='https://api.github.com', carpeta_cache=CARPETA_CACHE,
+                 vigencia=VIGENCIA_MEMORIA, rama=None, obtener_sesion=None, limite_memoria=LIMITE_MEMORIA):
+        self.url = f"{base_url.rstrip('/')}/repos/{nombre_repo}/contents"
+        self.rama = rama
+        self.carpeta_cache = carpeta_cache
+        self.vigencia = vigencia
+        if obtener_sesion is None:
+            import requests
+
+            sesion = requests.Session()
+            if token:
+                sesion.headers['Authorization'] = f"token {token}"
+            obtener_sesion = lambda: sesion
+        # La sesión se pide en cada consulta, así una reconexión compartida se usa enseguida
+        self._obtener_sesion = obtener_sesion
+        # path -> (momento, contenido), del usado hace más tiempo al más reciente
+        self._memoria = OrderedDict()
+        self._bytes_memoria = 0
+        self.limite_memoria = limite_memoria
+        self._lock = threading.Lock()
+        os.makedirs(self.carpeta_cache, exist_ok=True)
+
+    # Funciones para guardar y descartar copias en memoria (con el lock tomado)
+    def _recordar(self, path, momento, contenido):
+        self._olvidar(path)
+        self._memoria[path] = (momento, contenido)
+        self._bytes_memoria += len(contenido or b'')
+        while self._bytes_memoria > self.limite_memoria and len(self._memoria) > 1:
+            self._olvidar(next(iter(self._memoria)))
+
+    def _olvidar(self, path):
+        _, contenido = self._memoria.pop(path, (0.0, None))
+        self._bytes_memoria -= len(contenido or b'')
+
+    def _ruta_cache(self, path):
+        return os.path.join(self.carpeta_cache, hashlib.sha1(path.encode('utf-8')).hexdigest())
+
+    def _leer_cache(self, path):
+        try:
+            with open(self._ruta_cache(path) + '.etag', 'r', encoding='utf-8') as file:
+                etag = file.read().strip()
+            with open(self._ruta_cache(path) + '.bin', 'rb') as file:
+                return etag, file.read()
+        except FileNotFoundError:
+            return None, None
+
+    def _guardar_cache(self, path, etag, contenido):
+        ruta = self._ruta_cache(path)
+        for extension, datos in (('.bin', contenido), ('.etag', etag.encode('utf-8'))):
+            temporal = f"{ruta}{extension}.{uuid.uuid4().hex}.tmp"
+            with open(temporal, 'wb') as file:
+                file.write(datos)
+            os.replace(temporal, ruta + extension)
+
+    # Función para leer un archivo o carpeta del repositorio con validación por ETag (sirve para cualquier path).
+    # Devuelve los bytes (o None si no existe); un 304 no descuenta del límite de la API.
+    def obtener(self, path, raw=True):
+        with self._lock:
+            momento, contenido = self._memoria.get(path, (0.0, None))
+            if path in self._memoria:
+                self._memoria.move_to_end(path)
+        if time.monotonic() - momento < self.vigencia:
+            return contenido
+
+        etag, guardado = self._leer_cache(path)
+        encabezados = {'Accept': 'application/vnd.github.raw' if raw else 'application/vnd.github+json'}
+        if etag:
+            encabezados['If-None-Match'] = etag
+        parametros = {'ref': self.rama} if self.rama else None
+
+        respuesta = self._obtener_sesion().get(f"{self.url}/{path}", headers=encabezados, params=parametros, timeout=30)
+        if respuesta.status_code == 304:
+            contenido = guardado
+        elif respuesta.status_code == 404:
+            contenido = None
+        else:
+            respuesta.raise_for_status()
+            contenido = respuesta.content
+            if respuesta.headers.get('ETag'):
+                self._guardar_cache(path, respuesta.headers['ETag'], contenido)
+
+        with self._lock:
+            self._recordar(path, time.monotonic(), contenido)
+        return contenido
+
+    # Función para descartar la copia en memoria de los paths que cambiaron (None = todos)
+    def invalidar(self, paths=None):
+        with self._lock:
+            if paths is None:
+                self._memoria.clear()
+                self._bytes_memoria = 0
+                return
+            for path in paths:
+                if path.startswith(f"{CARPETA_INDICE}/"):
+                    self._olvidar(path)
+                    self._olvidar(CARPETA_INDICE)
+
+    # Función para listar los meses que tienen índice, del más reciente al más antiguo
+    def meses(self):
+        listado = self.obtener(CARPETA_INDICE, raw=False)
+        if not listado:
+            return []
+        nombres = [entrada['name'] for entrada in json.loads(listado) if entrada.get('type') == 'file']
+        meses = sorted((nombre[:-6] for nombre in nombres if re.fullmatch(r'\d{4}-\d{2}\.jsonl', nombre)), reverse=True)
+        if f"{SIN_FECHA}.jsonl" in nombres:
+            meses.append(SIN_FECHA)
+        return meses
+
+    # Función para leer los remitos de un mes (AAAA-MM)
+    def leer_mes(self, mes):
+        contenido = self.obtener(f"{CARPETA_INDICE}/{mes}.jsonl")
+        return leer_lineas(contenido) if contenido else []
+
+
+# Función para filtrar y paginar registros del índice (del número más alto al más bajo)
+def buscar(registros, cliente='', pagina=1, por_pagina=50):
+    cliente = cliente.strip().lower()
+    if cliente:
+        registros = [registro for registro in registros if cliente in registro['cliente'].lower()]
+    registros = sorted(registros, key=lambda registro: registro['numero'], reverse=True)
+    inicio = (max(1, pagina) - 1) * por_pagina
+    return registros[inicio:inicio + por_pagina], len(registros)
+
+
+# Una sola instancia por proceso, compartida por todas las sesiones de Streamlit
+_indice = None
+_indice_lock = threading.Lock()
+
+
+# Función para obtener el índice del proceso
+def obtener_indice(token, nombre_repo, base_url='https://api.github.com', obtener_sesion=None):
+    global _indice
+    with _indice_lock:
+        if _indice is None:
+            _indice = IndiceRemitos(token, nombre_repo, base_url, obtener_sesion=obtener_sesion)
+        return _indice
+
+
+# Función para armar el índice completo a partir de los registros, los PDFs y los CSV mensuales ya subidos
+# (se usa una sola vez, para los remitos anteriores al índice, o si el índice se pierde)
+def reconstruir_indice(repo):
+    import io
+
+    import pandas as pd
+
+    from publicacion_github import PublicadorCommits
+    from registro_remito import CARPETA_REGISTROS
+
+    datos = {}
+    pdfs = {}
+    registros = {}
+    for archivo in repo.get_contents(""):
+        if archivo.name == CARPETA_REGISTROS and archivo.type == 'dir':
+            # Los registros traen todos los datos del remito: no hace falta buscarlos en los CSV
+            for carpeta in repo.get_contents(archivo.path):
+                for parte in repo.get_contents(carpeta.path):
+                    if re.fullmatch(r'remito_\d+\.json', parte.name):
+                        registros[int(parte.name[7:-5])] = parte
+        elif re.fullmatch(r'remito_\d+\.pdf', archivo.name):
+            pdfs[int(archivo.name[7:-4])] = archivo
+        elif re.fullmatch(r'remitos_\d{4}-\d{2}\.csv', archivo.name):
+            df = pd.read_csv(io.BytesIO(archivo.decoded_content), sep=';', encoding='utf-8-sig', dtype=str, keep_default_na=False)
+            for fila in df.to_dict('records'):
+                datos[int(fila['Número de Remito'])] = fila
+
+    meses = {}
+    for numero, archivo in sorted(pdfs.items()):
+        if numero in registros:
+            continue
+        fila = datos.get(numero, {})
+        registro = {
+            'numero': numero,
+            'fecha': fila.get('Fecha', ''),
+            'cliente': fila.get('Cliente', ''),
+            'total_centavos': a_centavos(fila.get('Total Importe') or 0),
+            'path': archivo.path,
+            'sha': archivo.sha,
+            'bytes': archivo.size,
+        }
+        path = ruta_indice(registro['fecha']) if registro['fecha'] else f"{CARPETA_INDICE}/{SIN_FECHA}.jsonl"
+        meses[path] = meses.get(path, b'') + linea_indice(registro)
+    for numero, archivo in sorted(registros.items()):
+        datos_registro = json.loads(archivo.decoded_content)
+        registro = {
+            'numero': numero,
+            'fecha': datos_registro['fecha'],
+            'cliente': datos_registro['cliente'],
+            'total_centavos': datos_registro['total'],
+            'path': archivo.path,
+            'sha': archivo.sha,
+            'bytes': archivo.size,
+        }
+        path = ruta_indice(registro['fecha'])
+        meses[path] = meses.get(path, b'') + linea_indice(registro)
+
+    cantidad = len(set(pdfs) | set(registros))
+    PublicadorCommits(repo).publicar(meses, f"Reconstruye el índice de remitos ({cantidad} remitos)")
+    return {path: contenido.count(b'\n') for path, contenido in meses.items()}
+
+
+if __name__ == '__main__':
+    from github import Github
+
+    parser = argparse.ArgumentParser(description="Reconstruye el índice de remitos a partir de los archivos del repositorio.")
+    parser.add_argument('--repo', default="jgonzalohernandez/ArchivosGenerados")
+    parser.add_argument('--api', default=os.getenv('GITHUB_API_URL', 'https://api.github.com'))
+    args = parser.parse_args()
+
+    repo = Github(os.getenv('PAT_GITHUB'), base_url=args.api).get_repo(args.repo)
+    for path, cantidad in sorted(reconstruir_indice(repo).items()):
+        print(f"{path}: {cantidad} remitos")
@@ -0,0 +1,566 @@
+import argparse
+import glob
+import io
+import json
+import os
+import threading
+import time
+import uuid
+from contextlib import ExitStack
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+
+from numeracion_remitos import bloqueo_archivo
+
+# Libro de remitos en columnas: una tabla de remitos (encabezado) y otra de
+# ítems (una fila por dirección), guardadas como segmentos Parquet por mes:
+#   libro/remitos/mes=AAAA-MM/<marca>-<id>.parquet
+#   libro/items/mes=AAAA-MM/<marca>-<id>.parquet
+# Cada alta escribe un segmento nuevo (nunca se reescribe uno existente) y cuando
+# un mes junta muchos segmentos se compactan en uno solo. El CSV mensual de
+# siempre se arma a partir del libro y queda como formato de exportación.
+#
+# Los meses cerrados se pasan a un archivo anual, un Parquet por año y por tabla
+# con un grupo de filas por mes:
+#   libro/archivo/remitos_AAAA.parquet, libro/archivo/items_AAAA.parquet
+#   libro/archivo/catalogo.json
+# El catálogo guarda el mínimo y el máximo de la fecha, el número y el cliente de
+# cada archivo y de cada grupo, así una consulta por fechas o por cliente abre
+# sólo los archivos y los grupos que pueden tener lo que busca.
+
+CARPETA_LIBRO = os.getenv('REMITOS_LIBRO', 'libro')
+SEGMENTOS_POR_COMPACTAR = 32
+CARPETA_ARCHIVO = 'archivo'
+FORMATO_CATALOGO = 1
+
+# Columnas con mínimo y máximo en el catálogo, por tabla
+COLUMNAS_CATALOGO = {
+    'remitos': ('fecha', 'numero', 'cliente'),
+    'items': ('fecha', 'numero'),
+}
+
+# Esquemas de las tablas; se arman la primera vez que se usan para no importar pyarrow al arrancar la app
+_esquemas = {}
+
+
+# Función para obtener el esquema de Arrow de una tabla ('remitos' o 'items')
+def esquema(tabla):
+    if not _esquemas:
+        import pyarrow as pa
+
+        moneda = pa.decimal128(14, 2)
+        _esquemas.update({
+            'remitos': pa.schema([
+                ('numero', pa.int64()),
+                ('fecha', pa.date32()),
+                ('cliente', pa.string()),
+                ('domicilio', pa.string()),
+                ('sector', pa.string()),
+                ('solicitante', pa.string()),
+                ('moto', pa.string()),
+                ('lluvia', pa.bool_()),
+                ('exclusividad', pa.bool_()),
+                ('cantidad_bultos', pa.int32()),
+                ('total', moneda),
+                ('registrado', pa.timestamp('ms')),
+            ]),
+            'items': pa.schema([
+                ('numero', pa.int64()),
+                ('fecha', pa.date32()),
+                ('orden', pa.int16()),
+                ('direccion', pa.string()),
+                ('monto', moneda),
+            ]),
+        })
+    return _esquemas[tabla]
+
+
+# Función para convertir un importe a Decimal con dos decimales
+def a_moneda(valor):
+    return Decimal(str(valor)).quantize(Decimal('0.01'))
+
+
+def a_fecha(fecha):
+    if isinstance(fecha, datetime):
+        return fecha.date()
+    if isinstance(fecha, date):
+        return fecha
+    return datetime.strptime(str(fecha)[:10], '%Y-%m-%d').date()
+
+
+# Función para obtener el primer día de un mes (AAAA-MM) y el primer día del mes siguiente
+def limites_mes(mes):
+    anio, numero_mes = (int(parte) for parte in mes.split('-'))
+    return date(anio, numero_mes, 1), date(anio + numero_mes // 12, numero_mes % 12 + 1, 1)
+
+
+# Función para calcular el mínimo y el máximo de las columnas del catálogo (valores JSON: fechas como texto)
+def estadisticas(tabla, nombre_tabla):
+    import pyarrow.compute as pc
+
+    minimos = {}
+    maximos = {}
+    for columna in COLUMNAS_CATALOGO[nombre_tabla]:
+        extremos = pc.min_max(tabla[columna]).as_py()
+        minimos[columna], maximos[columna] = (valor.isoformat() if isinstance(valor, date) else valor for valor in (extremos['min'], extremos['max']))
+    return {'filas': tabla.num_rows, 'min': minimos, 'max': maximos}
+
+
+# Función para saber si un archivo o un grupo del catálogo puede tener filas del filtro
+def puede_tener(datos, desde=None, hasta=None, cliente=None, numeros=None):
+    if not datos['filas']:
+        return False
+    minimos, maximos = datos['min'], datos['max']
+    if desde is not None and maximos['fecha'] < desde.isoformat():
+        return False
+    if hasta is not None and minimos['fecha'] > hasta.isoformat():
+        return False
+    if cliente is not None and 'cliente' in minimos and not (minimos['cliente'] or '') <= cliente <= (maximos['cliente'] or ''):
+        return False
+    if numeros is not None and (not numeros or numeros[-1] < minimos['numero'] or numeros[0] > maximos['numero']):
+        return False
+    return True
+
+
+# Función para armar el registro de un remito para el libro (mismos datos que la fila del CSV)
+def remito_libro(remito_numero, fecha, cliente, domicilio, sector, solicitante, moto, detalle, total_importe, lluvia, exclusividad, cantidad_bultos):
+    if hasattr(detalle, 'to_dict'):
+        detalle = detalle.to_dict('records')
+    return {
+        'numero': int(remito_numero),
+        'fecha': a_fecha(fecha),
+        'cliente': cliente,
+        'domicilio': domicilio,
+        'sector': sector,
+        'solicitante': solicitante,
+        'moto': moto,
+        'lluvia': bool(lluvia),
+        'exclusividad': bool(exclusividad),
+        'cantidad_bultos': int(cantidad_bultos),
+        'total': a_moneda(total_importe),
+        'detalle': [(item['Dirección'], a_moneda(item['Monto'])) for item in detalle],
+    }
+
+
+# Función para armar la fila del CSV mensual (una columna por dirección y monto) de un remito del libro
+def fila_csv(remito, detalle):
+    fila = {
+        'Fecha': remito['fecha'].strftime('%Y-%m-%d'),
+        'Número de Remito': remito['numero'],
+        'Cliente': remito['cliente'],
+        'Domicilio': remito['domicilio'],
+        'Sector': remito['sector'],
+        'Solicitante': remito['solicitante'],
+        'Moto': remito['moto'],
+        'Total Importe': remito['total'],
+        'Lluvia': 'Sí' if remito['lluvia'] else 'No',
+        'Exclusividad': 'Sí' if remito['exclusividad'] else 'No',
+        'Cantidad de Bultos': remito['cantidad_bultos'],
+    }
+    for orden, (direccion, monto) in enumerate(detalle, start=1):
+        fila[f'Dirección {orden}'] = direccion
+        fila[f'Monto {orden}'] = monto
+    return fila
+
+
+# Función para escribir las filas en el formato del CSV mensual (separado por ';', utf-8 con BOM)
+def csv_mensual(filas):
+    import pandas as pd
+
+    return pd.DataFrame(filas).to_csv(index=False, sep=';').encode('utf-8-sig')
+
+
+# Función para leer los remitos de un CSV mensual (ruta o bytes) como registros del libro
+def remitos_csv(origen):
+    import pandas as pd
+
+    if isinstance(origen, bytes):
+        origen = io.BytesIO(origen)
+    df = pd.read_csv(origen, sep=';', encoding='utf-8-sig', dtype=str, keep_default_na=False)
+    remitos = []
+    for fila in df.to_dict('records'):
+        detalle = []
+        i = 1
+        while f'Dirección {i}' in fila:
+            if fila[f'Dirección {i}'] or fila.get(f'Monto {i}'):
+                detalle.append({'Dirección': fila[f'Dirección {i}'], 'Monto': fila.get(f'Monto {i}') or 0})
+            i += 1
+        remitos.append(remito_libro(
+            fila['Número de Remito'], fila['Fecha'], fila['Cliente'], fila['Domicilio'], fila['Sector'],
+            fila['Solicitante'], fila['Moto'], detalle, fila['Total Importe'] or 0,
+            fila.get('Lluvia') == 'Sí', fila.get('Exclusividad') == 'Sí', int(float(fila.get('Cantidad de Bultos') or 0))))
+    return remitos
+
+
+# Exportación e importación del CSV mensual, común a todos los libros (sólo usa leer y agregar)
+class ExportacionCSV:
+    # Función para armar el CSV mensual de siempre (una columna por dirección y monto) a partir del libro
+    def exportar_csv(self, mes, csv_path=None):
+        primer_dia, siguiente = limites_mes(mes)
+        ultimo_dia = siguiente - timedelta(days=1)
+        # Los remitos registrados juntos van por número (el archivo anual no conserva el orden de las filas)
+        remitos = self.leer(primer_dia, ultimo_dia, 'remitos').sort_by([('registrado', 'ascending'), ('numero', 'ascending')]).to_pylist()
+        items = {}
+        for item in self.leer(primer_dia, ultimo_dia, 'items').sort_by([('numero', 'ascending'), ('orden', 'ascending')]).to_pylist():
+            items.setdefault(item['numero'], []).append(item)
+
+        filas = [fila_csv(remito, [(item['direccion'], item['monto']) for item in items.get(remito['numero'], [])]) for remito in remitos]
+
+        contenido = csv_mensual(filas)
+        if csv_path:
+            with open(csv_path, 'wb') as file:
+                file.write(contenido)
+        return contenido
+
+    # Función para pasar al libro un CSV mensual con el formato anterior
+    def importar_csv(self, csv_path):
+        remitos = remitos_csv(csv_path)
+        self.agregar(remitos)
+        return len(remitos)
+
+
+class LibroRemitos(ExportacionCSV):
+    def __init__(self, carpeta=CARPETA_LIBRO, segmentos_por_compactar=SEGMENTOS_POR_COMPACTAR):
+        self.carpeta = carpeta
+        self.segmentos_por_compactar = segmentos_por_compactar
+        self._lock = threading.Lock()
+        self._catalogo = (None, None)
+        # Archivos y grupos del archivo anual que leyó o salteó la última lectura
+        self.ultima_lectura = {}
+
+    def _carpeta_mes(self, tabla, mes):
+        return os.path.join(self.carpeta, tabla, f"mes={mes}")
+
+    def _segmentos(self, tabla, mes):
+        return sorted(glob.glob(os.path.join(self._carpeta_mes(tabla, mes), '*.parquet')))
+
+    def _escribir_segmento(self, tabla, mes, filas, marca):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        carpeta = self._carpeta_mes(tabla, mes)
+        os.makedirs(carpeta, exist_ok=True)
+        ruta = os.path.join(carpeta, f"{marca}.parquet")
+        temporal = f"{ruta}.{uuid.uuid4().hex}.tmp"
+        pq.write_table(pa.Table.from_pylist(filas, schema=esquema(tabla)), temporal, compression='zstd')
+        os.replace(temporal, ruta)
+
+    # Función para listar los meses que todavía tienen segmentos (los que no pasaron al archivo anual)
+    def _meses_vivos(self):
+        carpeta = os.path.join(self.carpeta, 'remitos')
+        if not os.path.isdir(carpeta):
+            return []
+        return sorted(nombre[4:] for nombre in os.listdir(carpeta) if nombre.startswith('mes=') and self._segmentos('remitos', nombre[4:]))
+
+    # Función para listar los meses (AAAA-MM) que tienen remitos en el libro (en segmentos o en el archivo anual)
+    def meses(self):
+        archivados = {grupo['mes'] for datos in self.catalogo()['archivos'].values() if datos['tabla'] == 'remitos'
+                      for grupo in datos['grupos'] if grupo['filas']}
+        return sorted(archivados | set(self._meses_vivos()))
+
+    def _ruta_archivo(self, nombre):
+        return os.path.join(self.carpeta, CARPETA_ARCHIVO, nombre)
+
+    # Función para leer el catálogo del archivo anual (se vuelve a leer sólo si cambió)
+    def catalogo(self):
+        ruta = self._ruta_archivo('catalogo.json')
+        try:
+            modificado = os.stat(ruta).st_mtime_ns
+        except FileNotFoundError:
+            return {'formato': FORMATO_CATALOGO, 'archivos': {}}
+        if self._catalogo[0] != modificado:
+            with open(ruta, 'r', encoding='utf-8') as file:
+                self._catalogo = (modificado, json.load(file))
+        return self._catalogo[1]
+
+    def _guardar_catalogo(self, catalogo):
+        ruta = self._ruta_archivo('catalogo.json')
+        temporal = f"{ruta}.{uuid.uuid4().hex}.tmp"
+        with open(temporal, 'w', encoding='utf-8') as file:
+            json.dump(catalogo, file, ensure_ascii=False, indent=1, sort_keys=True)
+        os.replace(temporal, ruta)
+
+    # Función para escribir el archivo de un año (un grupo de filas por mes); devuelve sus datos para el catálogo
+    def _escribir_archivo(self, tabla, anio, filas):
+        import pyarrow.compute as pc
+        import pyarrow.parquet as pq
+
+        nombre = f"{tabla}_{anio}.parquet"
+        ruta = self._ruta_archivo(nombre)
+        temporal = f"{ruta}.{uuid.uuid4().hex}.tmp"
+        # Los remitos de cada mes van por cliente (quedan juntos los de un mismo cliente) y los ítems por número
+        orden = [('cliente', 'ascending'), ('fecha', 'ascending'), ('numero', 'ascending')] if tabla == 'remitos' \
+            else [('numero', 'ascending'), ('orden', 'ascending')]
+        grupos = []
+        with pq.ParquetWriter(temporal, esquema(tabla), compression='zstd', compression_level=9) as escritor:
+            for numero_mes in range(1, 13):
+                mes = f"{anio}-{numero_mes:02d}"
+                primer_dia, siguiente = limites_mes(mes)
+                filas_mes = filas.filter(pc.and_(pc.greater_equal(filas['fecha'], primer_dia), pc.less(filas['fecha'], siguiente)))
+                if not filas_mes.num_rows:
+                    continue
+                escritor.write_table(filas_mes.sort_by(orden), row_group_size=filas_mes.num_rows)
+                grupos.append(dict(estadisticas(filas_mes, tabla), mes=mes))
+        os.replace(temporal, ruta)
+        return dict(estadisticas(filas, tabla), tabla=tabla, anio=anio, bytes=os.path.getsize(ruta), grupos=grupos)
+
+    # Función para leer un archivo anual completo (vacío si el año todavía no tiene archivo)
+    def _leer_archivo(self, tabla, anio):
+        import pyarrow.parquet as pq
+
+        ruta = self._ruta_archivo(f"{tabla}_{anio}.parquet")
+        if not os.path.exists(ruta):
+            return esquema(tabla).empty_table()
+        return pq.read_table(ruta, schema=esquema(tabla))
+
+    # Función para pasar los meses cerrados (anteriores a hasta_mes, por defecto el mes actual) al archivo anual.
+    # Devuelve, por año, los bytes que ocupaban los segmentos y los que ocupa el archivo.
+    def archivar(self, hasta_mes=None):
+        import pyarrow as pa
+        import pyarrow.compute as pc
+
+        hasta_mes = hasta_mes or datetime.now().strftime('%Y-%m')
+        os.makedirs(self._ruta_archivo(''), exist_ok=True)
+        resultado = {}
+        with bloqueo_archivo(self._ruta_archivo('archivar')):
+            catalogo = self.catalogo()
+            meses = [mes for mes in self._meses_vivos() if mes < hasta_mes]
+            for anio in sorted({mes[:4] for mes in meses}):
+                meses_anio = [mes for mes in meses if mes[:4] == anio]
+                # Los meses del año quedan bloqueados para compactar desde que se listan sus segmentos hasta
+                # que se borran; los que lleguen mientras tanto son segmentos nuevos y quedan sin archivar
+                with ExitStack() as bloqueos:
+                    for mes in meses_anio:
+                        bloqueos.enter_context(bloqueo_archivo(os.path.join(self.carpeta, f"compactar-{mes}")))
+                    segmentos = {tabla: [archivo for mes in meses_anio for archivo in self._segmentos(tabla, mes)] for tabla in ('items', 'remitos')}
+                    antes = sum(os.path.getsize(archivo) for archivos in segmentos.values() for archivo in archivos)
+                    despues = 0
+                    for tabla in ('items', 'remitos'):
+                        nuevas = self._leer_segmentos(tabla, segmentos[tabla])
+                        # Lo que está en los segmentos es más nuevo que lo archivado: reemplaza los números que se repiten
+                        anteriores = self._leer_archivo(tabla, anio)
+                        anteriores = anteriores.filter(pc.invert(pc.is_in(anteriores['numero'], nuevas['numero'])))
+                        antes += catalogo['archivos'].get(f"{tabla}_{anio}.parquet", {}).get('bytes', 0)
+                        datos = self._escribir_archivo(tabla, anio, pa.concat_tables([anteriores, nuevas]))
+                        catalogo['archivos'][f"{tabla}_{anio}.parquet"] = datos
+                        despues += datos['bytes']
+                    self._guardar_catalogo(catalogo)
+
+                    # Recién con el catálogo guardado se borran los segmentos archivados
+                    for archivos in segmentos.values():
+                        for archivo in archivos:
+                            os.remove(archivo)
+                resultado[anio] = {'meses': meses_anio, 'bytes_segmentos': antes, 'bytes_archivo': despues}
+        return resultado
+
+    # Función para leer del archivo anual sólo los archivos y grupos de filas que pueden tener filas del filtro
+    def _leer_archivados(self, tabla, nombres, desde=None, hasta=None, cliente=None, numeros=None):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        lectura = {'archivos_leidos': 0, 'archivos_salteados': 0, 'grupos_leidos': 0, 'grupos_salteados': 0}
+        partes = []
+        for nombre, datos in sorted(self.catalogo()['archivos'].items()):
+            if datos['tabla'] != tabla:
+                continue
+            grupos = [indice for indice, grupo in enumerate(datos['grupos']) if puede_tener(grupo, desde, hasta, cliente, numeros)]
+            if not puede_tener(datos, desde, hasta, cliente, numeros) or not grupos:
+                lectura['archivos_salteados'] += 1
+                lectura['grupos_salteados'] += len(datos['grupos'])
+                continue
+            lectura['archivos_leidos'] += 1
+            lectura['grupos_leidos'] += len(grupos)
+            lectura['grupos_salteados'] += len(datos['grupos']) - len(grupos)
+            partes.append(pq.ParquetFile(self._ruta_archivo(nombre)).read_row_groups(grupos, columns=nombres))
+        self.ultima_lectura = lectura
+        if not partes:
+            return esquema(tabla).empty_table().select(nombres)
+        return pa.concat_tables(partes)
+
+    # Función para filtrar una tabla por fechas, cliente y números (lo que el catálogo no alcanza a descartar)
+    def _filtrar(self, tabla, desde=None, hasta=None, cliente=None, numeros=None):
+        import pyarrow as pa
+        import pyarrow.compute as pc
+
+        condiciones = []
+        if desde is not None:
+            condiciones.append(pc.greater_equal(tabla['fecha'], desde))
+        if hasta is not None:
+            condiciones.append(pc.less_equal(tabla['fecha'], hasta))
+        if cliente is not None:
+            condiciones.append(pc.equal(tabla['cliente'], cliente))
+        if numeros is not None:
+            condiciones.append(pc.is_in(tabla['numero'], pa.array(numeros, pa.int64())))
+        for condicion in condiciones:
+            tabla = tabla.filter(condicion)
+        return tabla
+
+    # Función para agregar remitos al libro: un segmento nuevo por mes y por tabla
+    def agregar(self, remitos):
+        por_mes = {}
+        for remito in remitos:
+            por_mes.setdefault(remito['fecha'].strftime('%Y-%m'), []).append(remito)
+
+        registrado = datetime.now()
+        for mes, remitos_mes in por_mes.items():
+            encabezados = [dict((campo, remito[campo]) for campo in esquema('remitos').names if campo != 'registrado') for remito in remitos_mes]
+            for encabezado in encabezados:
+                encabezado['registrado'] = registrado
+            items = [
+                {'numero': remito['numero'], 'fecha': remito['fecha'], 'orden': orden, 'direccion': direccion, 'monto': monto}
+                for remito in remitos_mes for orden, (direccion, monto) in enumerate(remito['detalle'], start=1)
+            ]
+            # La marca ordena los segmentos por antigüedad; los ítems se escriben antes que el encabezado
+            marca = f"{time.time_ns():020d}-{uuid.uuid4().hex[:8]}"
+            with self._lock:
+                self._escribir_segmento('items', mes, items, marca)
+                self._escribir_segmento('remitos', mes, encabezados, marca)
+            if len(self._segmentos('remitos', mes)) > self.segmentos_por_compactar:
+                self.compactar(mes)
+
+    # Función para leer segmentos y quedarse con la última versión de cada remito
+    def _leer_segmentos(self, tabla, archivos, filtro=None, columnas=None):
+        import pyarrow as pa
+        import pyarrow.dataset as ds
+
+        nombres = esquema(tabla).names if columnas is None else list(dict.fromkeys(['numero'] + columnas))
+        if not archivos:
+            return esquema(tabla).empty_table().select(columnas or nombres)
+
+        # Todos los segmentos se leen en una sola pasada; el nombre del archivo dice qué tan nuevo es
+        orden = {archivo: indice for indice, archivo in enumerate(sorted(set(archivos), key=os.path.basename))}
+        escaner = ds.dataset(archivos, schema=esquema(tabla), format='parquet').scanner(columns=nombres, filter=filtro)
+        lotes = []
+        for lote in escaner.scan_batches():
+            segmento = pa.array([orden[lote.fragment.path]] * lote.record_batch.num_rows, pa.int32())
+            lotes.append(lote.record_batch.append_column('_segmento', segmento))
+        if not lotes:
+            return esquema(tabla).empty_table().select(columnas or nombres)
+        tabla_completa = pa.Table.from_batches(lotes)
+
+        # Si un número se volvió a registrar, vale el segmento más nuevo
+        ultimos = tabla_completa.group_by('numero').aggregate([('_segmento', 'max')])
+        if ultimos.num_rows != tabla_completa.num_rows or tabla == 'items':
+            tabla_completa = tabla_completa.join(ultimos, keys=['numero', '_segmento'], right_keys=['numero', '_segmento_max'],
+                                                 join_type='inner')
+        return tabla_completa.select(columnas or nombres)
+
+    # Función para juntar los segmentos de un mes (o de todos) en uno solo
+    def compactar(self, mes=None):
+        import pyarrow.parquet as pq
+
+        for mes_actual in ([mes] if mes else self._meses_vivos()):
+            with bloqueo_archivo(os.path.join(self.carpeta, f"compactar-{mes_actual}")):
+                remitos = self._segmentos('remitos', mes_actual)
+                if len(remitos) <= 1:
+                    continue
+                marca = os.path.basename(remitos[-1])[:-len('.parquet')]
+                for tabla in ('items', 'remitos'):
+                    archivos = [archivo for archivo in self._segmentos(tabla, mes_actual) if os.path.basename(archivo) <= f"{marca}.parquet"]
+                    compacta = self._leer_segmentos(tabla, archivos).sort_by([('numero', 'ascending')] + ([('orden', 'ascending')] if tabla == 'items' else []))
+                    # El compactado reemplaza al segmento más nuevo que incluye, así conserva su lugar en el orden
+                    ruta = os.path.join(self._carpeta_mes(tabla, mes_actual), f"{marca}.parquet")
+                    temporal = f"{ruta}.{uuid.uuid4().hex}.tmp"
+                    pq.write_table(compacta, temporal, compression='zstd')
+                    os.replace(temporal, ruta)
+                    for archivo in archivos:
+                        if archivo != ruta:
+                            os.remove(archivo)
+
+    # Función para leer una tabla ('remitos' o 'items') entre dos fechas (inclusive) como tabla de Arrow,
+    # opcionalmente sólo de un cliente; los meses archivados se leen del archivo anual
+    def leer(self, desde=None, hasta=None, tabla='remitos', columnas=None, cliente=None):
+        import pyarrow as pa
+        import pyarrow.compute as pc
+        import pyarrow.dataset as ds
+
+        desde = a_fecha(desde) if desde else None
+        hasta = a_fecha(hasta) if hasta else None
+        nombres = columnas or esquema(tabla).names
+
+        # Los ítems no tienen cliente: se filtran por los números de los remitos del cliente
+        numeros = None
+        if cliente is not None and tabla == 'items':
+            numeros = sorted(self.leer(desde, hasta, 'remitos', ['numero'], cliente)['numero'].to_pylist())
+            cliente = None
+        internas = list(dict.fromkeys(['numero', 'fecha'] + (['cliente'] if cliente is not None else []) + list(nombres)))
+
+        meses = [mes for mes in self._meses_vivos()
+                 if (desde is None or mes >= desde.strftime('%Y-%m')) and (hasta is None or mes <= hasta.strftime('%Y-%m'))]
+        condiciones = []
+        if desde is not None:
+            condiciones.append(ds.field('fecha') >= desde)
+        if hasta is not None:
+            condiciones.append(ds.field('fecha') <= hasta)
+        if cliente is not None:
+            condiciones.append(ds.field('cliente') == cliente)
+        if numeros is not None:
+            condiciones.append(ds.field('numero').isin(numeros))
+        filtro = None
+        for condicion in condiciones:
+            filtro = condicion if filtro is None else filtro & condicion
+
+        for intento in range(3):
+            archivos = [archivo for mes in meses for archivo in self._segmentos(tabla, mes)]
+            try:
+                vivas = self._leer_segmentos(tabla, archivos, filtro, internas)
+                break
+            except FileNotFoundError:
+                # Una compactación (o el archivo anual) borró un segmento entre el listado y la lectura
+                continue
+        else:
+            vivas = self._leer_segmentos(tabla, [archivo for mes in meses for archivo in self._segmentos(tabla, mes)], filtro, internas)
+
+        archivadas = self._filtrar(self._leer_archivados(tabla, internas, desde, hasta, cliente, numeros), desde, hasta, cliente, numeros)
+        if not archivadas.num_rows:
+            return vivas.select(nombres)
+        if vivas.num_rows:
+            # Un número que se volvió a registrar después de archivar su mes: vale el de los segmentos
+            archivadas = archivadas.filter(pc.invert(pc.is_in(archivadas['numero'], vivas['numero'])))
+        return pa.concat_tables([archivadas, vivas]).select(nombres)
+
+
+if __name__ == '__main__':
+    import pyarrow.compute as pc
+
+    parser = argparse.ArgumentParser(description="Administra el libro de remitos en Parquet.")
+    parser.add_argument('--carpeta', default=CARPETA_LIBRO)
+    subcomandos = parser.add_subparsers(dest='comando', required=True)
+    importar = subcomandos.add_parser('importar', help="Carga CSV mensuales con el formato anterior")
+    importar.add_argument('csv', nargs='+')
+    compactar = subcomandos.add_parser('compactar', help="Junta los segmentos de cada mes")
+    compactar.add_argument('--mes', default=None)
+    archivar = subcomandos.add_parser('archivar', help="Pasa los meses cerrados al archivo anual")
+    archivar.add_argument('--hasta-mes', default=None, help="Primer mes que queda sin archivar (AAAA-MM, por defecto el mes actual)")
+    exportar = subcomandos.add_parser('exportar', help="Genera el CSV mensual de un mes")
+    exportar.add_argument('mes')
+    exportar.add_argument('--salida', default=None)
+    resumen = subcomandos.add_parser('resumen', help="Cantidad de remitos y total facturado entre dos fechas")
+    resumen.add_argument('--desde', default=None)
+    resumen.add_argument('--hasta', default=None)
+    resumen.add_argument('--cliente', default=None, help="Sólo los remitos de este cliente")
+    args = parser.parse_args()
+
+    libro = LibroRemitos(args.carpeta)
+    if args.comando == 'importar':
+        for csv_path in args.csv:
+            print(f"{csv_path}: {libro.importar_csv(csv_path)} remitos")
+    elif args.comando == 'compactar':
+        libro.compactar(args.mes)
+    elif args.comando == 'archivar':
+        for anio, datos in libro.archivar(args.hasta_mes).items():
+            print(f"{anio}: {len(datos['meses'])} meses archivados, {datos['bytes_segmentos'] / 1024:.1f} KB -> "
+                  f"{datos['bytes_archivo'] / 1024:.1f} KB")
+    elif args.comando == 'exportar':
+        salida = args.salida or f'remitos_{args.mes}.csv'
+        libro.exportar_csv(args.mes, salida)
+        print(f"CSV generado en {salida}")
+    else:
+        inicio = time.perf_counter()
+        remitos = libro.leer(args.desde, args.hasta, columnas=['numero', 'total'], cliente=args.cliente)
+        total = pc.sum(remitos['total']).as_py() or Decimal('0.00')
+        print(f"{remitos.num_rows} remitos, total ${total} ({(time.perf_counter() - inicio) * 1000:.1f} ms)")
+        if libro.ultima_lectura.get('archivos_leidos') or libro.ultima_lectura.get('archivos_salteados'):
+            lectura = libro.ultima_lectura
+            print(f"Archivo anual: {lectura['archivos_leidos']} archivos leídos y {lectura['archivos_salteados']} salteados, "
+                  f"{lectura['grupos_leidos']} meses leídos y {lectura['grupos_salteados']} salteados")
@@ -0,0 +1,322 @@
+import argparse
+import base64
+import io
+import json
+import os
+import random
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+
+from indice_remitos import leer_lineas, ruta_indice
+from libro_columnar import csv_mensual, fila_csv
+from metricas_remitos import obtener_metricas
+from publicacion_github import ConflictoPublicacion, PublicadorCommits, leer_archivo
+from registro_remito import es_registro, leer_registro
+
+# Publicación del libro en GitHub sin volver a subir el CSV del mes entero. La
+# parte de cada remito es su registro (registros/AAAA-MM/remito_<numero>.json),
+# que el índice del mes lista con su sha. Cada tanto se consolida el mes en
+# remitos_AAAA-MM.csv con los registros que todavía no estaban; los registros
+# quedan, porque de ellos se arma el PDF. Quien lee el mes junta el CSV
+# consolidado con los registros del índice que todavía no entraron.
+
+# Cada cuántos registros propios de un mes se consolida el mes en curso
+PARTES_POR_CONSOLIDAR = int(os.getenv('REMITOS_PARTES_POR_CONSOLIDAR', '200'))
+
+# Meses que este equipo ya cerró (consolidó al empezar el mes siguiente), para no volver a cerrarlos al reiniciar
+ARCHIVO_MESES_CERRADOS = os.getenv('REMITOS_MESES_CERRADOS', '.meses_cerrados.json')
+
+
+def ruta_consolidado(mes):
+    return f'remitos_{mes}.csv'
+
+
+# Carpeta de las partes que se subían aparte del registro: se consolidan y se borran
+def carpeta_partes(mes):
+    return f'remitos_{mes}'
+
+
+# Función para leer una parte anterior a los registros y devolver el remito con los tipos del libro
+def leer_parte(contenido):
+    remito = json.loads(contenido)
+    remito['fecha'] = date.fromisoformat(remito['fecha'])
+    remito['total'] = Decimal(remito['total'])
+    remito['detalle'] = [(direccion, Decimal(monto)) for direccion, monto in remito['detalle']]
+    return remito
+
+
+# Función para leer el registro de un remito y devolverlo con los campos y tipos del libro
+def remito_de_registro(contenido):
+    return leer_registro(contenido).registro_libro()
+
+
+# Función para obtener los números de remito que ya están en el CSV consolidado de un mes
+def numeros_consolidados(consolidado):
+    import pandas as pd
+
+    if not consolidado:
+        return set()
+    df = pd.read_csv(io.BytesIO(consolidado), sep=';', encoding='utf-8-sig', dtype=str, keep_default_na=False,
+                     usecols=['Número de Remito'])
+    return {int(numero) for numero in df['Número de Remito']}
+
+
+# Función para juntar el CSV consolidado del mes con las partes pendientes (la parte manda si se repite el número)
+def unir_mes(consolidado, partes):
+    import pandas as pd
+
+    filas = []
+    if consolidado:
+        df = pd.read_csv(io.BytesIO(consolidado), sep=';', encoding='utf-8-sig', dtype=str, keep_default_na=False)
+        filas = df.to_dict('records')
+    partes = list({parte['numero']: parte for parte in partes}.values())
+    numeros = {parte['numero'] for parte in partes}
+    filas = [fila for fila in filas if int(fila['Número de Remito']) not in numeros]
+    filas += [fila_csv(parte, parte['detalle']) for parte in sorted(partes, key=lambda parte: parte['numero'])]
+    return csv_mensual(filas)
+
+
+# Función para leer, tal como estaban en un commit, el CSV consolidado de un mes, los registros del índice
+# que todavía no están en él y las partes anteriores a los registros (por path)
+def _leer_mes_en(repo, mes, ref):
+    from github import UnknownObjectException
+
+    consolidado = leer_archivo(repo, ruta_consolidado(mes), ref)
+    numeros = numeros_consolidados(consolidado)
+    indice = leer_archivo(repo, ruta_indice(mes), ref)
+    registros = []
+    for linea in leer_lineas(indice) if indice else []:
+        if not es_registro(linea['path']) or linea['numero'] in numeros:
+            continue
+        try:
+            blob = repo.get_git_blob(linea['sha'])
+        except UnknownObjectException:
+            # Publicando de a un archivo, la línea del índice puede llegar antes que el registro
+            continue
+        registros.append(remito_de_registro(base64.b64decode(blob.content)))
+    try:
+        listado = repo.get_contents(carpeta_partes(mes), ref=ref)
+    except UnknownObjectException:
+        listado = []
+    partes = {}
+    for archivo in listado:
+        if archivo.name.endswith('.json'):
+            blob = repo.get_git_blob(archivo.sha)
+            partes[archivo.path] = leer_parte(base64.b64decode(blob.content))
+    return consolidado, registros, partes
+
+
+# Función para consolidar en el CSV mensual los registros que todavía no entraron (y borrar las partes
+# anteriores a los registros); devuelve cuántos remitos se incluyeron. Con menos de minimo no se publica nada.
+# Se lee todo sobre un commit fijo y se publica sólo si la rama sigue ahí; si no, se vuelve a empezar.
+def consolidar_mes(repo, mes, reintentos=5, minimo=1):
+    publicador = PublicadorCommits(repo, reintentos=1)
+    for intento in range(reintentos):
+        base = publicador.leer_rama()
+        consolidado, registros, partes = _leer_mes_en(repo, mes, base.sha)
+        cantidad = len(registros) + len(partes)
+        if not cantidad or cantidad < minimo:
+            return 0
+        cambios = {ruta_consolidado(mes): unir_mes(consolidado, list(partes.values()) + registros)}
+        cambios.update({path: None for path in partes})
+        try:
+            publicador.publicar(cambios, f"Consolida {cantidad} remitos en {ruta_consolidado(mes)}")
+        except ConflictoPublicacion:
+            time.sleep(random.uniform(0, 0.5 * 2 ** intento))
+            continue
+        return cantidad
+    raise ConflictoPublicacion(f"No se pudo consolidar {mes} después de {reintentos} intentos")
+
+
+class ConsolidadorLibro:
+    def __init__(self, obtener_repo, partes_por_consolidar=PARTES_POR_CONSOLIDAR, reconectar=None, archivo_cerrados=ARCHIVO_MESES_CERRADOS,
+                 espera_inicial=2.0, espera_maxima=300.0):
+        self._obtener_repo = obtener_repo
+        self._reconectar = reconectar
+        self._repo = None
+        self.partes_por_consolidar = partes_por_consolidar
+        self.archivo_cerrados = archivo_cerrados
+        self.espera_inicial = espera_inicial
+        self.espera_maxima = espera_maxima
+        # Registros propios publicados por mes desde la última consolidación que terminó bien
+        self._publicadas = {}
+        # Meses por consolidar -> si además hay que cerrarlos; salen de acá recién cuando la consolidación termina bien
+        self._pendientes = {}
+        self._fallas = 0
+        self.ultimo_error = None
+        self._cerrados = self._leer_cerrados()
+        self._metricas = obtener_metricas()
+        self._lock = threading.Lock()
+        self._evento = threading.Event()
+        self._hilo = None
+
+    def _leer_cerrados(self):
+        try:
+            with open(self.archivo_cerrados, 'r', encoding='utf-8') as file:
+                return set(json.load(file))
+        except FileNotFoundError:
+            return set()
+
+    # Función para anotar un mes como cerrado (el archivo se reemplaza entero, nunca queda a medio escribir)
+    def _cerrar(self, mes):
+        with self._lock:
+            self._cerrados.add(mes)
+            self._publicadas.pop(mes, None)
+            temporal = f"{self.archivo_cerrados}.{uuid.uuid4().hex}.tmp"
+            with open(temporal, 'w', encoding='utf-8') as file:
+                json.dump(sorted(self._cerrados), file)
+            os.replace(temporal, self.archivo_cerrados)
+
+    def _conectar(self):
+        if self._repo is None:
+            self._repo = self._obtener_repo()
+        return self._repo
+
+    # Función para recibir los paths que se acaban de subir (se suscribe a la bandeja de salida). Sólo anota el trabajo:
+    # al aparecer un mes cuyo anterior no está cerrado se cierra ese, y cada tantos registros propios se consolida el mes.
+    # Las consolidaciones las hace el hilo del consolidador, sin demorar a la bandeja.
+    def notificar(self, paths):
+        with self._lock:
+            for path in paths:
+                if not es_registro(path):
+                    continue
+                mes = path.split('/')[1]
+                anterior = (datetime.strptime(f"{mes}-01", '%Y-%m-%d') - timedelta(days=1)).strftime('%Y-%m')
+                if anterior not in self._cerrados:
+                    self._pendientes[anterior] = True
+                self._publicadas[mes] = self._publicadas.get(mes, 0) + 1
+                if self._publicadas[mes] >= self.partes_por_consolidar:
+                    self._pendientes.setdefault(mes, False)
+            hay_pendientes = bool(self._pendientes)
+        if hay_pendientes:
+            self._evento.set()
+
+    # Función para consolidar los meses pendientes; devuelve cuántos se consolidaron. Si uno falla queda pendiente
+    # (con sus registros contados) y se deja el resto para el próximo intento.
+    def consolidar_pendientes(self):
+        consolidados = 0
+        while True:
+            with self._lock:
+                if not self._pendientes:
+                    return consolidados
+                mes = min(self._pendientes)
+                cerrar = self._pendientes[mes]
+                publicadas = self._publicadas.get(mes, 0)
+            try:
+                repo = self._conectar()
+                with self._metricas.etapa('consolidacion', mes=mes):
+                    consolidar_mes(repo, mes)
+            except Exception as e:
+                import requests
+                from github import BadCredentialsException
+
+                if isinstance(e, (BadCredentialsException, requests.ConnectionError)):
+                    # Token rotado o sin red: el próximo intento vuelve a leer el token
+                    self._repo = None
+                    if self._reconectar:
+                        self._reconectar()
+                self.ultimo_error = f"{mes}: {type(e).__name__}: {e}"
+                self._fallas += 1
+                return consolidados
+            with self._lock:
+                # Los registros que llegaron mientras se consolidaba siguen contando para la próxima
+                self._publicadas[mes] = max(0, self._publicadas.get(mes, 0) - publicadas)
+                if self._pendientes.get(mes) == cerrar:
+                    del self._pendientes[mes]
+                self._fallas = 0
+                self.ultimo_error = None
+            if cerrar:
+                self._cerrar(mes)
+            consolidados += 1
+
+    def _ciclo(self):
+        while True:
+            self._evento.wait()
+            self._evento.clear()
+            self.consolidar_pendientes()
+            if self._fallas:
+                # Se reintenta con espera creciente (o antes, si llegan registros nuevos)
+                espera = min(self.espera_maxima, self.espera_inicial * 2 ** (self._fallas - 1)) * random.uniform(0.8, 1.2)
+                if not self._evento.wait(espera):
+                    self._evento.set()
+
+    # Función para arrancar el hilo que consolida en segundo plano
+    def iniciar(self):
+        if self._hilo is None or not self._hilo.is_alive():
+            self._hilo = threading.Thread(target=self._ciclo, name="consolidador-libro", daemon=True)
+            self._hilo.start()
+        return self
+
+
+# Un solo consolidador por proceso (se suscribe una vez a la bandeja de salida)
+_consolidador = None
+_consolidador_lock = threading.Lock()
+
+
+# Función para obtener el consolidador del proceso
+def obtener_consolidador(obtener_repo, reconectar=None):
+    global _consolidador
+    with _consolidador_lock:
+        if _consolidador is None:
+            _consolidador = ConsolidadorLibro(obtener_repo, reconectar=reconectar).iniciar()
+        return _consolidador
+
+
+# Registros ya leídos, por sha del blob (un registro con el mismo sha no cambia); se recuerdan los últimos
+# MAXIMO_PARTES_LEIDAS, más o menos lo que queda sin consolidar en los meses que se consultan
+MAXIMO_PARTES_LEIDAS = 5000
+_partes_leidas = OrderedDict()
+_partes_lock = threading.Lock()
+
+
+# Función para leer un registro del índice, de la memoria si ya se leyó; None si todavía no se subió
+def _leer_registro_publicado(cliente, linea):
+    with _partes_lock:
+        if linea['sha'] in _partes_leidas:
+            _partes_leidas.move_to_end(linea['sha'])
+            return _partes_leidas[linea['sha']]
+    contenido = cliente.obtener(linea['path'])
+    if contenido is None:
+        return None
+    remito = remito_de_registro(contenido)
+    with _partes_lock:
+        _partes_leidas[linea['sha']] = remito
+        while len(_partes_leidas) > MAXIMO_PARTES_LEIDAS:
+            _partes_leidas.popitem(last=False)
+    return remito
+
+
+# Función para leer el CSV de un mes publicado en GitHub (consolidado más los registros del índice que todavía
+# no entraron) con un cliente que valide por ETag (IndiceRemitos); pendientes son registros que todavía no se subieron
+def leer_mes_publicado(cliente, mes, pendientes=()):
+    consolidado = cliente.obtener(ruta_consolidado(mes))
+    numeros = numeros_consolidados(consolidado)
+    partes = []
+    for linea in cliente.leer_mes(mes):
+        if not es_registro(linea['path']) or linea['numero'] in numeros:
+            continue
+        remito = _leer_registro_publicado(cliente, linea)
+        if remito is not None:
+            partes.append(remito)
+    partes += [remito_de_registro(contenido) for contenido in pendientes]
+    if consolidado is None and not partes:
+        return None
+    return unir_mes(consolidado, partes)
+
+
+if __name__ == '__main__':
+    from github import Github
+
+    parser = argparse.ArgumentParser(description="Consolida en el CSV mensual los registros de remitos publicados en GitHub.")
+    parser.add_argument('mes', nargs='+', help="Meses a consolidar (AAAA-MM)")
+    parser.add_argument('--repo', default="jgonzalohernandez/ArchivosGenerados")
+    parser.add_argument('--api', default=os.getenv('GITHUB_API_URL', 'https://api.github.com'))
+    args = parser.parse_args()
+
+    repo = Github(os.getenv('PAT_GITHUB'), base_url=args.api).get_repo(args.repo)
+    for mes in args.mes:
+        print(f"{mes}: {consolidar_mes(repo, mes)} remitos consolidados en {ruta_consolidado(mes)}")
@@ -0,0 +1,9 @@
+from datetime import datetime
+
+
+# Función para obtener la ruta del CSV mensual según la fecha del remito
+def ruta_csv_mensual(fecha):
+    fecha_obj = datetime.strptime(fecha, '%Y-%m-%d')
+    mes_anio = fecha_obj.strftime('%Y-%m')
+    return f'remitos_{mes_anio}.csv'
+
@@ -0,0 +1,261 @@
+import os
+import queue
+import threading
+from contextlib import contextmanager
+from datetime import date, datetime
+from decimal import Decimal
+
+from libro_columnar import ExportacionCSV, a_fecha, a_moneda, esquema
+
+# Libro de remitos en una base SQL por DB-API: SQL Server por pyodbc (la base que
+# consulta contabilidad) o SQLite como reemplazo local para trabajar sin red.
+# Las conexiones se reutilizan desde un pool y las altas van en lote con executemany
+# (fast_executemany en pyodbc), dentro de una sola transacción por llamada.
+#
+# REMITOS_SQL elige la base: "sqlite:///ruta/remitos.db" o una cadena ODBC
+# ("DRIVER={ODBC Driver 18 for SQL Server};SERVER=...;DATABASE=...;...").
+
+URL_SQL = os.getenv('REMITOS_SQL', '')
+TAMANO_POOL = int(os.getenv('REMITOS_SQL_POOL', '4'))
+
+
+class DialectoSQLite:
+    nombre = 'sqlite'
+    tablas = [
+        """CREATE TABLE IF NOT EXISTS remitos (
+            numero INTEGER PRIMARY KEY, fecha DATE NOT NULL, cliente TEXT, domicilio TEXT, sector TEXT,
+            solicitante TEXT, moto TEXT, lluvia INTEGER, exclusividad INTEGER, cantidad_bultos INTEGER,
+            total DECIMAL(14, 2), registrado TIMESTAMP)""",
+        "CREATE INDEX IF NOT EXISTS remitos_fecha ON remitos (fecha)",
+        """CREATE TABLE IF NOT EXISTS remito_items (
+            numero INTEGER NOT NULL, orden INTEGER NOT NULL, fecha DATE NOT NULL, direccion TEXT,
+            monto DECIMAL(14, 2), PRIMARY KEY (numero, orden))""",
+        "CREATE INDEX IF NOT EXISTS remito_items_fecha ON remito_items (fecha)",
+        "CREATE TABLE IF NOT EXISTS numeracion (clave TEXT PRIMARY KEY, estado TEXT NOT NULL, version INTEGER NOT NULL)",
+    ]
+
+    def __init__(self, ruta):
+        import sqlite3
+
+        self.ruta = ruta
+        self.error_integridad = sqlite3.IntegrityError
+
+    def conectar(self):
+        import sqlite3
+
+        # Las transacciones se abren a mano (BEGIN IMMEDIATE), por eso isolation_level=None
+        conexion = sqlite3.connect(self.ruta, timeout=30, isolation_level=None, check_same_thread=False)
+        conexion.execute("PRAGMA journal_mode=WAL")
+        conexion.execute("PRAGMA synchronous=NORMAL")
+        return conexion
+
+    def comenzar(self, cursor):
+        # Toma el lock de escritura al empezar, así dos transacciones no se cruzan a mitad de camino
+        cursor.execute("BEGIN IMMEDIATE")
+
+    # SQLite no tiene tipos de fecha ni decimales: se guardan como texto ISO y se convierten al leer
+    def adaptar(self, valor):
+        if isinstance(valor, (date, datetime)):
+            return valor.isoformat(sep=' ') if isinstance(valor, datetime) else valor.isoformat()
+        if isinstance(valor, Decimal):
+            return str(valor)
+        if isinstance(valor, bool):
+            return int(valor)
+        return valor
+
+
+class DialectoSQLServer:
+    nombre = 'sqlserver'
+    tablas = [
+        """IF OBJECT_ID('remitos') IS NULL CREATE TABLE remitos (
+            numero BIGINT PRIMARY KEY, fecha DATE NOT NULL, cliente NVARCHAR(200), domicilio NVARCHAR(200),
+            sector NVARCHAR(200), solicitante NVARCHAR(200), moto NVARCHAR(100), lluvia BIT, exclusividad BIT,
+            cantidad_bultos INT, total DECIMAL(14, 2), registrado DATETIME2)""",
+        "IF NOT EXISTS (SELECT 1 FROM sys.indexes WHERE name = 'remitos_fecha') CREATE INDEX remitos_fecha ON remitos (fecha)",
+        """IF OBJECT_ID('remito_items') IS NULL CREATE TABLE remito_items (
+            numero BIGINT NOT NULL, orden SMALLINT NOT NULL, fecha DATE NOT NULL, direccion NVARCHAR(300),
+            monto DECIMAL(14, 2), PRIMARY KEY (numero, orden))""",
+        "IF NOT EXISTS (SELECT 1 FROM sys.indexes WHERE name = 'remito_items_fecha') CREATE INDEX remito_items_fecha ON remito_items (fecha)",
+        """IF OBJECT_ID('numeracion') IS NULL CREATE TABLE numeracion (
+            clave NVARCHAR(50) PRIMARY KEY, estado NVARCHAR(MAX) NOT NULL, version INT NOT NULL)""",
+    ]
+
+    def __init__(self, cadena):
+        import pyodbc
+
+        self.cadena = cadena
+        self.error_integridad = pyodbc.IntegrityError
+
+    def conectar(self):
+        import pyodbc
+
+        return pyodbc.connect(self.cadena, autocommit=False)
+
+    def comenzar(self, cursor):
+        # Con autocommit=False la transacción empieza sola; los lotes van en un solo viaje
+        cursor.fast_executemany = True
+
+    def adaptar(self, valor):
+        return valor
+
+
+# Función para elegir el dialecto según la URL (sqlite:///ruta o cadena ODBC)
+def crear_dialecto(url):
+    if url.startswith('sqlite:///'):
+        return DialectoSQLite(url[len('sqlite:///'):])
+    return DialectoSQLServer(url)
+
+
+class PoolConexiones:
+    def __init__(self, dialecto, tamano=TAMANO_POOL):
+        self.dialecto = dialecto
+        self._libres = queue.LifoQueue()
+        self._cupos = threading.BoundedSemaphore(tamano)
+
+    # Función para ejecutar una transacción con una conexión del pool: commit al salir, rollback si hay error
+    @contextmanager
+    def transaccion(self):
+        with self._cupos:
+            try:
+                conexion = self._libres.get_nowait()
+            except queue.Empty:
+                conexion = self.dialecto.conectar()
+            try:
+                cursor = conexion.cursor()
+                self.dialecto.comenzar(cursor)
+                yield cursor
+                conexion.commit()
+            except BaseException:
+                try:
+                    conexion.rollback()
+                except Exception:
+                    # La conexión quedó rota: no vuelve al pool
+                    conexion.close()
+                    conexion = None
+                raise
+            finally:
+                if conexion is not None:
+                    self._libres.put(conexion)
+
+    # Función para cerrar las conexiones libres
+    def cerrar(self):
+        while True:
+            try:
+                self._libres.get_nowait().close()
+            except queue.Empty:
+                return
+
+
+class LibroSQL(ExportacionCSV):
+    def __init__(self, pool):
+        self.pool = pool
+        with self.pool.transaccion() as cursor:
+            for sentencia in self.pool.dialecto.tablas:
+                cursor.execute(sentencia)
+
+    def _adaptar(self, filas):
+        adaptar = self.pool.dialecto.adaptar
+        return [tuple(adaptar(valor) for valor in fila) for fila in filas]
+
+    # Función para listar los meses (AAAA-MM) que tienen remitos
+    def meses(self):
+        with self.pool.transaccion() as cursor:
+            cursor.execute("SELECT DISTINCT fecha FROM remitos")
+            return sorted({str(fila[0])[:7] for fila in cursor.fetchall()})
+
+    # Función para agregar remitos (si un número ya estaba, se reemplaza) en una sola transacción
+    def agregar(self, remitos):
+        if not remitos:
+            return
+        registrado = datetime.now().replace(microsecond=0)
+        encabezados = [
+            (remito['numero'], remito['fecha'], remito['cliente'], remito['domicilio'], remito['sector'], remito['solicitante'],
+             remito['moto'], remito['lluvia'], remito['exclusividad'], remito['cantidad_bultos'], remito['total'], registrado)
+            for remito in remitos
+        ]
+        items = [
+            (remito['numero'], orden, remito['fecha'], direccion, monto)
+            for remito in remitos for orden, (direccion, monto) in enumerate(remito['detalle'], start=1)
+        ]
+        numeros = [(remito['numero'],) for remito in remitos]
+
+        with self.pool.transaccion() as cursor:
+            cursor.executemany("DELETE FROM remito_items WHERE numero = ?", numeros)
+            cursor.executemany("DELETE FROM remitos WHERE numero = ?", numeros)
+            cursor.executemany(
+                "INSERT INTO remitos (numero, fecha, cliente, domicilio, sector, solicitante, moto, lluvia, exclusividad, "
+                "cantidad_bultos, total, registrado) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", self._adaptar(encabezados))
+            if items:
+                cursor.executemany("INSERT INTO remito_items (numero, orden, fecha, direccion, monto) VALUES (?, ?, ?, ?, ?)",
+                                   self._adaptar(items))
+
+    # Función para leer una tabla ('remitos' o 'items') entre dos fechas (inclusive) como tabla de Arrow,
+    # opcionalmente sólo de un cliente
+    def leer(self, desde=None, hasta=None, tabla='remitos', columnas=None, cliente=None):
+        import pyarrow as pa
+
+        campos = esquema(tabla)
+        nombres = columnas or campos.names
+        condiciones = []
+        parametros = []
+        if desde:
+            condiciones.append("fecha >= ?")
+            parametros.append(self.pool.dialecto.adaptar(a_fecha(desde)))
+        if hasta:
+            condiciones.append("fecha <= ?")
+            parametros.append(self.pool.dialecto.adaptar(a_fecha(hasta)))
+        if cliente is not None:
+            # Los ítems no tienen cliente: se filtran por los números de los remitos del cliente
+            condiciones.append("cliente = ?" if tabla == 'remitos' else "numero IN (SELECT numero FROM remitos WHERE cliente = ?)")
+            parametros.append(cliente)
+        consulta = f"SELECT {', '.join(nombres)} FROM {'remitos' if tabla == 'remitos' else 'remito_items'}"
+        if condiciones:
+            consulta += " WHERE " + " AND ".join(condiciones)
+
+        with self.pool.transaccion() as cursor:
+            cursor.execute(consulta, parametros)
+            filas = cursor.fetchall()
+
+        # Se vuelve a los tipos del libro (en SQLite llegan como texto o número)
+        conversiones = {'fecha': a_fecha, 'total': a_moneda, 'monto': a_moneda, 'lluvia': bool, 'exclusividad': bool,
+                        'registrado': lambda valor: valor if isinstance(valor, datetime) else datetime.fromisoformat(str(valor))}
+        datos = {nombre: [] for nombre in nombres}
+        for fila in filas:
+            for nombre, valor in zip(nombres, fila):
+                datos[nombre].append(conversiones[nombre](valor) if valor is not None and nombre in conversiones else valor)
+        return pa.table(datos, schema=pa.schema([campos.field(nombre) for nombre in nombres]))
+
+
+# Un pool por URL en cada proceso
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+# Función para obtener el pool de conexiones de una URL (se crea la primera vez)
+def obtener_pool(url=URL_SQL):
+    with _pools_lock:
+        if url not in _pools:
+            _pools[url] = PoolConexiones(crear_dialecto(url))
+        return _pools[url]
+
+
+# Función para saber si un destino es una base SQL y no una carpeta del libro en Parquet
+def es_url_sql(destino):
+    return destino.startswith('sqlite:///') or 'DRIVER=' in destino.upper()
+
+
+_libros = {}
+
+
+# Función para obtener el libro que corresponda a un destino: base SQL o carpeta Parquet (uno por proceso)
+def obtener_libro(destino=URL_SQL):
+    from libro_columnar import CARPETA_LIBRO, LibroRemitos
+
+    destino = destino or CARPETA_LIBRO
+    with _pools_lock:
+        libro = _libros.get(destino)
+    if libro is None:
+        libro = LibroSQL(obtener_pool(destino)) if es_url_sql(destino) else LibroRemitos(destino)
+        with _pools_lock:
+            libro = _libros.setdefault(destino, libro)
+    return libro
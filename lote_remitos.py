@@ -0,0 +1,290 @@
+import argparse
+import io
+import os
+import time
+import unicodedata
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+import pandas as pd
+
+from libro_columnar import csv_mensual, fila_csv
+from modelo_remito import Remito, a_centavos, a_pesos, items_remito
+from pdf_remito import generar_pdf, nombre_pdf
+from plantilla_pdf import PERFILES_PDF, obtener_logo
+
+# Logo del talonario (ruta de la imagen JPG)
+LOGO_PATH = "logo motoya curvas-1.jpg"
+
+# Nombres de columna aceptados en la planilla (ya normalizados) y el campo al que corresponden
+COLUMNAS = {
+    'fecha': 'fecha',
+    'cliente': 'cliente',
+    'domicilio': 'domicilio',
+    'sector': 'sector',
+    'solicitante': 'solicitante',
+    'moto': 'moto',
+    'lluvia': 'lluvia',
+    'exclusividad': 'exclusividad',
+    'bultos': 'cantidad_bultos',
+    'cantidad de bultos': 'cantidad_bultos',
+    'detalle': 'detalle',
+}
+
+CAMPOS_OBLIGATORIOS = ['cliente', 'domicilio', 'sector', 'solicitante', 'moto']
+
+
+# Función para normalizar un nombre de columna (minúsculas y sin acentos)
+def _normalizar(texto):
+    texto = unicodedata.normalize('NFKD', str(texto)).encode('ascii', 'ignore').decode('ascii')
+    return ' '.join(texto.lower().split())
+
+
+# Función para interpretar los valores tipo Sí/No de la planilla
+def _es_verdadero(valor):
+    return _normalizar(valor) in ('si', 's', 'true', 'verdadero', '1', 'x')
+
+
+# Función para convertir un monto escrito en la planilla a Decimal (acepta 1500.50 o 1.500,50)
+def _a_monto(valor):
+    return a_pesos(a_centavos(valor))
+
+
+# Función para leer el detalle en una sola celda ("Dirección: monto | Dirección: monto")
+def _leer_detalle_celda(texto):
+    detalle = []
+    for item in str(texto).split('|'):
+        if not item.strip():
+            continue
+        direccion, _, monto = item.rpartition(':')
+        detalle.append({"Dirección": direccion.strip(), "Monto": _a_monto(monto)})
+    return detalle
+
+
+# Función para leer la planilla de servicios (CSV o XLSX), una fila por servicio
+def leer_servicios(ruta):
+    if ruta.lower().endswith(('.xlsx', '.xls')):
+        df = pd.read_excel(ruta, dtype=str, keep_default_na=False)
+    else:
+        df = pd.read_csv(ruta, dtype=str, keep_default_na=False, sep=None, engine='python', encoding='utf-8-sig')
+
+    # Columnas "Dirección i" / "Monto i", igual que en el CSV mensual
+    direcciones = {}
+    montos = {}
+    campos = {}
+    for columna in df.columns:
+        nombre = _normalizar(columna)
+        partes = nombre.rsplit(' ', 1)
+        if len(partes) == 2 and partes[1].isdigit() and partes[0] in ('direccion', 'monto'):
+            (direcciones if partes[0] == 'direccion' else montos)[int(partes[1])] = columna
+        elif nombre in COLUMNAS:
+            campos[COLUMNAS[nombre]] = columna
+
+    servicios = []
+    errores = []
+    for numero_fila, fila in enumerate(df.to_dict('records'), start=2):
+        servicio = {campo: str(fila[columna]).strip() for campo, columna in campos.items()}
+
+        detalle = []
+        for i in sorted(direcciones):
+            direccion = str(fila[direcciones[i]]).strip()
+            monto = _a_monto(fila[montos[i]]) if i in montos else a_pesos(0)
+            if direccion or monto:
+                detalle.append({"Dirección": direccion, "Monto": monto})
+        if servicio.get('detalle'):
+            detalle.extend(_leer_detalle_celda(servicio['detalle']))
+        servicio['detalle'] = detalle
+
+        servicio['fecha'] = servicio.get('fecha') or datetime.now().strftime('%Y-%m-%d')
+        servicio['lluvia'] = _es_verdadero(servicio.get('lluvia', ''))
+        servicio['exclusividad'] = _es_verdadero(servicio.get('exclusividad', ''))
+        servicio['cantidad_bultos'] = int(_a_monto(servicio.get('cantidad_bultos', '')))
+
+        faltantes = [campo for campo in CAMPOS_OBLIGATORIOS if not servicio.get(campo)]
+        if not detalle:
+            faltantes.append('detalle')
+        if faltantes:
+            errores.append(f"Fila {numero_fila}: faltan {', '.join(faltantes)}")
+        servicios.append(servicio)
+
+    if errores:
+        raise ValueError("La planilla tiene filas incompletas:\n" + "\n".join(errores))
+    return servicios
+
+
+# Función para precargar el logo en cada proceso del pool
+def _inicializar_worker(logo_path, perfil):
+    obtener_logo(logo_path, perfil)
+
+
+# Función para armar el modelo del remito de un servicio de la planilla
+def remito_servicio(remito_numero, servicio):
+    return Remito(remito_numero, servicio['fecha'], servicio['cliente'], servicio['domicilio'], servicio['sector'],
+                  servicio['solicitante'], servicio['moto'], items_remito(servicio['detalle']),
+                  servicio['lluvia'], servicio['exclusividad'], servicio['cantidad_bultos'])
+
+
+# Función que ejecuta cada proceso del pool: arma el PDF y la fila del CSV de un remito
+def _procesar_servicio(tarea):
+    remito_numero, servicio, logo_path, perfil = tarea
+    remito = remito_servicio(remito_numero, servicio)
+    pdf_bytes = generar_pdf(remito, logo_path, perfil)
+    registro = remito.registro_libro()
+    return remito_numero, pdf_bytes, fila_csv(registro, registro['detalle'])
+
+
+# Función para unir varios PDFs en un único archivo
+def _unir_pdfs(pdfs):
+    from pypdf import PdfWriter
+
+    writer = PdfWriter()
+    for pdf_bytes in pdfs:
+        writer.append(io.BytesIO(pdf_bytes))
+    salida = io.BytesIO()
+    writer.write(salida)
+    return salida.getvalue()
+
+
+# Función para generar un lote de remitos a partir de una lista de servicios
+def generar_lote(servicios, desde, salida, formato='zip', workers=None, logo_path=LOGO_PATH, perfil=None):
+    if formato not in ('zip', 'pdf'):
+        raise ValueError(f"Formato de salida desconocido: {formato}")
+
+    if not servicios:
+        raise ValueError("No hay servicios para generar")
+
+    workers = workers or os.cpu_count() or 1
+    hasta = desde + len(servicios) - 1
+    tareas = [(desde + i, servicio, logo_path, perfil) for i, servicio in enumerate(servicios)]
+
+    inicio = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=workers, initializer=_inicializar_worker, initargs=(logo_path, perfil)) as pool:
+        chunksize = max(1, len(tareas) // (workers * 4))
+        resultados = list(pool.map(_procesar_servicio, tareas, chunksize=chunksize))
+
+    filas = [fila for _, _, fila in resultados]
+    bytes_pdf = [len(pdf_bytes) for _, pdf_bytes, _ in resultados]
+    csv_nombre = f'remitos_lote_{desde}-{hasta}.csv'
+    csv_bytes = csv_mensual(filas)
+
+    if formato == 'zip':
+        with zipfile.ZipFile(salida, 'w', compression=zipfile.ZIP_DEFLATED) as archivo_zip:
+            for remito_numero, pdf_bytes, _ in resultados:
+                archivo_zip.writestr(nombre_pdf(remito_numero), pdf_bytes)
+            archivo_zip.writestr(csv_nombre, csv_bytes)
+        csv_path = None
+    else:
+        with open(salida, 'wb') as file:
+            file.write(_unir_pdfs([pdf_bytes for _, pdf_bytes, _ in resultados]))
+        csv_path = os.path.join(os.path.dirname(os.path.abspath(salida)), csv_nombre)
+        with open(csv_path, 'wb') as file:
+            file.write(csv_bytes)
+    segundos = time.perf_counter() - inicio
+
+    return {
+        'cantidad': len(servicios),
+        'desde': desde,
+        'hasta': hasta,
+        'workers': workers,
+        'segundos': segundos,
+        'remitos_por_segundo': len(servicios) / segundos if segundos else 0.0,
+        'bytes_pdf': sum(bytes_pdf),
+        'bytes_por_remito': sum(bytes_pdf) / len(bytes_pdf),
+        'bytes_maximo': max(bytes_pdf),
+        'salida': salida,
+        'csv': csv_path,
+        'filas': filas,
+    }
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Genera remitos en lote a partir de una planilla de servicios (CSV o XLSX).")
+    parser.add_argument('planilla', help="Archivo CSV o XLSX con un servicio por fila")
+    parser.add_argument('--desde', type=int, default=None,
+                        help="Número del primer remito del lote (por defecto se reserva un bloque con el numerador); "
+                             "con números propios sólo se arman los PDFs, el lote no se registra")
+    parser.add_argument('--numeracion', default='github',
+                        help="Dónde reservar los números si no se pasa --desde: 'github', una URL SQL o la ruta de un archivo local")
+    parser.add_argument('--salida', default=None, help="Archivo de salida (por defecto remitos_<desde>-<hasta>.zip o .pdf)")
+    parser.add_argument('--formato', choices=['zip', 'pdf'], default='zip', help="Un zip con un PDF por remito, o un único PDF unido")
+    parser.add_argument('--workers', type=int, default=None, help="Cantidad de procesos (por defecto, uno por núcleo)")
+    parser.add_argument('--logo', default=LOGO_PATH, help="Ruta del logo para la marca de agua")
+    parser.add_argument('--perfil', choices=sorted(PERFILES_PDF), default=None,
+                        help="Perfil de salida del PDF (por defecto REMITOS_PERFIL_PDF o 'estandar')")
+    parser.add_argument('--libro', default=None,
+                        help="Carpeta del libro en Parquet o URL de la base SQL donde registrar el lote (vacío = sólo reservar los números y armar los PDFs)")
+    args = parser.parse_args()
+
+    servicios = leer_servicios(args.planilla)
+
+    numerador = None
+    desde = args.desde
+    if desde is None:
+        from libro_sql import es_url_sql, obtener_pool
+        from numeracion_remitos import AlmacenGithub, AlmacenLocal, AlmacenSQL, Numerador, semilla_ultimo_remito
+
+        if args.numeracion == 'github':
+            from github import Github
+
+            api = os.getenv('GITHUB_API_URL', 'https://api.github.com')
+            almacen = AlmacenGithub(lambda: Github(os.getenv('PAT_GITHUB'), base_url=api).get_repo("jgonzalohernandez/ArchivosGenerados"),
+                                    semilla=semilla_ultimo_remito)
+        elif es_url_sql(args.numeracion):
+            almacen = AlmacenSQL(obtener_pool(args.numeracion))
+        else:
+            almacen = AlmacenLocal(args.numeracion)
+        numerador = Numerador(almacen)
+        # Un solo bloque contiguo para todo el lote, reservado en una operación
+        desde = numerador.reservar(len(servicios), contiguos=True)[0]
+
+    # Con números reservados, el lote se emite igual que el botón "Generar Remito": registro, libro, búsqueda y
+    # publicación. Con --desde los números son del usuario y sólo se arman los PDFs.
+    bandeja = None
+    if numerador is not None and args.libro != '':
+        from bandeja_salida import BandejaSalida
+        from busqueda_remitos import obtener_busqueda
+        from conexion_github import obtener_recursos
+        from emision_remitos import EmisorRemitos
+        from libro_sql import URL_SQL, obtener_libro
+
+        # El bloque reservado pasa al numerador del emisor, en orden, para que el lote lleve justo esos números
+        for numero in reversed(range(desde, desde + len(servicios))):
+            numerador.reponer(numero)
+        recursos = obtener_recursos("jgonzalohernandez/ArchivosGenerados", os.getenv('GITHUB_API_URL', 'https://api.github.com'))
+        bandeja = BandejaSalida(recursos.repo, reconectar=recursos.reconectar)
+        libro = obtener_libro(args.libro or URL_SQL)
+        emisor = EmisorRemitos(numerador, libro, obtener_busqueda(libro), bandeja)
+        try:
+            emisor.emitir([remito_servicio(0, servicio) for servicio in servicios])
+        except BaseException:
+            # Si el lote no se emitió, los números reservados vuelven al almacén
+            numerador.liberar()
+            raise
+        if emisor.error_guardado:
+            print(f"El lote quedó publicado pero no se pudo guardar en el libro local: {emisor.error_guardado}")
+
+    salida = args.salida or f'remitos_{desde}-{desde + len(servicios) - 1}.{args.formato}'
+    try:
+        resultado = generar_lote(servicios, desde, salida, formato=args.formato, workers=args.workers, logo_path=args.logo, perfil=args.perfil)
+    except BaseException:
+        # Si el lote no se generó y no se llegó a emitir, los números reservados vuelven al numerador
+        if numerador is not None and bandeja is None:
+            numerador.devolver(range(desde, desde + len(servicios)))
+        raise
+    finally:
+        if bandeja is not None:
+            # Los remitos ya están emitidos: lo que no se pueda subir ahora queda en la bandeja para la próxima vez
+            bandeja.procesar_pendientes()
+            if bandeja.cantidad_pendiente():
+                print(f"Quedaron {bandeja.cantidad_pendiente()} archivos en la bandeja de salida: {bandeja.ultimo_error}")
+
+    print(f"Remitos {resultado['desde']} a {resultado['hasta']} generados en {salida}")
+    if resultado['csv']:
+        print(f"Filas del CSV en {resultado['csv']}")
+    print(f"{resultado['cantidad']} remitos en {resultado['segundos']:.2f} s con {resultado['workers']} procesos "
+          f"({resultado['remitos_por_segundo']:.1f} remitos/s)")
+    print(f"PDFs: {resultado['bytes_pdf'] / 1024:.1f} KB en total, {resultado['bytes_por_remito'] / 1024:.1f} KB por remito "
+          f"(máximo {resultado['bytes_maximo'] / 1024:.1f} KB)")
+    if numerador is None:
+        print(f"Próximo número de remito: {resultado['hasta'] + 1}")
@@ -0,0 +1,276 @@
+import json
+import logging
+import math
+import os
+import threading
+import time
+import uuid
+from collections import deque
+from contextlib import contextmanager, nullcontext
+
+# Métricas de la app: cuánto tarda cada etapa de un remito (numeración,
+# registro, libro, publicación, subida a GitHub, descarga y PDF), cuántas
+# llamadas se hacen a la API de GitHub, cuánto queda del límite de la API y el
+# tamaño de lo que se publica y se descarga. Se exponen en formato de texto de
+# Prometheus en http://localhost:<REMITOS_METRICAS_PUERTO>/metrics y, si se
+# configura REMITOS_TRAZAS, cada etapa se anota además como una línea JSON.
+# Sin ninguna de las dos variables las métricas quedan desactivadas y medir una
+# etapa no hace nada (no se toma ni el tiempo).
+
+PUERTO_METRICAS = os.getenv('REMITOS_METRICAS_PUERTO', '')
+ARCHIVO_TRAZAS = os.getenv('REMITOS_TRAZAS', '')
+
+# Observaciones que se guardan por serie para calcular los percentiles
+VENTANA = 1024
+PERCENTILES = (0.5, 0.95, 0.99)
+
+DESCRIPCIONES = {
+    'remitos_etapa_segundos': ('summary', "Duración de cada etapa, en segundos (percentiles de las últimas observaciones)"),
+    'remitos_bytes': ('summary', "Tamaño de los registros y PDFs publicados o descargados, en bytes"),
+    'remitos_generados_total': ('counter', "Remitos generados por este proceso"),
+    'remitos_repetidos_total': ('counter', "Remitos repetidos (doble click o reintento) que devolvieron el ya emitido"),
+    'remitos_sin_libro': ('gauge', "Remitos publicados que todavía no se pudieron guardar en el libro o en la búsqueda"),
+    'remitos_subidas_omitidas_total': ('counter', "Archivos que no se subieron porque GitHub ya tenía el mismo contenido"),
+    'remitos_github_llamadas_total': ('counter', "Llamadas a la API de GitHub, por método y código de respuesta"),
+    'remitos_github_restantes': ('gauge', "Llamadas que quedan del límite de la API de GitHub (último valor informado)"),
+    'remitos_github_limite': ('gauge', "Límite de llamadas por hora de la API de GitHub"),
+}
+
+
+class Serie:
+    def __init__(self):
+        self.valores = deque(maxlen=VENTANA)
+        self.suma = 0.0
+        self.cantidad = 0
+
+    def agregar(self, valor):
+        self.valores.append(valor)
+        self.suma += valor
+        self.cantidad += 1
+
+
+# Función para obtener un percentil de una lista ordenada (rango más cercano)
+def percentil(ordenados, cuantil):
+    return ordenados[max(0, math.ceil(cuantil * len(ordenados)) - 1)]
+
+
+def _escapar(valor):
+    return str(valor).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _etiquetas(etiquetas, **extra):
+    pares = list(etiquetas) + list(extra.items())
+    if not pares:
+        return ''
+    return '{' + ','.join(f'{clave}="{_escapar(valor)}"' for clave, valor in pares) + '}'
+
+
+def _numero(valor):
+    return repr(float(valor)) if isinstance(valor, float) else str(valor)
+
+
+class Metricas:
+    activas = True
+
+    def __init__(self, archivo_trazas=None):
+        self._series = {}
+        self._contadores = {}
+        self._valores = {}
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._trazas = open(archivo_trazas, 'a', encoding='utf-8', buffering=1) if archivo_trazas else None
+        self._servidor = None
+        self.error = None
+
+    # Función para sumar una observación a una serie (duraciones, tamaños)
+    def observar(self, nombre, valor, **etiquetas):
+        clave = (nombre, tuple(sorted(etiquetas.items())))
+        with self._lock:
+            serie = self._series.get(clave)
+            if serie is None:
+                serie = self._series[clave] = Serie()
+            serie.agregar(valor)
+
+    # Función para incrementar un contador
+    def contar(self, nombre, cantidad=1, **etiquetas):
+        clave = (nombre, tuple(sorted(etiquetas.items())))
+        with self._lock:
+            self._contadores[clave] = self._contadores.get(clave, 0) + cantidad
+
+    # Función para fijar el valor actual de una medida (por ejemplo, lo que queda del límite de la API)
+    def fijar(self, nombre, valor, **etiquetas):
+        with self._lock:
+            self._valores[(nombre, tuple(sorted(etiquetas.items())))] = valor
+
+    # Función para medir una etapa; las etapas anidadas comparten la traza de la que las contiene
+    @contextmanager
+    def etapa(self, nombre, **datos):
+        traza = getattr(self._local, 'traza', None)
+        propia = traza is None
+        if propia:
+            traza = self._local.traza = uuid.uuid4().hex[:16]
+        inicio = time.time()
+        reloj = time.perf_counter()
+        error = None
+        try:
+            yield
+        except BaseException as e:
+            error = type(e).__name__
+            raise
+        finally:
+            segundos = time.perf_counter() - reloj
+            if propia:
+                self._local.traza = None
+            self.observar('remitos_etapa_segundos', segundos, etapa=nombre)
+            if self._trazas is not None:
+                linea = dict(datos, traza=traza, etapa=nombre, inicio=round(inicio, 6), segundos=round(segundos, 6))
+                if error:
+                    linea['error'] = error
+                with self._lock:
+                    self._trazas.write(json.dumps(linea, ensure_ascii=False) + '\n')
+
+    # Función para registrar una respuesta de GitHub: llamada, código y límite de la API
+    def respuesta_github(self, metodo, estado, encabezados):
+        self.contar('remitos_github_llamadas_total', metodo=metodo, estado=estado)
+        restantes = encabezados.get('X-RateLimit-Remaining') or encabezados.get('x-ratelimit-remaining')
+        limite = encabezados.get('X-RateLimit-Limit') or encabezados.get('x-ratelimit-limit')
+        if restantes is not None:
+            self.fijar('remitos_github_restantes', int(float(restantes)))
+        if limite is not None:
+            self.fijar('remitos_github_limite', int(float(limite)))
+
+    # Función para contar las llamadas de una sesión de requests (las que no pasan por PyGithub)
+    def instrumentar_sesion(self, sesion):
+        sesion.hooks['response'].append(
+            lambda respuesta, *args, **kwargs: self.respuesta_github(respuesta.request.method, respuesta.status_code, respuesta.headers))
+
+    # Función para armar el texto de las métricas en el formato de exposición de Prometheus
+    def exposicion(self):
+        with self._lock:
+            series = {clave: (serie.suma, serie.cantidad, sorted(serie.valores)) for clave, serie in self._series.items()}
+            contadores = dict(self._contadores)
+            valores = dict(self._valores)
+
+        lineas = []
+        por_nombre = {}
+        for (nombre, etiquetas), dato in list(series.items()) + list(contadores.items()) + list(valores.items()):
+            por_nombre.setdefault(nombre, []).append((etiquetas, dato))
+        for nombre in sorted(por_nombre):
+            tipo, descripcion = DESCRIPCIONES.get(nombre, ('untyped', nombre))
+            lineas.append(f"# HELP {nombre} {descripcion}")
+            lineas.append(f"# TYPE {nombre} {tipo}")
+            for etiquetas, dato in sorted(por_nombre[nombre], key=lambda par: par[0]):
+                if tipo == 'summary':
+                    suma, cantidad, ordenados = dato
+                    for cuantil in PERCENTILES:
+                        lineas.append(f"{nombre}{_etiquetas(etiquetas, quantile=cuantil)} {_numero(percentil(ordenados, cuantil))}")
+                    lineas.append(f"{nombre}_sum{_etiquetas(etiquetas)} {_numero(suma)}")
+                    lineas.append(f"{nombre}_count{_etiquetas(etiquetas)} {cantidad}")
+                else:
+                    lineas.append(f"{nombre}{_etiquetas(etiquetas)} {_numero(dato)}")
+        return '\n'.join(lineas) + '\n'
+
+    # Función para servir /metrics en un puerto local, en un hilo aparte
+    def servir(self, puerto, host='127.0.0.1'):
+        from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+        metricas = self
+
+        class Manejador(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split('?')[0] != '/metrics':
+                    self.send_error(404)
+                    return
+                cuerpo = metricas.exposicion().encode('utf-8')
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+                self.send_header('Content-Length', str(len(cuerpo)))
+                self.end_headers()
+                self.wfile.write(cuerpo)
+
+            def log_message(self, *args):
+                pass
+
+        self._servidor = ThreadingHTTPServer((host, int(puerto)), Manejador)
+        self._servidor.daemon_threads = True
+        threading.Thread(target=self._servidor.serve_forever, name="metricas", daemon=True).start()
+        return self._servidor.server_address[1]
+
+
+class MetricasDesactivadas:
+    activas = False
+    error = None
+
+    def observar(self, nombre, valor, **etiquetas):
+        pass
+
+    def contar(self, nombre, cantidad=1, **etiquetas):
+        pass
+
+    def fijar(self, nombre, valor, **etiquetas):
+        pass
+
+    def etapa(self, nombre, **datos):
+        return _SIN_MEDIR
+
+    def respuesta_github(self, metodo, estado, encabezados):
+        pass
+
+    def instrumentar_sesion(self, sesion):
+        pass
+
+    def exposicion(self):
+        return ''
+
+
+_SIN_MEDIR = nullcontext()
+
+
+# PyGithub anota cada llamada en su log (en DEBUG) con el método, el código y los encabezados de la respuesta:
+# es la forma de contar sus llamadas sin tocar la biblioteca. Esa línea no es parte de su API, así que se
+# verifica su forma; si cambia, se avisa una vez en lugar de dejar de contar sin que se note.
+class RegistroLlamadasGithub(logging.Handler):
+    def __init__(self, metricas):
+        super().__init__(logging.DEBUG)
+        self.metricas = metricas
+        self.formato_desconocido = False
+
+    def emit(self, registro):
+        argumentos = registro.args
+        # Las otras líneas de PyGithub (las esperas entre escrituras) no traen argumentos
+        if not isinstance(argumentos, tuple) or not argumentos:
+            return
+        if len(argumentos) == 9 and isinstance(argumentos[0], str) and isinstance(argumentos[6], int) \
+                and isinstance(argumentos[7], dict):
+            self.metricas.respuesta_github(argumentos[0], argumentos[6], argumentos[7])
+        elif not self.formato_desconocido:
+            self.formato_desconocido = True
+            self.metricas.error = "No se pueden contar las llamadas a GitHub: cambió el formato del log de PyGithub"
+
+
+# Una sola instancia por proceso
+_metricas = None
+_metricas_lock = threading.Lock()
+
+
+# Función para obtener las métricas del proceso: activas si hay puerto o archivo de trazas, si no, un objeto que no hace nada
+def obtener_metricas(puerto=PUERTO_METRICAS, archivo_trazas=ARCHIVO_TRAZAS):
+    global _metricas
+    with _metricas_lock:
+        if _metricas is None:
+            if not (puerto or archivo_trazas):
+                _metricas = MetricasDesactivadas()
+                return _metricas
+            _metricas = Metricas(archivo_trazas or None)
+            registro_github = logging.getLogger('github.Requester')
+            registro_github.setLevel(logging.DEBUG)
+            # Las líneas de cada llamada sólo sirven para contar: no pasan al log de la app
+            registro_github.propagate = False
+            registro_github.addHandler(RegistroLlamadasGithub(_metricas))
+            if puerto:
+                try:
+                    _metricas.servir(puerto)
+                except OSError as e:
+                    # Otro proceso ya usa el puerto: se siguen juntando métricas (y trazas), sin exponerlas
+                    _metricas.error = f"No se pudo abrir el puerto de métricas {puerto}: {e}"
+        return _metricas
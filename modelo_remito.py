@@ -0,0 +1,149 @@
+from dataclasses import dataclass, field
+from datetime import date
+from decimal import ROUND_HALF_UP, Decimal, InvalidOperation
+
+from libro_columnar import a_fecha
+
+# Modelo de un remito y sus ítems, con los importes en centavos (enteros). El
+# formulario, el PDF, el libro y los lotes leen todos del mismo modelo, así que
+# el total que figura en el PDF es el mismo que se registra en el libro y no hay
+# diferencias de redondeo al sumar los meses. El costo de los bultos y los
+# recargos salen de la tabla de tarifas (tarifas_remito).
+
+
+# Función para convertir un importe (número o texto, con coma o punto decimal) a centavos
+def a_centavos(valor):
+    if isinstance(valor, int):
+        return valor * 100
+    if isinstance(valor, float):
+        valor = repr(valor)
+    texto = str(valor).strip().replace('$', '').replace(' ', '')
+    if not texto:
+        return 0
+    try:
+        importe = Decimal(texto)
+    except InvalidOperation:
+        # Formato con separador de miles: 1.500,50
+        try:
+            importe = Decimal(texto.replace('.', '').replace(',', '.'))
+        except InvalidOperation:
+            raise ValueError(f"Importe inválido: {valor}")
+    if not importe.is_finite():
+        raise ValueError(f"Importe inválido: {valor}")
+    return int(importe.quantize(Decimal('0.01'), rounding=ROUND_HALF_UP) * 100)
+
+
+# Función para pasar centavos a un Decimal con dos decimales
+def a_pesos(centavos):
+    return Decimal(centavos).scaleb(-2)
+
+
+# Función para calcular un porcentaje de un importe en centavos (redondeo al centavo, mitad hacia arriba)
+def porcentaje(centavos, tasa):
+    return (centavos * tasa + 50) // 100
+
+
+@dataclass(slots=True, frozen=True)
+class ItemRemito:
+    direccion: str
+    centavos: int
+
+    @property
+    def monto(self):
+        return a_pesos(self.centavos)
+
+
+# Función para armar los ítems a partir de las filas del formulario o de la planilla ({"Dirección", "Monto"})
+def items_remito(detalle):
+    return tuple(ItemRemito(str(item['Dirección']), a_centavos(item['Monto'])) for item in detalle)
+
+
+@dataclass(slots=True)
+class Remito:
+    numero: int
+    fecha: date
+    cliente: str
+    domicilio: str
+    sector: str
+    solicitante: str
+    moto: str
+    items: tuple = ()
+    lluvia: bool = False
+    exclusividad: bool = False
+    cantidad_bultos: int = 0
+    # Tabla con que se cotiza (None = la vigente); un remito leído de su registro trae la tarifa con que se emitió
+    tarifas: object = field(default=None, compare=False, repr=False)
+    # Cotización con la tabla propia o la vigente: se calcula una vez y la usan el total, los recargos y el PDF
+    _cotizacion: object = field(default=None, init=False, compare=False, repr=False)
+
+    def __post_init__(self):
+        self.fecha = a_fecha(self.fecha)
+        self.items = tuple(self.items)
+        self.cantidad_bultos = int(self.cantidad_bultos)
+
+    # Función para cotizar el remito con las tarifas vigentes en su fecha (u otra tabla, para comparar)
+    def cotizacion(self, tarifas=None):
+        if tarifas is not None:
+            return tarifas.cotizar(self)
+        if self._cotizacion is None:
+            # tarifas_remito usa los importes de este módulo, por eso se importa recién acá
+            from tarifas_remito import obtener_tarifas
+
+            self._cotizacion = (self.tarifas or obtener_tarifas()).cotizar(self)
+        return self._cotizacion
+
+    @property
+    def subtotal_centavos(self):
+        return sum(item.centavos for item in self.items)
+
+    @property
+    def bultos_centavos(self):
+        return self.cotizacion().bultos_centavos
+
+    # Direcciones más bultos: la base sobre la que se calculan los recargos
+    @property
+    def base_centavos(self):
+        return self.cotizacion().base_centavos
+
+    @property
+    def exclusividad_centavos(self):
+        return self.cotizacion().recargo('exclusividad')
+
+    @property
+    def lluvia_centavos(self):
+        return self.cotizacion().recargo('lluvia')
+
+    @property
+    def total_centavos(self):
+        return self.cotizacion().total_centavos
+
+    @property
+    def total(self):
+        return a_pesos(self.total_centavos)
+
+    # Función para recorrer las líneas del detalle tal como van en el PDF: (texto, importe en centavos)
+    def lineas(self):
+        cotizacion = self.cotizacion()
+        for item in self.items:
+            yield item.direccion, item.centavos
+        if self.cantidad_bultos > 0:
+            yield f"Bulto(s) ({self.cantidad_bultos}):", cotizacion.bultos_centavos
+        for recargo, centavos in cotizacion.recargos:
+            yield f"{recargo.etiqueta} ({recargo.porcentaje}% incremento):", centavos
+
+    # Función para armar el registro del libro (mismas claves que libro_columnar.remito_libro)
+    def registro_libro(self):
+        return {
+            'numero': int(self.numero),
+            'fecha': self.fecha,
+            'cliente': self.cliente,
+            'domicilio': self.domicilio,
+            'sector': self.sector,
+            'solicitante': self.solicitante,
+            'moto': self.moto,
+            'lluvia': bool(self.lluvia),
+            'exclusividad': bool(self.exclusividad),
+            'cantidad_bultos': self.cantidad_bultos,
+            'total': self.total,
+            'detalle': [(item.direccion, item.monto) for item in self.items],
+        }
@@ -0,0 +1,394 @@
+import argparse
+import atexit
+import hashlib
+import json
+import os
+import random
+import socket
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from datetime import datetime
+
+# Numeración de remitos compartida entre varios despachadores. El estado
+# ({"siguiente": N, "devueltos": [...]}) se guarda en un archivo y sólo se
+# modifica con compare-and-swap: con un lock de archivo en disco o con el sha
+# del archivo como precondición en GitHub. Cada proceso reserva un bloque de
+# números en una sola operación y devuelve los que no usó al terminar. Los
+# números de remitos que quedaron en el libro pero no se llegaron a publicar se
+# anulan ("anulados"): no se vuelven a usar y la auditoría no los toma como
+# salteados.
+
+ARCHIVO_NUMERACION = 'numeracion_remitos.json'
+NUMERO_INICIAL = 5980
+TAMANO_BLOQUE = int(os.getenv('REMITOS_BLOQUE_NUMEROS', '10'))
+
+
+class ConflictoNumeracion(Exception):
+    pass
+
+
+# Función para armar el estado inicial de la numeración
+def estado_inicial(siguiente=NUMERO_INICIAL):
+    return {'siguiente': int(siguiente), 'devueltos': []}
+
+
+def _serializar(estado):
+    return json.dumps(estado, separators=(',', ':'), sort_keys=True).encode('utf-8')
+
+
+class BloqueoOcupado(Exception):
+    pass
+
+
+# Función para leer la marca de un lock (None si ya no existe)
+def _marca_lock(lock):
+    try:
+        with open(lock, 'rb') as file:
+            return file.read()
+    except FileNotFoundError:
+        return None
+
+
+# Función para tomar un lock entre procesos sobre un archivo. El .lock se crea en exclusiva con una marca propia,
+# y mientras se tiene se renueva su fecha cada tanto: sólo se descarta por viejo (más de vencimiento segundos sin
+# renovarse) el de un proceso caído. Al soltarlo se borra sólo si sigue siendo el propio.
+@contextmanager
+def bloqueo_archivo(ruta, espera_maxima=10.0, vencimiento=30.0):
+    lock = f"{ruta}.lock"
+    marca = f"{socket.gethostname()} {os.getpid()} {uuid.uuid4().hex}".encode('utf-8')
+    limite = time.monotonic() + espera_maxima
+    while True:
+        try:
+            descriptor = os.open(lock, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+            break
+        except FileExistsError:
+            ajena = _marca_lock(lock)
+            try:
+                vencido = time.time() - os.path.getmtime(lock) > vencimiento
+            except FileNotFoundError:
+                continue
+            if vencido and ajena is not None and _marca_lock(lock) == ajena:
+                try:
+                    os.remove(lock)
+                except FileNotFoundError:
+                    pass
+                continue
+            if time.monotonic() > limite:
+                raise BloqueoOcupado(f"No se pudo tomar el lock {lock} en {espera_maxima} s")
+            time.sleep(random.uniform(0.005, 0.05))
+    try:
+        os.write(descriptor, marca)
+    finally:
+        os.close(descriptor)
+
+    soltado = threading.Event()
+
+    def renovar():
+        while not soltado.wait(vencimiento / 3):
+            if _marca_lock(lock) != marca:
+                return
+            try:
+                os.utime(lock)
+            except FileNotFoundError:
+                return
+
+    renovador = threading.Thread(target=renovar, name=f"lock-{os.path.basename(ruta)}", daemon=True)
+    renovador.start()
+    try:
+        yield
+    finally:
+        soltado.set()
+        renovador.join()
+        if _marca_lock(lock) == marca:
+            os.remove(lock)
+
+
+class AlmacenLocal:
+    def __init__(self, ruta=ARCHIVO_NUMERACION, semilla=None):
+        self.ruta = ruta
+        self._semilla = semilla or estado_inicial
+
+    def _leer_archivo(self):
+        try:
+            with open(self.ruta, 'rb') as file:
+                contenido = file.read()
+        except FileNotFoundError:
+            return self._semilla(), None
+        return json.loads(contenido), hashlib.sha1(contenido).hexdigest()
+
+    # Función para leer el estado; devuelve (estado, versión)
+    def leer(self):
+        return self._leer_archivo()
+
+    # Función para guardar el estado sólo si nadie lo cambió desde la versión leída
+    def escribir(self, estado, version, mensaje=None):
+        with bloqueo_archivo(self.ruta):
+            if self._leer_archivo()[1] != version:
+                return False
+            temporal = f"{self.ruta}.{uuid.uuid4().hex}.tmp"
+            with open(temporal, 'wb') as file:
+                file.write(_serializar(estado))
+                file.flush()
+                os.fsync(file.fileno())
+            os.replace(temporal, self.ruta)
+        return True
+
+
+class AlmacenGithub:
+    def __init__(self, obtener_repo, path=ARCHIVO_NUMERACION, semilla=None, reconectar=None):
+        self._obtener_repo = obtener_repo
+        self._reconectar = reconectar
+        self._repo = None
+        self.path = path
+        self._semilla = semilla or (lambda repo: estado_inicial())
+
+    def _conectar(self):
+        if self._repo is None:
+            self._repo = self._obtener_repo()
+        return self._repo
+
+    # Función para ejecutar una operación con el repositorio; si el token se rotó o se cortó la red,
+    # reconecta (vuelve a leer el token) y la reintenta una vez
+    def _con_repo(self, operacion):
+        import requests
+        from github import BadCredentialsException
+
+        for intento in range(2):
+            try:
+                return operacion(self._conectar())
+            except (BadCredentialsException, requests.ConnectionError):
+                self._repo = None
+                if intento or self._reconectar is None:
+                    raise
+                self._reconectar()
+
+    def leer(self):
+        return self._con_repo(self._leer)
+
+    def _leer(self, repo):
+        from github import UnknownObjectException
+
+        try:
+            archivo = repo.get_contents(self.path)
+        except UnknownObjectException:
+            return self._semilla(repo), None
+        return json.loads(archivo.decoded_content), archivo.sha
+
+    # El sha del archivo es la precondición: GitHub responde 409 (o 422 al crear) si cambió
+    # Si la escritura llegó a GitHub antes del corte, el reintento choca con el sha y se relee
+    def escribir(self, estado, version, mensaje=None):
+        mensaje = mensaje or "Actualiza la numeración de remitos"
+        return self._con_repo(lambda repo: self._escribir(repo, estado, version, mensaje))
+
+    def _escribir(self, repo, estado, version, mensaje):
+        from github import GithubException
+
+        try:
+            if version is None:
+                repo.create_file(self.path, mensaje, _serializar(estado))
+            else:
+                repo.update_file(self.path, mensaje, _serializar(estado), version)
+        except GithubException as e:
+            if e.status in (409, 422):
+                return False
+            raise
+        return True
+
+
+class AlmacenSQL:
+    def __init__(self, pool, clave='remitos', semilla=None):
+        self.pool = pool
+        self.clave = clave
+        self._semilla = semilla or estado_inicial
+
+    def leer(self):
+        with self.pool.transaccion() as cursor:
+            cursor.execute("SELECT estado, version FROM numeracion WHERE clave = ?", (self.clave,))
+            fila = cursor.fetchone()
+        if fila is None:
+            return self._semilla(), None
+        return json.loads(fila[0]), fila[1]
+
+    # La versión de la fila es la precondición: el UPDATE no toca nada si otro la cambió antes
+    def escribir(self, estado, version, mensaje=None):
+        contenido = _serializar(estado).decode('utf-8')
+        try:
+            with self.pool.transaccion() as cursor:
+                if version is None:
+                    cursor.execute("INSERT INTO numeracion (clave, estado, version) VALUES (?, ?, 1)", (self.clave, contenido))
+                    return True
+                cursor.execute("UPDATE numeracion SET estado = ?, version = version + 1 WHERE clave = ? AND version = ?",
+                               (contenido, self.clave, version))
+                return cursor.rowcount == 1
+        except self.pool.dialecto.error_integridad:
+            return False
+
+
+class Numerador:
+    def __init__(self, almacen, tamano_bloque=TAMANO_BLOQUE, reintentos=8):
+        self.almacen = almacen
+        self.tamano_bloque = tamano_bloque
+        self.reintentos = reintentos
+        self._disponibles = []
+        self._lock = threading.Lock()
+
+    # Función para aplicar un cambio al estado con compare-and-swap; devuelve lo que devuelva el cambio
+    def _actualizar(self, cambio, mensaje):
+        for intento in range(self.reintentos):
+            estado, version = self.almacen.leer()
+            resultado = cambio(estado)
+            if self.almacen.escribir(estado, version, mensaje):
+                return resultado
+            time.sleep(random.uniform(0, 0.05 * 2 ** intento))
+        raise ConflictoNumeracion(f"No se pudo actualizar la numeración después de {self.reintentos} intentos")
+
+    # Función para reservar números en una sola operación; primero se reutilizan los devueltos.
+    # Con contiguos=True se reserva un rango nuevo (para los lotes, que numeran desde/hasta).
+    def reservar(self, cantidad, contiguos=False):
+        def cambio(estado):
+            numeros = []
+            if not contiguos:
+                devueltos = sorted(estado['devueltos'])
+                numeros, estado['devueltos'] = devueltos[:cantidad], devueltos[cantidad:]
+            faltan = cantidad - len(numeros)
+            numeros += list(range(estado['siguiente'], estado['siguiente'] + faltan))
+            estado['siguiente'] += faltan
+            return numeros
+
+        return self._actualizar(cambio, f"Reserva {cantidad} números de remito ({socket.gethostname()})")
+
+    # Función para devolver números reservados que no se usaron
+    def devolver(self, numeros):
+        numeros = sorted(set(numeros))
+        if not numeros:
+            return
+
+        def cambio(estado):
+            if numeros[-1] == estado['siguiente'] - 1 and len(numeros) == numeros[-1] - numeros[0] + 1:
+                # El bloque era el último reservado: se libera sin dejar huecos
+                estado['siguiente'] = numeros[0]
+            else:
+                estado['devueltos'] = sorted(set(estado['devueltos']) | set(numeros))
+
+        self._actualizar(cambio, f"Devuelve {len(numeros)} números de remito ({socket.gethostname()})")
+
+    # Función para anular números que no se pueden volver a usar ni llegaron a emitirse
+    def anular(self, numeros):
+        numeros = sorted(set(numeros))
+        if not numeros:
+            return
+
+        def cambio(estado):
+            estado['anulados'] = sorted(set(estado.get('anulados', [])) | set(numeros))
+
+        self._actualizar(cambio, f"Anula {len(numeros)} números de remito ({socket.gethostname()})")
+
+    # Función para obtener el próximo número; sólo va al almacén cuando se termina el bloque
+    def siguiente(self):
+        with self._lock:
+            if not self._disponibles:
+                self._disponibles = self.reservar(self.tamano_bloque)
+            return self._disponibles.pop(0)
+
+    # Función para obtener varios números de una vez: primero los del bloque y, si no alcanzan, una sola reserva más
+    def siguientes(self, cantidad):
+        with self._lock:
+            faltan = cantidad - len(self._disponibles)
+            if faltan > 0:
+                self._disponibles += self.reservar(max(faltan, self.tamano_bloque))
+            numeros, self._disponibles = self._disponibles[:cantidad], self._disponibles[cantidad:]
+            return numeros
+
+    # Función para volver a poner en el bloque un número que se sacó pero no se llegó a usar
+    def reponer(self, numero):
+        with self._lock:
+            self._disponibles.insert(0, numero)
+
+    # Función para devolver al almacén los números del bloque que quedaron sin usar
+    def liberar(self):
+        with self._lock:
+            disponibles, self._disponibles = self._disponibles, []
+        self.devolver(disponibles)
+
+
+# Función para auditar la numeración: números emitidos más de una vez y números
+# salteados (ni emitidos, ni devueltos, ni anulados). Los salteados pueden estar todavía en el
+# bloque de un despachador en uso.
+def auditar(emitidos, estado, desde=None):
+    conteo = {}
+    for numero in emitidos:
+        conteo[numero] = conteo.get(numero, 0) + 1
+    devueltos = set(estado['devueltos'])
+    anulados = set(estado.get('anulados', []))
+    desde = desde if desde is not None else min(conteo, default=estado['siguiente'])
+    return {
+        'desde': desde,
+        'hasta': estado['siguiente'] - 1,
+        'emitidos': len(conteo),
+        'duplicados': sorted(numero for numero, veces in conteo.items() if veces > 1),
+        'salteados': [numero for numero in range(desde, estado['siguiente']) if numero not in conteo and numero not in devueltos and numero not in anulados],
+        'anulados': sorted(anulados),
+        'devueltos_emitidos': sorted(devueltos & set(conteo)),
+        'fecha': datetime.now().isoformat(timespec='seconds'),
+    }
+
+
+# Un solo numerador por proceso; al terminar el proceso devuelve lo que no usó
+_numerador = None
+_numerador_lock = threading.Lock()
+
+
+# Función para obtener el numerador del proceso
+def obtener_numerador(almacen, tamano_bloque=TAMANO_BLOQUE):
+    global _numerador
+    with _numerador_lock:
+        if _numerador is None:
+            _numerador = Numerador(almacen, tamano_bloque)
+            atexit.register(_numerador.liberar)
+        return _numerador
+
+
+# Función para tomar el valor de ultimo_remito.txt como punto de partida en GitHub
+def semilla_ultimo_remito(repo):
+    from github import UnknownObjectException
+
+    try:
+        contenido = repo.get_contents("ultimo_remito.txt")
+        return estado_inicial(int(contenido.decoded_content.decode('utf-8')))
+    except (UnknownObjectException, ValueError):
+        return estado_inicial()
+
+
+if __name__ == '__main__':
+    from github import Github, UnknownObjectException
+
+    from indice_remitos import CARPETA_INDICE
+
+    parser = argparse.ArgumentParser(description="Audita la numeración de remitos contra el índice publicado en GitHub.")
+    parser.add_argument('--repo', default="jgonzalohernandez/ArchivosGenerados")
+    parser.add_argument('--api', default=os.getenv('GITHUB_API_URL', 'https://api.github.com'))
+    parser.add_argument('--desde', type=int, default=None, help="Primer número a auditar (por defecto, el menor emitido)")
+    args = parser.parse_args()
+
+    repo = Github(os.getenv('PAT_GITHUB'), base_url=args.api).get_repo(args.repo)
+    estado, _ = AlmacenGithub(lambda: repo, semilla=semilla_ultimo_remito).leer()
+    emitidos = []
+    try:
+        archivos = repo.get_contents(CARPETA_INDICE)
+    except UnknownObjectException:
+        archivos = []
+    for archivo in archivos:
+        for linea in archivo.decoded_content.decode('utf-8').splitlines():
+            if linea.strip():
+                emitidos.append(json.loads(linea)['numero'])
+
+    resultado = auditar(emitidos, estado, args.desde)
+    print(f"Números {resultado['desde']} a {resultado['hasta']}: {resultado['emitidos']} emitidos")
+    print(f"Duplicados: {resultado['duplicados'] or 'ninguno'}")
+    print(f"Salteados (o reservados por un despachador en uso): {resultado['salteados'] or 'ninguno'}")
+    if resultado['anulados']:
+        print(f"Anulados (quedaron en el libro sin publicarse): {resultado['anulados']}")
+    if resultado['devueltos_emitidos']:
+        print(f"Devueltos que igual se emitieron: {resultado['devueltos_emitidos']}")
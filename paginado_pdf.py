@@ -0,0 +1,60 @@
+from reportlab.lib.units import mm
+
+from modelo_remito import a_pesos
+
+# Detalle paginado de los documentos (remitos y resúmenes): las líneas llegan de
+# un iterador y se dibujan a medida que llegan, sin juntarlas antes, así que un
+# documento con miles de líneas (pedidos consolidados) no las carga en memoria.
+# Cuando la página se llena se cierra con el subtotal a transportar, se abre otra
+# con la parte fija (marca de agua y encabezado, que se guardan una sola vez en el
+# PDF y se reutilizan en cada hoja) y el detalle sigue con la línea de transporte.
+
+ALTO_LINEA = 10 * mm
+MARGEN_INFERIOR = 10 * mm
+
+# Lo que ocupa el cierre debajo de la última línea: total, firma y pie
+ALTO_CIERRE = 50 * mm
+
+
+# Función para dibujar una línea del detalle (texto a la izquierda, importe a la derecha, punteado debajo)
+def dibujar_linea(c, y, texto, centavos):
+    c.setDash(1, 2)
+    c.drawString(20 * mm, y, texto)
+    c.drawRightString(195 * mm, y, f"${a_pesos(centavos)}")
+    c.line(15 * mm, y - 2 * mm, 195 * mm, y - 2 * mm)
+    c.setDash(1, 0)
+
+
+# Función para dibujar las líneas (texto, centavos) paginando cuando hace falta.
+# dibujar_pagina(c, hoja) dibuja la parte fija de cada hoja y devuelve la altura donde empieza el detalle.
+# Devuelve la altura libre debajo de la última línea, la suma de los importes y la cantidad de hojas.
+def dibujar_detalle(c, lineas, dibujar_pagina, alto_cierre=ALTO_CIERRE):
+    hoja = 1
+    y = dibujar_pagina(c, hoja)
+    acumulado = 0
+
+    def nueva_hoja():
+        nonlocal hoja, y
+        c.setFont("Helvetica-Bold", 10)
+        c.drawRightString(195 * mm, y, f"Subtotal a transportar: ${a_pesos(acumulado)}")
+        c.showPage()
+        hoja += 1
+        y = dibujar_pagina(c, hoja)
+        c.setFont("Helvetica-Bold", 10)
+        dibujar_linea(c, y, "Transporte", acumulado)
+        c.setFont("Helvetica", 10)
+        y -= ALTO_LINEA
+
+    c.setFont("Helvetica", 10)
+    for texto, centavos in lineas:
+        # Cada hoja deja lugar abajo para el subtotal a transportar
+        if y - ALTO_LINEA < MARGEN_INFERIOR:
+            nueva_hoja()
+        dibujar_linea(c, y, texto, centavos)
+        acumulado += centavos
+        y -= ALTO_LINEA
+
+    # El total y la firma no se separan: si no entran, van a una hoja nueva
+    if y - alto_cierre < MARGEN_INFERIOR:
+        nueva_hoja()
+    return y, acumulado, hoja
@@ -0,0 +1,70 @@
+import io
+import os
+
+from reportlab.lib.units import mm
+
+from paginado_pdf import dibujar_detalle
+from plantilla_pdf import dibujar_pie, dibujar_plantilla, perfil_pdf
+
+
+# Función para obtener el nombre de archivo de un remito
+def nombre_pdf(remito_numero):
+    return f'remito_{remito_numero}.pdf'
+
+
+# Función para generar el remito en PDF a partir del modelo (devuelve los bytes del archivo).
+# El perfil ('estandar' o 'compacto') define cómo se guarda la marca de agua; por defecto, REMITOS_PERFIL_PDF.
+def generar_pdf(remito, logo_path, perfil=None):
+    # reportlab se importa recién acá (o antes, en la precarga) para no demorar el arranque
+    from reportlab.lib.pagesizes import A4
+    from reportlab.pdfgen import canvas
+
+    # El PDF se arma en memoria; quien lo llama decide si lo descarga, lo sube o lo archiva.
+    # invariant fija la fecha de creación y el ID del documento: el mismo remito da siempre los mismos bytes
+    buffer = io.BytesIO()
+    c = canvas.Canvas(buffer, pagesize=A4, pageCompression=perfil_pdf(perfil)['compresion'], invariant=1)
+
+    margin_top = 240 * mm
+    inner_margin = 10 * mm
+
+    # Cada hoja lleva la marca de agua, los datos de la empresa y el número; la primera, además, los datos del cliente
+    def dibujar_pagina(c, hoja):
+        dibujar_plantilla(c, logo_path, perfil=perfil)
+        c.setFont("Helvetica", 10)
+        c.drawRightString(195 * mm, 255 * mm, f"N° de Servicio: {remito.numero}")
+        c.drawRightString(195 * mm, 250 * mm, f"Fecha: {remito.fecha.strftime('%Y-%m-%d')}")
+        if hoja > 1:
+            c.drawRightString(195 * mm, 245 * mm, f"Hoja {hoja}")
+            return margin_top - 5 * mm
+
+        c.rect(15 * mm, margin_top - 55 * mm, 180 * mm, 55 * mm, stroke=1, fill=0)
+        c.drawString(20 * mm + inner_margin, margin_top - 10 * mm, f"Cliente: {remito.cliente}")
+        c.drawString(20 * mm + inner_margin, margin_top - 20 * mm, f"Domicilio: {remito.domicilio}")
+        c.drawString(20 * mm + inner_margin, margin_top - 30 * mm, f"Sector: {remito.sector}")
+        c.drawString(20 * mm + inner_margin, margin_top - 40 * mm, f"Solicitante: {remito.solicitante}")
+        c.drawString(20 * mm + inner_margin, margin_top - 50 * mm, f"Moto: {remito.moto}")
+        return 160 * mm
+
+    # Direcciones, bultos y recargos salen del modelo, con los mismos importes que van al libro;
+    # si no entran en una hoja siguen en la próxima con el subtotal transportado
+    detalle_y_position, _, _ = dibujar_detalle(c, remito.lineas(), dibujar_pagina)
+
+    c.setFont("Helvetica", 10)
+    c.drawRightString(195 * mm, detalle_y_position - 10 * mm, f"Importe Total: ${remito.total}")
+
+    firma_y_position = detalle_y_position - 30 * mm
+    dibujar_pie(c, firma_y_position)
+    c.save()
+
+    return buffer.getvalue()
+
+
+# Función para guardar una copia local del PDF ya generado (archivo opcional)
+def guardar_pdf_local(contenido, remito_numero, carpeta_remitos='remitos'):
+    if not os.path.exists(carpeta_remitos):
+        os.makedirs(carpeta_remitos)
+
+    pdf_path = os.path.join(carpeta_remitos, nombre_pdf(remito_numero))
+    with open(pdf_path, 'wb') as file:
+        file.write(contenido)
+    return pdf_path
@@ -0,0 +1,206 @@
+import copy
+import hashlib
+import io
+import os
+import threading
+
+from reportlab.lib.units import mm
+
+# Caché de proceso para el logo: se procesa una sola vez y se reutiliza en
+# todos los remitos hasta que cambie el archivo en disco.
+_logos = {}
+_logos_lock = threading.Lock()
+
+# Perfiles de salida del PDF. El estándar embebe el JPG tal cual y lo aclara con
+# transparencia; el compacto lo achica una sola vez a la resolución con que se
+# imprime, lo aclara de antemano (sin transparencia) y lo guarda sin ASCII85.
+# En los dos, los textos usan sólo Helvetica (de las 14 fuentes estándar, no se embebe).
+PERFILES_PDF = {
+    'estandar': {'compresion': 1, 'dpi_marca': None, 'calidad_marca': None},
+    'compacto': {'compresion': 1, 'dpi_marca': 72, 'calidad_marca': 50},
+}
+PERFIL_PDF = os.getenv('REMITOS_PERFIL_PDF', 'estandar')
+
+ANCHO_MARCA = 210 * mm
+OPACIDAD_MARCA = 0.3
+
+# Datos fijos de la empresa que se imprimen en el encabezado de cada remito
+ENCABEZADO_EMPRESA = [
+    "Motoya Mensajería",
+    "Cel.: 15-4194-6280",
+    "Email: motoyamensajeria@gmail.com",
+    "Web: www.motoya.com.ar",
+]
+
+PIE_REMITO = [
+    "La mercadería viaja por cuenta y riesgo del cliente.",
+]
+
+
+# Función para obtener la configuración de un perfil de salida (el del entorno si no se indica)
+def perfil_pdf(nombre=None):
+    nombre = nombre or PERFIL_PDF
+    if nombre not in PERFILES_PDF:
+        raise ValueError(f"Perfil de PDF desconocido: {nombre}")
+    return PERFILES_PDF[nombre]
+
+
+# Función para armar la marca de agua compacta: achicada a la resolución de impresión,
+# mezclada con blanco según la opacidad y codificada como JPG
+def _marca_compacta(path, nombre, dpi, calidad):
+    from PIL import Image
+    from reportlab.pdfbase import pdfdoc
+
+    with Image.open(path) as original:
+        imagen = original.convert('RGB')
+    ancho_px = round(ANCHO_MARCA / 72 * dpi)
+    if imagen.width > ancho_px:
+        imagen = imagen.resize((ancho_px, max(1, round(imagen.height * ancho_px / imagen.width))), Image.LANCZOS)
+    imagen = Image.blend(Image.new('RGB', imagen.size, 'white'), imagen, OPACIDAD_MARCA)
+    salida = io.BytesIO()
+    imagen.save(salida, format='JPEG', quality=calidad, optimize=True)
+
+    xobject = pdfdoc.PDFImageXObject(nombre)
+    xobject.width, xobject.height = imagen.size
+    xobject.bitsPerComponent = 8
+    xobject.colorSpace = 'DeviceRGB'
+    xobject.streamContent = salida.getvalue()
+    xobject._filters = ('DCTDecode',)
+    xobject.mask = None
+    return xobject
+
+
+# Función para leer y preparar el logo (imagen JPG ya codificada para el PDF)
+def _preparar_logo(path, mtime, tamano, anterior, perfil):
+    from reportlab.pdfbase import pdfdoc
+
+    with open(path, 'rb') as file:
+        contenido = file.read()
+    huella = hashlib.sha1(contenido).hexdigest()
+
+    # Si sólo cambió el mtime pero el contenido es el mismo, se conserva lo ya preparado
+    if anterior is not None and anterior['hash'] == huella:
+        return dict(anterior, mtime=mtime, tamano=tamano)
+
+    if perfil['dpi_marca']:
+        nombre = f"logo_{huella[:16]}_{perfil['dpi_marca']}_{perfil['calidad_marca']}"
+        xobject = _marca_compacta(path, nombre, perfil['dpi_marca'], perfil['calidad_marca'])
+    else:
+        nombre = f"logo_{huella[:16]}"
+        xobject = pdfdoc.PDFImageXObject(nombre, path, mask='auto')
+    return {
+        'mtime': mtime,
+        'tamano': tamano,
+        'hash': huella,
+        'nombre': nombre,
+        'ancho_px': xobject.width,
+        'alto_px': xobject.height,
+        'xobject': xobject,
+        # La marca compacta ya viene aclarada: se dibuja sin transparencia
+        'aclarado': bool(perfil['dpi_marca']),
+    }
+
+
+# Función para obtener el logo preparado desde la caché (se invalida por mtime o hash)
+def obtener_logo(path, perfil=None):
+    perfil = perfil_pdf(perfil)
+    clave = (path, perfil['dpi_marca'], perfil['calidad_marca'])
+    estado = os.stat(path)
+    with _logos_lock:
+        anterior = _logos.get(clave)
+        if anterior is not None and anterior['mtime'] == estado.st_mtime_ns and anterior['tamano'] == estado.st_size:
+            return anterior
+        logo = _preparar_logo(path, estado.st_mtime_ns, estado.st_size, anterior, perfil)
+        _logos[clave] = logo
+        return logo
+
+
+# Función para vaciar la caché de logos (por ejemplo, después de reemplazar el archivo)
+def limpiar_cache():
+    with _logos_lock:
+        _logos.clear()
+
+
+# Función para cargar el logo
+def cargar_logo(path, width, perfil=None):
+    logo = obtener_logo(path, perfil)
+    aspect = logo['alto_px'] / float(logo['ancho_px'])
+    return path, width, int(width * aspect)
+
+
+# Función para registrar la imagen del logo en el documento (una vez por PDF)
+def _registrar_logo(c, logo):
+    # Se replica lo que hace canvas.drawImage, pero partiendo de la imagen ya
+    # preparada en lugar de volver a leer y codificar el JPG.
+    nombre_registro = c._doc.getXObjectName(logo['nombre'])
+    if nombre_registro not in c._doc.idToObject:
+        imagen = copy.copy(logo['xobject'])
+        c._setXObjects(imagen)
+        c._doc.Reference(imagen, nombre_registro)
+        c._doc.addForm(logo['nombre'], imagen)
+    return nombre_registro
+
+
+# Función para dibujar el logo como marca de agua en toda la página
+def dibujar_marca_agua(c, logo_path, ancho=ANCHO_MARCA, alto_pagina=297 * mm, opacidad=OPACIDAD_MARCA, perfil=None):
+    logo = obtener_logo(logo_path, perfil)
+    _, logo_ancho, logo_alto = cargar_logo(logo_path, ancho, perfil)
+    nombre_registro = _registrar_logo(c, logo)
+    c.saveState()
+    if not logo['aclarado']:
+        c.setFillAlpha(opacidad)
+    c.translate((210 * mm - logo_ancho) / 2, (alto_pagina - logo_alto) / 2)
+    c.scale(logo_ancho, logo_alto)
+    c._code.append(f"/{nombre_registro} Do")
+    c.restoreState()
+    c._formsinuse.append(logo['nombre'])
+    c._currentPageHasImages = 1
+
+
+# Función para dibujar la parte fija de la página (marca de agua, empresa y título)
+def dibujar_plantilla(c, logo_path, encabezado=ENCABEZADO_EMPRESA, titulo="ORDEN DE SERVICIO", perfil=None):
+    # La marca de agua va directo en la página porque reportlab no exporta la
+    # transparencia dentro de los forms; la imagen igual se guarda una sola vez.
+    dibujar_marca_agua(c, logo_path, perfil=perfil)
+
+    nombre_form = "plantilla_" + hashlib.sha1("\n".join(encabezado + [titulo]).encode('utf-8')).hexdigest()[:16]
+    if not c.hasForm(nombre_form):
+        c.beginForm(nombre_form)
+        c.setFont("Helvetica", 10)
+        y = 280 * mm
+        for linea in encabezado:
+            c.drawString(20 * mm, y, linea)
+            y -= 5 * mm
+
+        c.setFont("Helvetica-Bold", 16)
+        c.drawCentredString(105 * mm, 255 * mm, titulo)
+        c.endForm()
+    c.doForm(nombre_form)
+
+
+# Función para dibujar el bloque de firma y el texto del pie a partir de una altura dada
+def dibujar_pie(c, firma_y_position, lineas=PIE_REMITO):
+    nombre_form = "pie_" + hashlib.sha1("\n".join(lineas).encode('utf-8')).hexdigest()[:16]
+    if not c.hasForm(nombre_form):
+        # El pie se arma con origen en la línea de firma y se desplaza al dibujarlo
+        c.beginForm(nombre_form, lowerx=0, lowery=-40 * mm, upperx=210 * mm, uppery=30 * mm)
+        c.setFont("Helvetica", 10)
+        c.setDash(1, 2)
+        c.line(20 * mm, 15 * mm, 100 * mm, 15 * mm)
+        c.line(20 * mm, 5 * mm, 100 * mm, 5 * mm)
+        c.setDash(1, 0)
+
+        c.drawString(20 * mm, 20 * mm, "Firma:")
+        c.drawString(20 * mm, 10 * mm, "Aclaración:")
+
+        c.setFont("Helvetica", 8)
+        texto_y_position = -15 * mm
+        for linea in lineas:
+            c.drawString(20 * mm, texto_y_position, linea)
+            texto_y_position -= 5 * mm
+        c.endForm()
+
+    c.saveState()
+    c.translate(0, firma_y_position)
+    c.doForm(nombre_form)
+    c.restoreState()
@@ -0,0 +1,49 @@
+import importlib
+import threading
+from datetime import date
+
+from metricas_remitos import obtener_metricas
+
+# Precarga en segundo plano de lo que la app no importa al arrancar: después de
+# mostrar la primera pantalla, un hilo arma un remito de prueba (reportlab, las
+# fuentes, el logo y la plantilla quedan en caché) e importa las bibliotecas que
+# se usan al guardar, publicar o exportar. Así el primer remito no paga esa demora.
+
+# Bibliotecas que se importan en la precarga, en el orden en que las necesita el primer remito
+MODULOS_PRECARGA = ('github', 'requests', 'pyarrow.parquet', 'pyarrow.dataset', 'pandas')
+
+_hilo = None
+_hilo_lock = threading.Lock()
+
+
+# Función que hace la precarga; cada paso se mide como la etapa 'precarga' de las métricas (las del proceso si no se pasan)
+def precargar(logo_path, modulos=MODULOS_PRECARGA, metricas=None):
+    from modelo_remito import ItemRemito, Remito
+    from pdf_remito import generar_pdf
+
+    metricas = metricas or obtener_metricas()
+    with metricas.etapa('precarga', paso='pdf'):
+        # Con la fecha de hoy: la tabla de tarifas puede no tener vigencia para fechas viejas
+        generar_pdf(Remito(0, date.today(), '', '', '', '', '', (ItemRemito('', 0),)), logo_path)
+    for modulo in modulos:
+        with metricas.etapa('precarga', paso=modulo):
+            importlib.import_module(modulo)
+
+
+def _precargar_sin_errores(logo_path, modulos):
+    try:
+        precargar(logo_path, modulos)
+    except Exception:
+        # La precarga es sólo una optimización: si algo falla, se carga cuando se use (el error queda en la traza)
+        pass
+
+
+# Función para arrancar la precarga una sola vez por proceso (las llamadas siguientes no hacen nada)
+def iniciar_precarga(logo_path, modulos=MODULOS_PRECARGA):
+    global _hilo
+    with _hilo_lock:
+        if _hilo is None:
+            _hilo = threading.Thread(target=_precargar_sin_errores, args=(logo_path, modulos), name="precarga", daemon=True)
+            _hilo.start()
+        return _hilo
+
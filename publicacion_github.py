@@ -0,0 +1,138 @@
+import base64
+import hashlib
+import random
+import time
+
+
+# Publicación de varios archivos en un único commit usando la Git Data API:
+# un árbol nuevo con todos los cambios, un commit y la actualización de la rama
+# sólo si sigue apuntando al commit que se usó como base (compare-and-swap).
+# Lo que ya está publicado con el mismo contenido (mismo sha de blob, calculado
+# localmente) no se vuelve a subir, y si el árbol nuevo queda igual al de la base
+# no se crea ningún commit.
+
+
+class ConflictoPublicacion(Exception):
+    pass
+
+
+# Función para calcular el sha de un archivo igual que git (blob), sin llamar a la API
+def sha_blob(contenido):
+    return hashlib.sha1(b"blob %d\0" % len(contenido) + contenido).hexdigest()
+
+
+# Función para leer un archivo del repositorio en un commit dado (None si no existe)
+def leer_archivo(repo, path, ref=None):
+    from github import UnknownObjectException
+
+    try:
+        archivo = repo.get_contents(path, ref=ref) if ref else repo.get_contents(path)
+    except UnknownObjectException:
+        return None
+    # La API de contenidos no trae el contenido de archivos de más de 1 MB
+    if archivo.encoding == 'base64' and archivo.content:
+        return archivo.decoded_content
+    return base64.b64decode(repo.get_git_blob(archivo.sha).content)
+
+
+class PublicadorCommits:
+    def __init__(self, repo, rama=None, reintentos=5):
+        self.repo = repo
+        self.rama = rama
+        self.reintentos = reintentos
+        self._ref = None
+        self._commit = None
+        # Contenido de los archivos anexables tal como quedaron en self._commit
+        self._anexables = {}
+        # Sha de blob de los archivos que se sabe cómo quedaron en self._commit
+        self._shas = {}
+        # Blobs binarios que ya existen en el repositorio
+        self._blobs = set()
+        # Archivos que no se subieron porque la rama ya los tenía con el mismo contenido
+        self.omitidos = 0
+
+    # Función para leer la punta actual de la rama; la próxima publicación la usa como base
+    def leer_rama(self):
+        rama = self.rama or self.repo.default_branch
+        self._ref = self.repo.get_git_ref(f"heads/{rama}")
+        self._commit = self.repo.get_git_commit(self._ref.object.sha)
+        self._anexables = {}
+        self._shas = {}
+        return self._commit
+
+    # Función para leer un archivo en el commit base (b'' si todavía no existe)
+    def _leer_en_base(self, path):
+        if path not in self._anexables:
+            self._anexables[path] = leer_archivo(self.repo, path, self._commit.sha) or b''
+            self._shas[path] = sha_blob(self._anexables[path])
+        return self._anexables[path]
+
+    # Función para armar los elementos del árbol: el texto va directo, lo binario como blob y None borra el archivo
+    def _elementos(self, archivos):
+        from github import InputGitTreeElement
+
+        elementos = []
+        for path, contenido in archivos.items():
+            if contenido is None:
+                elementos.append(InputGitTreeElement(path, '100644', 'blob', sha=None))
+                continue
+            try:
+                texto = contenido.decode('utf-8')
+            except UnicodeDecodeError:
+                sha = sha_blob(contenido)
+                if sha not in self._blobs:
+                    self.repo.create_git_blob(base64.b64encode(contenido).decode('ascii'), 'base64')
+                    self._blobs.add(sha)
+                elementos.append(InputGitTreeElement(path, '100644', 'blob', sha=sha))
+            else:
+                elementos.append(InputGitTreeElement(path, '100644', 'blob', content=texto))
+        return elementos
+
+    # Función para publicar {path: bytes} en un solo commit; devuelve el sha del commit.
+    # Los anexos {path: bytes} se agregan al final del archivo que haya en la rama.
+    def publicar(self, archivos, mensaje, anexos=None):
+        from github import GithubException
+
+        anexos = anexos or {}
+        shas = {path: None if contenido is None else sha_blob(contenido) for path, contenido in archivos.items()}
+        for intento in range(self.reintentos):
+            # En régimen se reutiliza el último commit propio como base y no se consulta la rama
+            if self._commit is None:
+                self.leer_rama()
+
+            # Un anexo que ya está al final del archivo es uno que se publicó y cuya confirmación no llegó
+            completos = {}
+            for path, agregado in anexos.items():
+                base = self._leer_en_base(path)
+                if not base.endswith(agregado):
+                    completos[path] = base + agregado
+            cambios = {path: contenido for path, contenido in archivos.items() if path not in self._shas or self._shas[path] != shas[path]}
+            if not cambios and not completos:
+                self.omitidos += len(archivos)
+                return self._commit.sha
+
+            arbol = self.repo.create_git_tree(self._elementos(cambios) + self._elementos(completos), self._commit.tree)
+            if arbol.sha == self._commit.tree.sha:
+                # Todo lo que se quería publicar ya estaba en la rama con el mismo contenido
+                self._shas.update({path: shas[path] for path in cambios})
+                self.omitidos += len(archivos)
+                return self._commit.sha
+            commit = self.repo.create_git_commit(mensaje, arbol, [self._commit])
+            try:
+                self._ref.edit(commit.sha, force=False)
+            except GithubException as e:
+                if e.status not in (409, 422):
+                    raise
+                # La rama avanzó (otro operador publicó): se vuelve a leer y se reintenta
+                self._commit = None
+                time.sleep(random.uniform(0, 0.5 * 2 ** intento))
+                continue
+
+            self._commit = commit
+            self.omitidos += len(archivos) - len(cambios)
+            self._anexables.update(completos)
+            self._shas.update({path: shas[path] for path in cambios})
+            self._shas.update({path: sha_blob(contenido) for path, contenido in completos.items()})
+            return commit.sha
+
+        raise ConflictoPublicacion(f"No se pudo actualizar la rama después de {self.reintentos} intentos")
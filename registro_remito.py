@@ -0,0 +1,141 @@
+import argparse
+import hashlib
+import json
+import os
+
+from modelo_remito import ItemRemito, Remito, a_pesos
+from publicacion_github import sha_blob
+
+# Registro de un remito: el documento que se guarda y se publica en lugar del
+# PDF. Es un JSON canónico (claves ordenadas, sin espacios) con todos los datos
+# del formulario, los ítems en centavos y la tarifa con que se cotizó, así que
+# el remito se puede volver a cotizar e imprimir igual aunque después cambien
+# las tarifas. El PDF se arma recién cuando alguien lo pide, siempre igual byte
+# a byte (pdf_remito lo genera con fecha e ID fijos), y se guarda en la caché de
+# descargas con el sha del registro: el mismo registro da siempre el mismo PDF.
+
+FORMATO_REGISTRO = 1
+
+# Versión del dibujo del PDF: se sube cuando cambia pdf_remito, así no se sirven PDFs renderizados con el anterior
+VERSION_RENDER = 1
+
+CARPETA_REGISTROS = 'registros'
+
+
+# Función para obtener el path del registro de un remito (registros/AAAA-MM/remito_<numero>.json)
+def ruta_registro(remito_numero, fecha):
+    return f"{CARPETA_REGISTROS}/{str(fecha)[:7]}/remito_{remito_numero}.json"
+
+
+# Función para saber si un path del índice es un registro (los remitos anteriores apuntan al PDF)
+def es_registro(path):
+    return path.startswith(f"{CARPETA_REGISTROS}/") and path.endswith('.json')
+
+
+# Función para armar el registro de un remito con la tarifa con que se cotiza
+def registro_remito(remito, tarifas=None):
+    cotizacion = remito.cotizacion(tarifas)
+    tarifa = cotizacion.tarifa
+    return {
+        'formato': FORMATO_REGISTRO,
+        'numero': int(remito.numero),
+        'fecha': remito.fecha.strftime('%Y-%m-%d'),
+        'cliente': remito.cliente,
+        'domicilio': remito.domicilio,
+        'sector': remito.sector,
+        'solicitante': remito.solicitante,
+        'moto': remito.moto,
+        'items': [[item.direccion, item.centavos] for item in remito.items],
+        'lluvia': bool(remito.lluvia),
+        'exclusividad': bool(remito.exclusividad),
+        'cantidad_bultos': remito.cantidad_bultos,
+        'tarifa': {
+            'desde': tarifa.desde.strftime('%Y-%m-%d'),
+            'bulto': tarifa.centavos_bulto,
+            'recargos': [[recargo.nombre, recargo.etiqueta, recargo.porcentaje, recargo.sobre] for recargo in tarifa.recargos],
+        },
+        'total': cotizacion.total_centavos,
+    }
+
+
+# Función para serializar el registro de un remito (bytes canónicos: el mismo remito da siempre los mismos bytes)
+def serializar_registro(remito, tarifas=None):
+    return json.dumps(registro_remito(remito, tarifas), ensure_ascii=False, sort_keys=True, separators=(',', ':')).encode('utf-8')
+
+
+# Función para obtener la huella de un remito: el hash de su registro sin el número (lo que se cotiza y se imprime).
+# Con ella se verifica que un reintento con la misma clave de idempotencia trae el mismo remito.
+def huella_remito(remito, tarifas=None):
+    datos = registro_remito(remito, tarifas)
+    del datos['numero']
+    return hashlib.sha256(json.dumps(datos, ensure_ascii=False, sort_keys=True, separators=(',', ':')).encode('utf-8')).hexdigest()
+
+
+# Función para armar la tabla de tarifas de un registro (sólo la tarifa con que se emitió)
+def tarifas_registro(tarifa):
+    from tarifas_remito import TablaTarifas
+
+    return TablaTarifas({
+        'recargos': [{'nombre': nombre, 'etiqueta': etiqueta, 'sobre': sobre} for nombre, etiqueta, _, sobre in tarifa['recargos']],
+        'vigencias': [{
+            'desde': tarifa['desde'],
+            'bulto': str(a_pesos(tarifa['bulto'])),
+            'porcentajes': {nombre: porcentaje for nombre, _, porcentaje, _ in tarifa['recargos']},
+        }],
+    })
+
+
+# Función para leer un registro y devolver el remito, cotizado con la tarifa del registro
+def leer_registro(contenido):
+    datos = json.loads(contenido)
+    if datos.get('formato') != FORMATO_REGISTRO:
+        raise ValueError(f"Formato de registro desconocido: {datos.get('formato')}")
+    remito = Remito(
+        datos['numero'], datos['fecha'], datos['cliente'], datos['domicilio'], datos['sector'], datos['solicitante'],
+        datos['moto'], tuple(ItemRemito(direccion, centavos) for direccion, centavos in datos['items']),
+        datos['lluvia'], datos['exclusividad'], datos['cantidad_bultos'], tarifas=tarifas_registro(datos['tarifa']))
+    if remito.total_centavos != datos['total']:
+        raise ValueError(f"El registro del remito {datos['numero']} no cierra: total {datos['total']}, cotizado {remito.total_centavos}")
+    return remito
+
+
+# Función para obtener la clave de caché de los PDFs de un logo y un perfil (el sha del registro completa la clave)
+def clave_render(logo_path, perfil=None):
+    from plantilla_pdf import PERFIL_PDF, obtener_logo
+
+    return f"pdf/{VERSION_RENDER}/{perfil or PERFIL_PDF}/{obtener_logo(logo_path, perfil)['hash'][:16]}"
+
+
+# Función para obtener el PDF de un registro: de la caché si ya se renderizó, si no se arma y se guarda
+def pdf_registro(contenido, logo_path, cache=None, perfil=None):
+    from pdf_remito import generar_pdf
+
+    clave = clave_render(logo_path, perfil)
+    sha = sha_blob(contenido)
+    if cache is not None:
+        pdf_bytes = cache.leer(clave, sha)
+        if pdf_bytes is not None:
+            return pdf_bytes
+    pdf_bytes = generar_pdf(leer_registro(contenido), logo_path, perfil)
+    if cache is not None:
+        cache.guardar(clave, pdf_bytes, sha)
+    return pdf_bytes
+
+
+if __name__ == '__main__':
+    from pdf_remito import nombre_pdf
+
+    parser = argparse.ArgumentParser(description="Genera el PDF de un remito a partir de su registro.")
+    parser.add_argument('registro', help="Archivo JSON del registro")
+    parser.add_argument('--logo', default="logo motoya curvas-1.jpg", help="Ruta del logo para la marca de agua")
+    parser.add_argument('--perfil', default=None, help="Perfil de salida del PDF (por defecto REMITOS_PERFIL_PDF o 'estandar')")
+    parser.add_argument('--salida', default=None, help="Carpeta del PDF (por defecto, la del registro)")
+    args = parser.parse_args()
+
+    with open(args.registro, 'rb') as file:
+        contenido = file.read()
+    remito = leer_registro(contenido)
+    salida = os.path.join(args.salida or os.path.dirname(os.path.abspath(args.registro)), nombre_pdf(remito.numero))
+    with open(salida, 'wb') as file:
+        file.write(pdf_registro(contenido, args.logo, perfil=args.perfil))
+    print(f"{salida}: {len(contenido)} bytes de registro, {os.path.getsize(salida)} bytes de PDF")
@@ -1,198 +1,173 @@
 import streamlit as st
-from reportlab.lib.pagesizes import A4
-from reportlab.pdfgen import canvas
-from reportlab.lib.units import mm
-from reportlab.lib import utils
-import pandas as pd
 import os
 from datetime import datetime
-from github import Github
 import base64
 import io
-
-# Función para cargar el logo
-def cargar_logo(path, width):
-    img = utils.ImageReader(path)
-    iw, ih = img.getSize()
-    aspect = ih / float(iw)
-    return path, width, int(width * aspect)
+import uuid
+
+from pdf_remito import guardar_pdf_local, nombre_pdf
+from libro_sql import URL_SQL, obtener_libro, obtener_pool
+from libro_publicado import obtener_consolidador, leer_mes_publicado
+from bandeja_salida import obtener_bandeja
+from conexion_github import obtener_recursos
+from busqueda_remitos import obtener_busqueda
+from cache_descargas import obtener_cache_descargas
+from indice_remitos import obtener_indice, leer_lineas, buscar, CARPETA_INDICE
+from numeracion_remitos import AlmacenGithub, AlmacenSQL, obtener_numerador, semilla_ultimo_remito
+from modelo_remito import Remito, a_centavos, a_pesos, items_remito
+from tarifas_remito import obtener_tarifas
+from precarga import iniciar_precarga
+from metricas_remitos import obtener_metricas
+from registro_remito import CARPETA_REGISTROS, es_registro, huella_remito, pdf_registro
+from emision_remitos import obtener_emisor
 
 # Obtén el token desde la variable de entorno o reemplázalo por el token de GitHub aquí
 GITHUB_TOKEN = os.getenv('PAT_GITHUB')  # Asegúrate de que este valor esté configurado
 REPO_NAME = "jgonzalohernandez/ArchivosGenerados"  # Reemplaza con tu repositorio
-
-g = Github(GITHUB_TOKEN)
-repo = g.get_repo(REPO_NAME)
-
-# Función para subir archivos a GitHub
-def subir_a_github(ruta_archivo, nombre_archivo):
-    with open(ruta_archivo, 'rb') as file:
-        contenido = file.read()
-        contenido_base64 = base64.b64encode(contenido).decode('utf-8')
-        
-    # Verifica si el archivo ya existe
+GITHUB_API_URL = os.getenv('GITHUB_API_URL', 'https://api.github.com')  # Permite apuntar a un servidor de prueba
+
+# Tiempos de cada etapa, llamadas a la API de GitHub y tamaños (no miden nada si no se configuran
+# REMITOS_METRICAS_PUERTO ni REMITOS_TRAZAS)
+metricas = obtener_metricas()
+
+# Cliente, repositorio y sesión HTTP de GitHub: uno por proceso, se crean recién cuando hacen falta.
+# Volver a ejecutar el script no hace ninguna llamada a la API.
+recursos = obtener_recursos(REPO_NAME, GITHUB_API_URL)
+
+# Las subidas las hace un hilo en segundo plano
+bandeja = obtener_bandeja(recursos.repo, reconectar=recursos.reconectar)
+
+# Índice mensual de remitos (validado con ETag); se refresca cuando la bandeja confirma una subida
+indice = obtener_indice(GITHUB_TOKEN, REPO_NAME, GITHUB_API_URL, obtener_sesion=recursos.sesion)
+bandeja.suscribir(indice.invalidar)
+
+# Copias locales de los registros descargados (validadas con el sha del índice) y de los PDFs armados a partir de ellos
+descargas = obtener_cache_descargas(recursos.sesion, REPO_NAME, GITHUB_API_URL, reconectar=recursos.reconectar)
+
+REMITOS_POR_PAGINA = 50
+
+# Libro de remitos: en la base SQL de REMITOS_SQL o, si no está configurada, en Parquet por mes.
+# El CSV mensual se exporta desde acá.
+libro = obtener_libro(URL_SQL)
+
+# Índice de búsqueda (cliente, solicitante, moto, direcciones, fecha e importe) de todos los remitos del libro
+busqueda = obtener_busqueda(libro)
+
+# En GitHub cada remito sube su propia parte del libro; cada tanto se consolidan en el CSV del mes
+consolidador = obtener_consolidador(recursos.repo, reconectar=recursos.reconectar)
+bandeja.suscribir(consolidador.notificar)
+
+# Numeración compartida entre despachadores: cada proceso reserva un bloque de números en la base SQL o en GitHub
+if URL_SQL:
+    almacen_numeracion = AlmacenSQL(obtener_pool(URL_SQL))
+else:
+    almacen_numeracion = AlmacenGithub(recursos.repo, semilla=semilla_ultimo_remito, reconectar=recursos.reconectar)
+numerador = obtener_numerador(almacen_numeracion)
+
+# Numeración, registro, libro y publicación de cada remito (lo mismo que usa el servicio HTTP).
+# Uno por proceso: reconoce la clave de un envío repetido aunque llegue desde otra sesión.
+emisor = obtener_emisor(numerador, libro, busqueda, bandeja, descargas, metricas)
+if emisor.error_guardado:
+    st.sidebar.warning(f"Hay remitos publicados que no se pudieron guardar en el libro local (se reintenta con el próximo): {emisor.error_guardado}")
+
+# Carpeta para guardar una copia local de cada PDF (vacío = no se escribe nada en disco)
+CARPETA_REMITOS_LOCAL = os.getenv('REMITOS_CARPETA_LOCAL', '')
+
+# Función para leer un archivo del repositorio de GitHub como bytes (sha: el del índice, para usar la caché local)
+def descargar_de_github(nombre_archivo, sha=None):
+    # Si todavía no se subió, se sirve la copia que está en la bandeja de salida
+    pendiente = bandeja.pendiente(nombre_archivo)
+    if pendiente is not None:
+        return pendiente
+    contenido = descargas.obtener(nombre_archivo, sha)
+    # Los PDFs subidos antes se guardaban codificados en base64 dos veces
+    if nombre_archivo.endswith('.pdf') and not contenido.startswith(b'%PDF'):
+        contenido = base64.b64decode(contenido)
+    return contenido
+
+# Función para buscar un remito del libro en el índice (incluye lo que está en la bandeja); si no figura, se busca su registro
+def publicado_en_indice(registro):
+    mes = str(registro['fecha'])[:7]
+    return next((publicado for publicado in cargar_remitos_guardados_github(mes) if publicado['numero'] == registro['numero']), registro)
+
+# Función para armar el PDF de un registro (o leerlo de la caché si ya se armó)
+def pdf_de_registro(registro_bytes):
+    with metricas.etapa('pdf'):
+        pdf_bytes = pdf_registro(registro_bytes, logo_image_path, descargas)
+    metricas.observar('remitos_bytes', len(pdf_bytes), tipo='pdf')
+    return pdf_bytes
+
+# Función para obtener el PDF de un remito del índice a partir de lo publicado: se arma con su registro;
+# los remitos anteriores a los registros tienen el PDF subido
+def pdf_publicado(publicado, contenido):
+    if es_registro(publicado['path']):
+        return pdf_de_registro(contenido)
+    return contenido
+
+# Función para ofrecer la descarga de un remito del índice: lo publicado se baja ahora (si no está, se avisa)
+# y el PDF se arma recién si se descarga
+def ofrecer_descarga(publicado):
     try:
-        contenido_existente = repo.get_contents(nombre_archivo)
-        repo.update_file(contenido_existente.path, f"Actualiza {nombre_archivo}", contenido_base64, contenido_existente.sha)
-    except:
-        repo.create_file(nombre_archivo, f"Sube {nombre_archivo}", contenido_base64)
-
-# Función para cargar la lista de remitos guardados en el repositorio de GitHub
-def cargar_remitos_guardados_github():
-    remitos = []
+        with metricas.etapa('descarga'):
+            contenido = descargar_de_github(publicado['path'], publicado.get('sha'))
+    except FileNotFoundError:
+        st.error(f"No se encontró el remito N° {publicado['numero']} en GitHub ({publicado['path']})")
+        return
+    st.download_button(label="Descargar Remito", data=lambda: pdf_publicado(publicado, contenido),
+                       file_name=nombre_pdf(publicado['numero']), mime='application/pdf')
+
+# Función para cargar los meses que tienen remitos (incluye los que todavía están en la bandeja)
+def cargar_meses_remitos():
     try:
-        contenidos = repo.get_contents("")
-        for contenido in contenidos:
-            if contenido.path.endswith('.pdf'):
-                remitos.append(contenido.path)
+        meses = indice.meses()
     except Exception as e:
         st.error(f"Error al cargar remitos guardados: {e}")
-    return remitos
+        meses = []
+    pendientes = [path[len(CARPETA_INDICE) + 1:-len('.jsonl')] for path in bandeja.paths_pendientes() if path.startswith(f'{CARPETA_INDICE}/')]
+    return sorted(set(meses + pendientes) | {datetime.now().strftime('%Y-%m')}, reverse=True)
 
-# Función para leer el número de remito desde GitHub
-def leer_numero_remito():
+# Función para cargar los remitos guardados de un mes a partir del índice
+def cargar_remitos_guardados_github(mes):
     try:
-        contenido = repo.get_contents("ultimo_remito.txt")
-        numero_remito = int(contenido.decoded_content.decode('utf-8'))
-        return numero_remito
-    except:
-        return 5980  # Valor inicial si no hay registros
-
-# Función para guardar el número de remito en GitHub
-def guardar_numero_remito(numero):
+        registros = indice.leer_mes(mes)
+    except Exception as e:
+        st.error(f"Error al cargar remitos guardados: {e}")
+        registros = []
+    pendiente = bandeja.pendiente(f'{CARPETA_INDICE}/{mes}.jsonl')
+    if pendiente:
+        registros = list({registro['numero']: registro for registro in registros + leer_lineas(pendiente)}.values())
+    return registros
+
+# Función para armar el CSV de un mes: el publicado en GitHub (de todos los despachadores) o, si no hay conexión, el del libro local
+def exportar_csv_mes(mes):
     try:
-        contenido = repo.get_contents("ultimo_remito.txt")
-        repo.update_file(contenido.path, "Actualiza último remito", str(numero), contenido.sha)
-    except:
-        repo.create_file("ultimo_remito.txt", "Crea archivo de último remito", str(numero))
-
-# Función para generar el remito en PDF
-def generar_pdf(remito_numero, fecha, cliente, domicilio, sector, solicitante, moto, detalle_df, total_importe, logo_path, lluvia, exclusividad, cantidad_bultos):
-    carpeta_remitos = 'remitos'
-
-    if not os.path.exists(carpeta_remitos):
-        os.makedirs(carpeta_remitos)
-
-    pdf_path = os.path.join(carpeta_remitos, f'remito_{remito_numero}.pdf')
-    c = canvas.Canvas(pdf_path, pagesize=A4)
-
-    logo, logo_ancho, logo_alto = cargar_logo(logo_path, 210 * mm)
-    c.saveState()
-    c.setFillAlpha(0.3)
-    c.drawImage(logo, (210 * mm - logo_ancho) / 2, (297 * mm - logo_alto) / 2, width=logo_ancho, height=logo_alto, mask='auto')
-    c.restoreState()
-
-    c.setFont("Helvetica", 10)
-    c.drawString(20 * mm, 280 * mm, "Motoya Mensajería")
-    c.drawString(20 * mm, 275 * mm, "Cel.: 15-4194-6280")
-    c.drawString(20 * mm, 270 * mm, "Email: motoyamensajeria@gmail.com")
-    c.drawString(20 * mm, 265 * mm, "Web: www.motoya.com.ar")
-
-    c.setFont("Helvetica-Bold", 16)
-    c.drawCentredString(105 * mm, 255 * mm, "ORDEN DE SERVICIO")
-
-    c.setFont("Helvetica", 10)
-    c.drawRightString(195 * mm, 255 * mm, f"N° de Servicio: {remito_numero}")
-    c.drawRightString(195 * mm, 250 * mm, f"Fecha: {fecha}")
-
-    margin_top = 240 * mm
-    inner_margin = 10 * mm
-
-    c.rect(15 * mm, margin_top - 55 * mm, 180 * mm, 55 * mm, stroke=1, fill=0)
-    c.drawString(20 * mm + inner_margin, margin_top - 10 * mm, f"Cliente: {cliente}")
-    c.drawString(20 * mm + inner_margin, margin_top - 20 * mm, f"Domicilio: {domicilio}")
-    c.drawString(20 * mm + inner_margin, margin_top - 30 * mm, f"Sector: {sector}")
-    c.drawString(20 * mm + inner_margin, margin_top - 40 * mm, f"Solicitante: {solicitante}")
-    c.drawString(20 * mm + inner_margin, margin_top - 50 * mm, f"Moto: {moto}")
-
-    c.setDash(1, 2)
-    detalle_y_position = 160 * mm
-    for index, row in detalle_df.iterrows():
-        c.drawString(20 * mm, detalle_y_position, f"{row['Dirección']}")
-        c.drawRightString(195 * mm, detalle_y_position, f"${row['Monto']:.2f}")
-        c.line(15 * mm, detalle_y_position - 2 * mm, 195 * mm, detalle_y_position - 2 * mm)
-        detalle_y_position -= 10 * mm
-
-    if cantidad_bultos > 0:
-        c.drawString(20 * mm, detalle_y_position, f"Bulto(s) ({cantidad_bultos}):")
-        c.drawRightString(195 * mm, detalle_y_position, f"${2500 * cantidad_bultos:.2f}")
-        c.line(15 * mm, detalle_y_position - 2 * mm, 195 * mm, detalle_y_position - 2 * mm)
-        detalle_y_position -= 10 * mm
-
-    total_direcciones_monto = detalle_df["Monto"].sum() + (2500 * cantidad_bultos)
-    if exclusividad:
-        exclusividad_monto = total_direcciones_monto * 0.50
-        c.drawString(20 * mm, detalle_y_position, "Exclusividad (50% incremento):")
-        c.drawRightString(195 * mm, detalle_y_position, f"${exclusividad_monto:.2f}")
-        c.line(15 * mm, detalle_y_position - 2 * mm, 195 * mm, detalle_y_position - 2 * mm)
-        detalle_y_position -= 10 * mm
-        total_importe += exclusividad_monto
-
-    if lluvia:
-        lluvia_monto = total_direcciones_monto * 0.50
-        c.drawString(20 * mm, detalle_y_position, "Lluvia (50% incremento):")
-        c.drawRightString(195 * mm, detalle_y_position, f"${lluvia_monto:.2f}")
-        c.line(15 * mm, detalle_y_position - 2 * mm, 195 * mm, detalle_y_position - 2 * mm)
-        detalle_y_position -= 10 * mm
-        total_importe += lluvia_monto
-
-    c.setDash(1, 0)
-    c.drawRightString(195 * mm, detalle_y_position - 10 * mm, f"Importe Total: ${total_importe:.2f}")
-
-    firma_y_position = detalle_y_position - 30 * mm
-    c.setDash(1, 2)
-    c.line(20 * mm, firma_y_position + 15 * mm, 100 * mm, firma_y_position + 15 * mm)
-    c.line(20 * mm, firma_y_position + 5 * mm, 100 * mm, firma_y_position + 5 * mm)
-    c.setDash(1, 0)
-
-    c.drawString(20 * mm, firma_y_position + 20 * mm, "Firma:")
-    c.drawString(20 * mm, firma_y_position + 10 * mm, "Aclaración:")
-
-    texto_y_position = firma_y_position - 15 * mm
-    c.setFont("Helvetica", 8)
-    c.drawString(20 * mm, texto_y_position, "La mercadería viaja por cuenta y riesgo del cliente.")
-    c.save()
-
-    # Sube el PDF generado a GitHub
-    subir_a_github(pdf_path, f'remito_{remito_numero}.pdf')
-
-    return pdf_path
-
-# Función para guardar el remito en un archivo CSV
-def guardar_en_csv(remito_numero, fecha, cliente, domicilio, sector, solicitante, moto, detalle_df, total_importe, lluvia, exclusividad, cantidad_bultos):
-    fecha_obj = datetime.strptime(fecha, '%Y-%m-%d')
-    mes_anio = fecha_obj.strftime('%Y-%m')
-    csv_path = f'remitos_{mes_anio}.csv'
-
-    df = pd.DataFrame({
-        'Fecha': [fecha],
-        'Número de Remito': [remito_numero],
-        'Cliente': [cliente],
-        'Domicilio': [domicilio],
-        'Sector': [sector],
-        'Solicitante': [solicitante],
-        'Moto': [moto],
-        'Total Importe': [total_importe],
-        'Lluvia': ['Sí' if lluvia else 'No'],
-        'Exclusividad': ['Sí' if exclusividad else 'No'],
-        'Cantidad de Bultos': [cantidad_bultos],
-    })
-
-    for i, row in detalle_df.iterrows():
-        df[f'Dirección {i+1}'] = [row['Dirección']]
-        df[f'Monto {i+1}'] = [row['Monto']]
-
-    if os.path.exists(csv_path):
-        df.to_csv(csv_path, mode='a', header=False, index=False, sep=';', encoding='utf-8-sig')
-    else:
-        df.to_csv(csv_path, mode='w', header=True, index=False, sep=';', encoding='utf-8-sig')
-
-    # Sube el CSV generado a GitHub
-    subir_a_github(csv_path, csv_path)
+        pendientes = [bandeja.pendiente(path) for path in bandeja.paths_pendientes() if path.startswith(f'{CARPETA_REGISTROS}/{mes}/')]
+        contenido = leer_mes_publicado(indice, mes, [parte for parte in pendientes if parte is not None])
+        if contenido is not None:
+            return contenido
+    except Exception as e:
+        st.warning(f"No se pudo leer el CSV publicado, se usa el libro local: {e}")
+    return libro.exportar_csv(mes)
 
 # Interfaz de Streamlit
 st.title("Generador de Remitos Digitales")
 
+estado_bandeja = bandeja.estado()
+st.sidebar.subheader("Sincronización con GitHub")
+st.sidebar.write(f"Archivos pendientes de subir: {estado_bandeja['pendientes']}")
+if estado_bandeja['ultima_sincronizacion']:
+    st.sidebar.write(f"Última subida: {estado_bandeja['ultima_sincronizacion'].strftime('%d/%m/%Y %H:%M:%S')}")
+if estado_bandeja['ultimo_error']:
+    st.sidebar.warning(f"Último error: {estado_bandeja['ultimo_error']}")
+if metricas.error:
+    st.sidebar.warning(metricas.error)
+if st.sidebar.button("Verificar conexión"):
+    verificacion = recursos.verificar()
+    if verificacion['ok']:
+        st.sidebar.success(f"Conectado ({verificacion['milisegundos']} ms, quedan {verificacion['restantes']} consultas)")
+    else:
+        st.sidebar.error(verificacion['error'])
+
 fecha = st.date_input("Fecha del Remito", value=datetime.now())
 cliente = st.text_input("Nombre del Cliente")
 domicilio = st.text_input("Domicilio del Cliente")
@@ -207,7 +182,7 @@ num_rows = st.number_input("Cantidad de filas", min_value=1, max_value=20, value
 
 if len(st.session_state.detalle_data) < num_rows:
     for _ in range(num_rows - len(st.session_state.detalle_data)):
-        st.session_state.detalle_data.append({"Dirección": "", "Monto": 0.0})
+        st.session_state.detalle_data.append({"Dirección": "", "Monto": a_pesos(0)})
 elif len(st.session_state.detalle_data) > num_rows:
     st.session_state.detalle_data = st.session_state.detalle_data[:num_rows]
 
@@ -218,46 +193,105 @@ for i in range(num_rows):
     with col2:
         monto_str = st.text_input(f"Monto {i+1}", value=str(st.session_state.detalle_data[i]["Monto"]), key=f"monto_{i}")
         try:
-            st.session_state.detalle_data[i]["Monto"] = float(monto_str)
+            st.session_state.detalle_data[i]["Monto"] = a_pesos(a_centavos(monto_str))
         except ValueError:
-            st.session_state.detalle_data[i]["Monto"] = 0.0
+            st.session_state.detalle_data[i]["Monto"] = a_pesos(0)
+
+# Los recargos y el costo del bulto que se muestran son los de la tarifa vigente para la fecha y el cliente
+try:
+    tarifa_vigente = obtener_tarifas().tarifa(fecha, cliente)
+except ValueError as e:
+    st.error(str(e))
+    st.stop()
+recargos_vigentes = {recargo.nombre: recargo.porcentaje for recargo in tarifa_vigente.recargos}
+lluvia = st.checkbox(f"¿Está lloviendo? (Incrementa un {recargos_vigentes.get('lluvia', 0)}% la importación)")
+exclusividad = st.checkbox(f"¿Es un viaje exclusivo? (Incrementa un {recargos_vigentes.get('exclusividad', 0)}% la importación)")
+bultos = st.checkbox(f"¿Hay bultos? (Costo por bulto: ${a_pesos(tarifa_vigente.centavos_bulto)})")
+cantidad_bultos = st.number_input("Cantidad de bultos", min_value=1, value=1) if bultos else 0
 
-detalle_df = pd.DataFrame(st.session_state.detalle_data)
-total_importe = detalle_df["Monto"].sum()
+# Modelo del remito con importes en centavos; el número se asigna recién al generarlo
+remito_actual = Remito(0, fecha, cliente, domicilio, sector, solicitante, moto, items_remito(st.session_state.detalle_data), lluvia, exclusividad, cantidad_bultos)
+
+# Clave de idempotencia del envío: se mantiene mientras no se edite el formulario (un doble click o un reintento
+# devuelven el mismo remito) y se renueva al editarlo o con "Emitir otro remito igual".
+huella_formulario = huella_remito(remito_actual)
+if st.session_state.get('huella_formulario') != huella_formulario:
+    st.session_state.huella_formulario = huella_formulario
+    st.session_state.clave_envio = uuid.uuid4().hex
 
-lluvia = st.checkbox("¿Está lloviendo? (Incrementa un 50% la importación)")
-exclusividad = st.checkbox("¿Es un viaje exclusivo? (Incrementa un 50% la importación)")
-bultos = st.checkbox("¿Hay bultos? (Costo por bulto: $2500)")
-cantidad_bultos = st.number_input("Cantidad de bultos", min_value=1, value=1) if bultos else 0
-total_importe += 2500 * cantidad_bultos
 
-if 'numero_remito' not in st.session_state:
-    st.session_state['numero_remito'] = leer_numero_remito()
+# Función para renovar la clave del envío: el próximo "Generar Remito" emite otro remito con los mismos datos
+def renovar_clave_envio():
+    st.session_state.clave_envio = uuid.uuid4().hex
+
+# El total sale de la misma cotización que imprime el PDF
+st.write(f"Importe Total: ${remito_actual.total}")
 
 logo_image_path = "logo motoya curvas-1.jpg"
 
 if st.button("Generar Remito"):
-    if cliente and domicilio and sector and solicitante and moto and not detalle_df.empty:
-        fecha_str = fecha.strftime('%Y-%m-%d')
-        pdf_path = generar_pdf(st.session_state['numero_remito'], fecha_str, cliente, domicilio, sector, solicitante, moto, detalle_df, total_importe, logo_image_path, lluvia, exclusividad, cantidad_bultos)
-        st.success(f"Remito generado con éxito: {pdf_path}")
-        st.download_button(label="Descargar Remito", data=open(pdf_path, "rb"), file_name=pdf_path, mime="application/pdf")
-        guardar_en_csv(st.session_state['numero_remito'], fecha_str, cliente, domicilio, sector, solicitante, moto, detalle_df, total_importe, lluvia, exclusividad, cantidad_bultos)
-        st.session_state['numero_remito'] += 1
-        guardar_numero_remito(st.session_state['numero_remito'])
+    if cliente and domicilio and sector and solicitante and moto and remito_actual.items:
+        # Cada etapa (numeración, registro, libro y publicación) se mide por separado, dentro de la traza del click
+        with metricas.etapa('generar_remito'):
+            remito_generado, registro_bytes, _, repetido = emisor.emitir([remito_actual], [st.session_state.clave_envio])[0]
+        remito_numero = remito_generado.numero
+        pdf_nombre = nombre_pdf(remito_numero)
+        if repetido:
+            # Doble click o reintento: es el mismo remito, no se emite otro número
+            st.info(f"Este remito ya se había generado: N° {remito_numero}")
+            # Un segundo servicio con los mismos datos (la misma ruta dos veces) se emite a propósito
+            st.button("Emitir otro remito igual", on_click=renovar_clave_envio)
+        else:
+            if CARPETA_REMITOS_LOCAL:
+                guardar_pdf_local(pdf_de_registro(registro_bytes), remito_numero, CARPETA_REMITOS_LOCAL)
+            st.success(f"Remito generado con éxito: N° {remito_numero} (registro de {len(registro_bytes)} bytes)")
+        # El PDF se arma recién si se descarga
+        st.download_button(label="Descargar Remito", data=lambda registro_bytes=registro_bytes: pdf_de_registro(registro_bytes),
+                           file_name=pdf_nombre, mime="application/pdf")
     else:
         st.error("Por favor, completa todos los campos antes de generar el remito.")
 
 if st.button("Descargar CSV de Remitos"):
     mes_anio = fecha.strftime('%Y-%m')
     csv_path = f'remitos_{mes_anio}.csv'
-    with open(csv_path, 'rb') as f:
-        st.download_button(label="Descargar CSV", data=f, file_name=csv_path, mime='text/csv')
+    st.download_button(label="Descargar CSV", data=exportar_csv_mes(mes_anio), file_name=csv_path, mime='text/csv')
+
+st.header("Buscar Remitos")
+texto_busqueda = st.text_input("Buscar por cliente, solicitante, moto o dirección")
+col1, col2, col3, col4 = st.columns(4)
+with col1:
+    busqueda_desde = st.date_input("Desde", value=None, key="busqueda_desde")
+with col2:
+    busqueda_hasta = st.date_input("Hasta", value=None, key="busqueda_hasta")
+with col3:
+    busqueda_minimo = st.number_input("Importe mínimo", min_value=0.0, value=None, key="busqueda_minimo")
+with col4:
+    busqueda_maximo = st.number_input("Importe máximo", min_value=0.0, value=None, key="busqueda_maximo")
+if texto_busqueda.strip() or busqueda_desde or busqueda_hasta or busqueda_minimo is not None or busqueda_maximo is not None:
+    encontrados, cantidad_encontrados = busqueda.buscar(texto_busqueda, busqueda_desde, busqueda_hasta, busqueda_minimo, busqueda_maximo, por_pagina=REMITOS_POR_PAGINA)
+    st.write(f"{cantidad_encontrados} remitos encontrados" + (f" (se muestran los {REMITOS_POR_PAGINA} más recientes)" if cantidad_encontrados > REMITOS_POR_PAGINA else ""))
+    remito_encontrado = st.selectbox(
+        "Resultados", encontrados,
+        format_func=lambda registro: f"N° {registro['numero']} - {registro['fecha']} - {registro['cliente']} - {registro['moto']} - ${a_pesos(registro['total_centavos'])}")
+    if st.button("Descargar Remito Encontrado") and remito_encontrado:
+        ofrecer_descarga(publicado_en_indice(remito_encontrado))
 
 st.header("Descargar Remitos Generados")
-remitos_guardados = cargar_remitos_guardados_github()
-remito_seleccionado = st.selectbox("Selecciona un remito para descargar", remitos_guardados)
-
-if st.button("Descargar Remito Seleccionado"):
-    contenido_remito = repo.get_contents(remito_seleccionado)
-    st.download_button(label="Descargar Remito", data=base64.b64decode(contenido_remito.content), file_name=remito_seleccionado, mime='application/pdf')
+if st.button("Actualizar lista"):
+    indice.invalidar()
+mes_seleccionado = st.selectbox("Mes", cargar_meses_remitos())
+filtro_cliente = st.text_input("Filtrar por cliente")
+remitos_mes = cargar_remitos_guardados_github(mes_seleccionado)
+_, cantidad_remitos = buscar(remitos_mes, filtro_cliente, por_pagina=REMITOS_POR_PAGINA)
+total_paginas = max(1, -(-cantidad_remitos // REMITOS_POR_PAGINA))
+pagina = st.number_input(f"Página (de {total_paginas})", min_value=1, max_value=total_paginas, value=1)
+remitos_guardados, _ = buscar(remitos_mes, filtro_cliente, pagina, REMITOS_POR_PAGINA)
+remito_seleccionado = st.selectbox(
+    "Selecciona un remito para descargar", remitos_guardados,
+    format_func=lambda registro: f"N° {registro['numero']} - {registro['fecha']} - {registro['cliente']} - ${a_pesos(registro['total_centavos'])}")
+
+if st.button("Descargar Remito Seleccionado") and remito_seleccionado:
+    ofrecer_descarga(remito_seleccionado)
+
+# Con la pantalla ya armada, un hilo precarga reportlab, el logo y las bibliotecas del primer remito (una vez por proceso)
+iniciar_precarga(logo_image_path)
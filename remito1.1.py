@@ -2,11 +2,12 @@ import streamlit as st
 from reportlab.lib.pagesizes import A4
 from reportlab.pdfgen import canvas
 from reportlab.lib.units import mm
-from reportlab.lib import utils
 import pandas as pd
 import os
 from datetime import datetime
 
+from plantilla_pdf import dibujar_plantilla, dibujar_pie
+
 # Función para cargar la lista de remitos guardados
 def cargar_remitos_guardados(carpeta_remitos='remitos'):
     if not os.path.exists(carpeta_remitos):
@@ -14,13 +15,6 @@ def cargar_remitos_guardados(carpeta_remitos='remitos'):
     remitos = [f for f in os.listdir(carpeta_remitos) if f.endswith('.pdf')]
     return remitos
 
-# Función para cargar la imagen del logo desde un archivo JPG
-def cargar_logo(path, width):
-    img = utils.ImageReader(path)
-    iw, ih = img.getSize()
-    aspect = ih / float(iw)
-    return path, width, int(width * aspect)
-
 # Función para leer el número de remito desde un archivo
 def leer_numero_remito(file_path='numero_remito.txt'):
     if os.path.exists(file_path):
@@ -46,23 +40,8 @@ def generar_pdf(remito_numero, fecha, cliente, domicilio, sector, solicitante, m
     # Crear el PDF
     c = canvas.Canvas(pdf_path, pagesize=A4)
 
-    # Colocar el logo como marca de agua en toda la página, con mayor opacidad
-    logo, logo_ancho, logo_alto = cargar_logo(logo_path, 210*mm)  # Ajustamos el tamaño para que cubra toda la página
-    c.saveState()
-    c.setFillAlpha(0.3)  # Aumentar la opacidad del logo para que se vea más oscuro
-    c.drawImage(logo, (210*mm - logo_ancho) / 2, (297*mm - logo_alto) / 2, width=logo_ancho, height=logo_alto, mask='auto')
-    c.restoreState()
-
-    # Información de la empresa en la parte superior izquierda con mayor espacio entre los elementos
-    c.setFont("Helvetica", 10)
-    c.drawString(20*mm, 280*mm, "Motoya Mensajería")
-    c.drawString(20*mm, 275*mm, "Cel.: 15-4194-6280")
-    c.drawString(20*mm, 270*mm, "Email: motoyamensajeria@gmail.com")
-    c.drawString(20*mm, 265*mm, "Web: www.motoya.com.ar")
-
-    # Título centrado "ORDEN DE SERVICIO"
-    c.setFont("Helvetica-Bold", 16)
-    c.drawCentredString(105*mm, 255*mm, "ORDEN DE SERVICIO")
+    # Marca de agua, datos de la empresa y título salen de la plantilla en caché
+    dibujar_plantilla(c, logo_path)
 
     # Número de Servicio alineado a la derecha
     c.setFont("Helvetica", 10)
@@ -123,21 +102,12 @@ def generar_pdf(remito_numero, fecha, cliente, domicilio, sector, solicitante, m
     # Importe total alineado a la derecha
     c.drawRightString(195*mm, detalle_y_position - 10*mm, f"Importe Total: ${total_importe:.2f}")
 
-    # Cuadro de firma y aclaración con líneas punteadas
+    # Cuadro de firma, aclaración y texto adicional en la parte inferior
     firma_y_position = detalle_y_position - 30*mm
-    c.setDash(1, 2)
-    c.line(20*mm, firma_y_position + 15*mm, 100*mm, firma_y_position + 15*mm)
-    c.line(20*mm, firma_y_position + 5*mm, 100*mm, firma_y_position + 5*mm)
-    c.setDash(1, 0)
-
-    c.drawString(20*mm, firma_y_position + 20*mm, "Firma:")
-    c.drawString(20*mm, firma_y_position + 10*mm, "Aclaración:")
-
-    # Texto adicional en la parte inferior
-    texto_y_position = firma_y_position - 15*mm
-    c.setFont("Helvetica", 8)
-    c.drawString(20*mm, texto_y_position, "La mercadería viaja por cuenta y riesgo del cliente. Los días de lluvia y los horarios nocturnos sufren un incremento del 50%.")
-    c.drawString(20*mm, texto_y_position - 5*mm, "Cada trámite incluye una tolerancia de espera de hasta 10 minutos, transcurrido ese lapso se cobrará la demora. (Regla general del Servicio)")
+    dibujar_pie(c, firma_y_position, lineas=[
+        "La mercadería viaja por cuenta y riesgo del cliente. Los días de lluvia y los horarios nocturnos sufren un incremento del 50%.",
+        "Cada trámite incluye una tolerancia de espera de hasta 10 minutos, transcurrido ese lapso se cobrará la demora. (Regla general del Servicio)",
+    ])
 
     c.save()
     return pdf_path
@@ -0,0 +1,179 @@
+import argparse
+import io
+import os
+import re
+import time
+import unicodedata
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from datetime import timedelta
+
+from reportlab.lib.units import mm
+
+from libro_columnar import csv_mensual, limites_mes
+from modelo_remito import a_pesos
+from paginado_pdf import dibujar_detalle
+from plantilla_pdf import PERFILES_PDF, dibujar_plantilla, obtener_logo, perfil_pdf
+
+# Resumen mensual por cliente: los remitos del mes se leen del libro, se agrupan
+# por cliente (ordenados por sector, fecha y número) en una sola pasada con Arrow
+# y se arma un PDF por cliente en varios procesos, con la misma plantilla que los
+# remitos. Todo va a un zip junto con un CSV de totales por cliente.
+
+# Logo del talonario (ruta de la imagen JPG)
+LOGO_PATH = "logo motoya curvas-1.jpg"
+
+SIN_CLIENTE = "(sin cliente)"
+
+
+# Función para armar un nombre de archivo a partir del nombre del cliente
+def nombre_archivo_cliente(cliente):
+    texto = unicodedata.normalize('NFKD', cliente).encode('ascii', 'ignore').decode('ascii')
+    return re.sub(r'[^A-Za-z0-9]+', '_', texto).strip('_').lower() or 'cliente'
+
+
+# Función para agrupar los remitos de un mes por cliente; devuelve [(cliente, [remito, ...]), ...]
+def agrupar_mes(libro, mes):
+    import pyarrow.compute as pc
+
+    # libro.leer toma las dos fechas inclusive: hasta el último día del mes
+    desde, siguiente = limites_mes(mes)
+    tabla = libro.leer(desde, siguiente - timedelta(days=1), columnas=['numero', 'fecha', 'cliente', 'sector', 'solicitante', 'total'])
+    if not tabla.num_rows:
+        return []
+
+    clientes = pc.utf8_trim_whitespace(pc.fill_null(tabla['cliente'], ''))
+    tabla = tabla.set_column(tabla.schema.get_field_index('cliente'), 'cliente', clientes)
+    tabla = tabla.sort_by([('cliente', 'ascending'), ('sector', 'ascending'), ('fecha', 'ascending'), ('numero', 'ascending')])
+
+    # Con la tabla ordenada, los remitos de cada cliente quedan contiguos: alcanza con contar cuántos tiene cada uno
+    cantidades = tabla.group_by('cliente').aggregate([('numero', 'count')]).sort_by('cliente')
+    grupos = []
+    inicio = 0
+    for cliente, cantidad in zip(cantidades['cliente'].to_pylist(), cantidades['numero_count'].to_pylist()):
+        grupos.append((cliente or SIN_CLIENTE, tabla.slice(inicio, cantidad).to_pylist()))
+        inicio += cantidad
+    return grupos
+
+
+# Función para recorrer las líneas del resumen: una por remito, con el total del remito
+def lineas_resumen(remitos):
+    for remito in remitos:
+        detalle = f"{remito['fecha'].strftime('%Y-%m-%d')}  N° {remito['numero']}"
+        if remito['sector']:
+            detalle += f"  {remito['sector']}"
+        if remito['solicitante']:
+            detalle += f" ({remito['solicitante']})"
+        yield detalle, int(remito['total'] * 100)
+
+
+# Función para generar el PDF del resumen de un cliente (devuelve los bytes del archivo)
+def generar_resumen_pdf(cliente, mes, remitos, logo_path, perfil=None):
+    from reportlab.lib.pagesizes import A4
+    from reportlab.pdfgen import canvas
+
+    buffer = io.BytesIO()
+    c = canvas.Canvas(buffer, pagesize=A4, pageCompression=perfil_pdf(perfil)['compresion'])
+
+    def dibujar_pagina(c, hoja):
+        dibujar_plantilla(c, logo_path, titulo="RESUMEN DE CUENTA", perfil=perfil)
+        c.setFont("Helvetica", 10)
+        c.drawRightString(195 * mm, 250 * mm, f"Período: {mes}")
+        if hoja > 1:
+            c.drawRightString(195 * mm, 245 * mm, f"Hoja {hoja}")
+            return 235 * mm
+
+        c.rect(15 * mm, 215 * mm, 180 * mm, 25 * mm, stroke=1, fill=0)
+        c.drawString(30 * mm, 230 * mm, f"Cliente: {cliente}")
+        c.drawString(30 * mm, 220 * mm, f"Remitos del mes: {len(remitos)}")
+        return 200 * mm
+
+    y, total_centavos, _ = dibujar_detalle(c, lineas_resumen(remitos), dibujar_pagina, alto_cierre=20 * mm)
+    c.setFont("Helvetica-Bold", 10)
+    c.drawRightString(195 * mm, y - 10 * mm, f"Total del mes: ${a_pesos(total_centavos)}")
+    c.save()
+    return buffer.getvalue()
+
+
+def _inicializar_worker(logo_path, perfil):
+    obtener_logo(logo_path, perfil)
+
+
+def _procesar_cliente(tarea):
+    cliente, mes, remitos, logo_path, perfil = tarea
+    return generar_resumen_pdf(cliente, mes, remitos, logo_path, perfil)
+
+
+# Función para generar los resúmenes de un mes en un zip (un PDF por cliente y el CSV de totales)
+def generar_resumenes(libro, mes, salida, workers=None, logo_path=LOGO_PATH, perfil=None):
+    inicio = time.perf_counter()
+    grupos = agrupar_mes(libro, mes)
+    if not grupos:
+        raise ValueError(f"No hay remitos en el libro para {mes}")
+
+    workers = workers or os.cpu_count() or 1
+    tareas = [(cliente, mes, remitos, logo_path, perfil) for cliente, remitos in grupos]
+    with ProcessPoolExecutor(max_workers=workers, initializer=_inicializar_worker, initargs=(logo_path, perfil)) as pool:
+        chunksize = max(1, len(tareas) // (workers * 4))
+        pdfs = list(pool.map(_procesar_cliente, tareas, chunksize=chunksize))
+
+    filas = []
+    usados = set()
+    with zipfile.ZipFile(salida, 'w', compression=zipfile.ZIP_DEFLATED) as archivo_zip:
+        for (cliente, remitos), pdf_bytes in zip(grupos, pdfs):
+            # Dos clientes pueden dar el mismo nombre de archivo (difieren sólo en acentos o signos)
+            base = f"resumen_{nombre_archivo_cliente(cliente)}_{mes}"
+            archivo = f"{base}.pdf"
+            sufijo = 2
+            while archivo in usados:
+                archivo = f"{base}_{sufijo}.pdf"
+                sufijo += 1
+            usados.add(archivo)
+            archivo_zip.writestr(archivo, pdf_bytes)
+            filas.append({
+                'Cliente': cliente,
+                'Sectores': ', '.join(sorted({remito['sector'] for remito in remitos if remito['sector']})),
+                'Cantidad de Remitos': len(remitos),
+                'Total Importe': sum(remito['total'] for remito in remitos),
+                'Archivo': archivo,
+                'Bytes PDF': len(pdf_bytes),
+            })
+        csv_bytes = csv_mensual(filas)
+        archivo_zip.writestr(f"resumenes_{mes}.csv", csv_bytes)
+
+    csv_path = os.path.join(os.path.dirname(os.path.abspath(salida)), f"resumenes_{mes}.csv")
+    with open(csv_path, 'wb') as file:
+        file.write(csv_bytes)
+    segundos = time.perf_counter() - inicio
+
+    return {
+        'clientes': len(grupos),
+        'remitos': sum(len(remitos) for _, remitos in grupos),
+        'workers': workers,
+        'segundos': segundos,
+        'bytes_pdf': sum(len(pdf_bytes) for pdf_bytes in pdfs),
+        'salida': salida,
+        'csv': csv_path,
+        'filas': filas,
+    }
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Genera el resumen mensual de cada cliente a partir del libro de remitos.")
+    parser.add_argument('mes', help="Mes a resumir (AAAA-MM)")
+    parser.add_argument('--libro', default=None, help="Carpeta del libro en Parquet o URL de la base SQL")
+    parser.add_argument('--salida', default=None, help="Archivo zip de salida (por defecto resumenes_<mes>.zip)")
+    parser.add_argument('--workers', type=int, default=None, help="Cantidad de procesos (por defecto, uno por núcleo)")
+    parser.add_argument('--logo', default=LOGO_PATH, help="Ruta del logo para la marca de agua")
+    parser.add_argument('--perfil', choices=sorted(PERFILES_PDF), default=None,
+                        help="Perfil de salida del PDF (por defecto REMITOS_PERFIL_PDF o 'estandar')")
+    args = parser.parse_args()
+
+    from libro_sql import URL_SQL, obtener_libro
+
+    salida = args.salida or f"resumenes_{args.mes}.zip"
+    resultado = generar_resumenes(obtener_libro(args.libro or URL_SQL), args.mes, salida, workers=args.workers, logo_path=args.logo, perfil=args.perfil)
+    print(f"{resultado['clientes']} resúmenes ({resultado['remitos']} remitos) en {salida}")
+    print(f"Totales por cliente en {resultado['csv']}")
+    print(f"{resultado['segundos']:.2f} s con {resultado['workers']} procesos, "
+          f"{resultado['bytes_pdf'] / 1024:.1f} KB de PDFs ({resultado['bytes_pdf'] / resultado['clientes'] / 1024:.1f} KB por cliente)")
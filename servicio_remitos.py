@@ -0,0 +1,568 @@
+import argparse
+import json
+import os
+import queue
+import signal
+import sys
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from multiprocessing import get_context
+from urllib.parse import parse_qs, urlsplit
+
+from metricas_remitos import MetricasDesactivadas, obtener_metricas
+from modelo_remito import a_centavos
+from precarga import precargar
+from publicacion_github import sha_blob
+from registro_remito import clave_render, pdf_registro
+
+# Servicio HTTP para crear remitos desde otros sistemas, sin la interfaz de
+# Streamlit. Cotiza, numera, guarda en el libro y publica con el mismo emisor
+# que el botón "Generar Remito" (emision_remitos), y arma los PDFs en un pool de
+# procesos que arrancan con reportlab, las fuentes y el logo ya cargados.
+#
+#   POST /remitos           un remito (objeto JSON), una lista o {"remitos": [...]}
+#                           ?pdf=1 arma también los PDFs; ?esperar=1 responde cuando
+#                           terminan. Un solo remito con "Accept: application/pdf"
+#                           devuelve directamente el PDF. Si no, responde 202 con el
+#                           número de trabajo.
+#   GET  /trabajos/<id>     estado del trabajo y los números de sus remitos
+#   GET  /remitos/<n>.pdf   PDF de un remito emitido por este servicio
+#   GET  /remitos/<n>.json  registro de un remito emitido por este servicio
+#   GET  /salud             cola, trabajos y procesos del pool
+#
+# Los pedidos que llegan mientras se emite una tanda se juntan en la siguiente
+# (una reserva de números, una escritura en el libro y un commit por tanda).
+# Con la cola llena responde 429 y con demasiados pedidos en curso 503, los dos
+# con Retry-After.
+#
+# Cada remito del pedido puede traer "clave": una clave de idempotencia que el
+# cliente repite al reintentar. Un remito cuya clave ya se emitió devuelve el
+# mismo número (con "repetido": true) en lugar de emitir otro. Un cuerpo más grande que REMITOS_SERVICIO_CUERPO_KB responde 413.
+
+PUERTO_SERVICIO = int(os.getenv('REMITOS_SERVICIO_PUERTO', '8502'))
+# Si se configura, los pedidos tienen que traer "Authorization: Bearer <token>"
+TOKEN_SERVICIO = os.getenv('REMITOS_SERVICIO_TOKEN', '')
+# Procesos que arman los PDFs
+WORKERS_PDF = int(os.getenv('REMITOS_SERVICIO_WORKERS', str(os.cpu_count() or 1)))
+# Pedidos HTTP atendidos a la vez
+MAXIMO_CONCURRENTES = int(os.getenv('REMITOS_SERVICIO_CONCURRENTES', '32'))
+# Trabajos esperando a ser emitidos
+MAXIMO_PENDIENTES = int(os.getenv('REMITOS_SERVICIO_PENDIENTES', '256'))
+# Remitos por pedido y por tanda
+MAXIMO_LOTE = int(os.getenv('REMITOS_SERVICIO_LOTE', '200'))
+# Tamaño máximo del cuerpo de un pedido, en KB (más grande responde 413 sin leerlo)
+MAXIMO_CUERPO = int(os.getenv('REMITOS_SERVICIO_CUERPO_KB', '1024')) * 1024
+# Números que se reservan de una vez (el servicio emite muchos más remitos que un despachador)
+BLOQUE_SERVICIO = int(os.getenv('REMITOS_SERVICIO_BLOQUE', '100'))
+# Trabajos terminados que se recuerdan (con los registros de sus remitos, para servir los PDFs)
+MAXIMO_TRABAJOS = 2000
+# Segundos que espera un pedido con ?esperar=1 antes de responder 202
+ESPERA_MAXIMA = 30.0
+
+LOGO_PATH = "logo motoya curvas-1.jpg"
+
+
+class ServidorHTTP(ThreadingHTTPServer):
+    daemon_threads = True
+    # Conexiones que esperan a ser aceptadas (el valor por defecto, 5, corta conexiones en las ráfagas)
+    request_queue_size = 128
+
+
+class Saturado(Exception):
+    def __init__(self, estado, mensaje):
+        super().__init__(mensaje)
+        self.estado = estado
+
+
+# Función para leer un sí/no del pedido: un booleano de JSON o el texto "true"/"false"
+def _booleano_json(dato, campo):
+    valor = dato.get(campo, False)
+    if isinstance(valor, bool):
+        return valor
+    if isinstance(valor, str) and valor.strip().lower() in ('true', 'false'):
+        return valor.strip().lower() == 'true'
+    raise ValueError(f"{campo} tiene que ser true o false (llegó {valor!r})")
+
+
+# Función para convertir un remito del pedido al servicio de la planilla (los mismos campos que lote_remitos)
+def servicio_json(dato):
+    servicio = {campo: str(dato.get(campo, '')).strip() for campo in ('cliente', 'domicilio', 'sector', 'solicitante', 'moto')}
+    servicio['fecha'] = str(dato.get('fecha') or datetime.now().strftime('%Y-%m-%d'))
+    servicio['detalle'] = []
+    for item in dato.get('detalle') or dato.get('items') or []:
+        if isinstance(item, dict):
+            direccion, monto = item.get('direccion', item.get('Dirección', '')), item.get('monto', item.get('Monto', 0))
+        else:
+            direccion, monto = item
+        if isinstance(monto, bool) or a_centavos(monto) < 0:
+            raise ValueError(f"monto inválido: {monto!r}")
+        servicio['detalle'].append({"Dirección": str(direccion).strip(), "Monto": monto})
+    servicio['lluvia'] = _booleano_json(dato, 'lluvia')
+    servicio['exclusividad'] = _booleano_json(dato, 'exclusividad')
+    bultos = dato.get('cantidad_bultos')
+    if bultos is None:
+        bultos = 0
+    if isinstance(bultos, bool) or not isinstance(bultos, int) or bultos < 0:
+        raise ValueError(f"cantidad_bultos tiene que ser un entero mayor o igual a 0 (llegó {bultos!r})")
+    servicio['cantidad_bultos'] = bultos
+    return servicio
+
+
+# Función para leer los remitos de un pedido y sus claves de idempotencia (None si no trae); junta los errores de todos antes de rechazarlo
+def remitos_json(cuerpo):
+    from lote_remitos import CAMPOS_OBLIGATORIOS, remito_servicio
+
+    datos = json.loads(cuerpo)
+    if isinstance(datos, dict) and 'remitos' in datos:
+        datos = datos['remitos']
+    if isinstance(datos, dict):
+        datos = [datos]
+    if not isinstance(datos, list) or not datos:
+        raise ValueError("El pedido tiene que ser un remito, una lista de remitos o {\"remitos\": [...]}")
+    if len(datos) > MAXIMO_LOTE:
+        raise ValueError(f"Como máximo {MAXIMO_LOTE} remitos por pedido (llegaron {len(datos)})")
+
+    remitos = []
+    claves = []
+    errores = []
+    for posicion, dato in enumerate(datos, start=1):
+        try:
+            if not isinstance(dato, dict):
+                raise ValueError("no es un objeto JSON")
+            clave = dato.get('clave')
+            if clave is not None and (not isinstance(clave, str) or not clave.strip()):
+                raise ValueError("la clave tiene que ser un texto no vacío")
+            if clave is not None and clave in claves:
+                raise ValueError(f"la clave {clave} está repetida en el pedido")
+            servicio = servicio_json(dato)
+            faltantes = [campo for campo in CAMPOS_OBLIGATORIOS if not servicio.get(campo)]
+            if not servicio['detalle']:
+                faltantes.append('detalle')
+            if faltantes:
+                raise ValueError(f"faltan {', '.join(faltantes)}")
+            remito = remito_servicio(0, servicio)
+            # Sin tarifa vigente en la fecha no se acepta (el emisor no llega a gastar un número)
+            remito.cotizacion()
+            remitos.append(remito)
+            claves.append(clave)
+        except (ValueError, TypeError, KeyError) as e:
+            errores.append(f"Remito {posicion}: {e}")
+    if errores:
+        raise ValueError("\n".join(errores))
+    return remitos, claves
+
+
+# Función de los procesos del pool: reportlab, las fuentes y el logo quedan cargados antes del primer pedido.
+# Si la precarga falla el proceso sigue igual (lo que no se cargó se carga con el primer PDF).
+# Los procesos no exponen métricas: no abren el puerto ni escriben trazas.
+def _inicializar_worker(logo_path):
+    try:
+        precargar(logo_path, modulos=(), metricas=MetricasDesactivadas())
+    except Exception:
+        pass
+
+
+class Trabajo:
+    def __init__(self, remitos, con_pdf, claves=None):
+        self.id = uuid.uuid4().hex[:16]
+        self.remitos = remitos
+        self.claves = claves or [None] * len(remitos)
+        self.con_pdf = con_pdf
+        self.estado = 'pendiente'
+        self.emitidos = []
+        self.error = None
+        self.creado = time.time()
+        self.terminado = threading.Event()
+        self._pdfs_pendientes = 0
+        self._lock = threading.Lock()
+
+    # Función para armar la respuesta JSON del trabajo
+    def resumen(self):
+        resumen = {'trabajo': self.id, 'estado': self.estado, 'cantidad': len(self.remitos)}
+        if self.emitidos:
+            resumen['remitos'] = [{
+                'numero': remito.numero,
+                'fecha': remito.fecha.strftime('%Y-%m-%d'),
+                'cliente': remito.cliente,
+                'total': str(remito.total),
+                'registro': linea['path'],
+                'sha': linea['sha'],
+                'pdf': f"/remitos/{remito.numero}.pdf",
+                'repetido': repetido,
+            } for remito, _, linea, repetido in self.emitidos]
+        if self.error:
+            resumen['error'] = self.error
+        return resumen
+
+
+class ServicioRemitos:
+    def __init__(self, emisor, descargas=None, logo_path=LOGO_PATH, perfil=None, workers=WORKERS_PDF,
+                 maximo_concurrentes=MAXIMO_CONCURRENTES, maximo_pendientes=MAXIMO_PENDIENTES, maximo_lote=MAXIMO_LOTE,
+                 token=TOKEN_SERVICIO, metricas=None):
+        self.emisor = emisor
+        self.descargas = descargas
+        self.logo_path = logo_path
+        self.perfil = perfil
+        self.workers = workers
+        self.maximo_lote = maximo_lote
+        self.token = token
+        self.metricas = metricas or obtener_metricas()
+        self._cola = queue.Queue(maxsize=maximo_pendientes)
+        self._concurrentes = threading.BoundedSemaphore(maximo_concurrentes)
+        self._trabajos = OrderedDict()
+        self._registros = {}
+        self._lock = threading.Lock()
+        self._pool = None
+        self._hilo = None
+        self._servidor = None
+        # Trabajo que no entró en la tanda anterior: abre la siguiente
+        self._pospuesto = None
+        self.emitidos = 0
+
+    # Función para arrancar el pool de PDFs (con todos sus procesos ya precargados) y el hilo que emite las tandas
+    def iniciar(self):
+        if self._pool is None:
+            # Procesos nuevos (no copias del servidor, que ya tiene hilos y conexiones abiertas)
+            self._pool = ProcessPoolExecutor(max_workers=self.workers, mp_context=get_context('spawn'),
+                                             initializer=_inicializar_worker, initargs=(self.logo_path,))
+            # Un PDF por proceso: cada uno arranca y termina la precarga antes de atender pedidos
+            for futuro in [self._pool.submit(os.getpid) for _ in range(self.workers)]:
+                futuro.result()
+        if self._hilo is None or not self._hilo.is_alive():
+            self._hilo = threading.Thread(target=self._ciclo, name="servicio-remitos", daemon=True)
+            self._hilo.start()
+        return self
+
+    # Función para encolar un trabajo; si la cola está llena se rechaza en lugar de esperar
+    def encolar(self, remitos, con_pdf=False, claves=None):
+        trabajo = Trabajo(remitos, con_pdf, claves)
+        with self._lock:
+            self._trabajos[trabajo.id] = trabajo
+            while len(self._trabajos) > MAXIMO_TRABAJOS:
+                _, viejo = self._trabajos.popitem(last=False)
+                for remito, _, _, _ in viejo.emitidos:
+                    self._registros.pop(remito.numero, None)
+        try:
+            self._cola.put_nowait(trabajo)
+        except queue.Full:
+            with self._lock:
+                self._trabajos.pop(trabajo.id, None)
+            raise Saturado(429, f"Hay {self._cola.qsize()} trabajos en cola; reintentar más tarde")
+        return trabajo
+
+    # Función para consultar un trabajo (None si no existe o ya se olvidó)
+    def trabajo(self, trabajo_id):
+        with self._lock:
+            return self._trabajos.get(trabajo_id)
+
+    # Función para obtener el registro de un remito emitido por el servicio: (path, sha, bytes) o None
+    def registro(self, remito_numero):
+        with self._lock:
+            return self._registros.get(remito_numero)
+
+    # Función para sacar de la cola la próxima tanda: el primer trabajo (esperándolo) y los que ya estén esperando,
+    # sin pasar de maximo_lote remitos
+    def _tanda(self):
+        trabajos = [self._pospuesto or self._cola.get()]
+        self._pospuesto = None
+        cantidad = len(trabajos[0].remitos)
+        while cantidad < self.maximo_lote:
+            try:
+                trabajo = self._cola.get_nowait()
+            except queue.Empty:
+                break
+            if cantidad + len(trabajo.remitos) > self.maximo_lote:
+                self._pospuesto = trabajo
+                break
+            trabajos.append(trabajo)
+            cantidad += len(trabajo.remitos)
+        return trabajos
+
+    def _ciclo(self):
+        while True:
+            trabajos = self._tanda()
+            self.emitir(trabajos)
+
+    # Función para emitir una tanda de trabajos con el emisor; los PDFs se encargan al pool sin esperarlos
+    def emitir(self, trabajos):
+        remitos = [remito for trabajo in trabajos for remito in trabajo.remitos]
+        claves = [clave for trabajo in trabajos for clave in trabajo.claves]
+        try:
+            with self.metricas.etapa('servicio', remitos=len(remitos), trabajos=len(trabajos)):
+                emitidos = self.emisor.emitir(remitos, claves)
+        except Exception as e:
+            if len(trabajos) > 1:
+                # Un pedido con un remito que no se puede emitir no hace fallar a los demás de la tanda
+                # (tampoco dos reintentos del mismo pedido, con las mismas claves, en la misma tanda)
+                for trabajo in trabajos:
+                    self.emitir([trabajo])
+                return
+            for trabajo in trabajos:
+                trabajo.estado = 'error'
+                trabajo.error = f"{type(e).__name__}: {e}"
+                trabajo.terminado.set()
+            return
+
+        with self._lock:
+            for remito, registro_bytes, linea, _ in emitidos:
+                self._registros[remito.numero] = (linea['path'], linea['sha'], registro_bytes)
+        self.emitidos += sum(1 for emitido in emitidos if not emitido[3])
+        desde = 0
+        for trabajo in trabajos:
+            trabajo.emitidos = emitidos[desde:desde + len(trabajo.remitos)]
+            desde += len(trabajo.remitos)
+            if trabajo.con_pdf:
+                self._encargar_pdfs(trabajo)
+            else:
+                trabajo.estado = 'emitido'
+                trabajo.terminado.set()
+
+    # Función para encargar al pool los PDFs de un trabajo; el trabajo termina cuando están todos en la caché
+    def _encargar_pdfs(self, trabajo):
+        trabajo._pdfs_pendientes = len(trabajo.emitidos)
+        for _, registro_bytes, _, _ in trabajo.emitidos:
+            futuro = self.pdf_async(registro_bytes)
+            futuro.add_done_callback(lambda futuro, trabajo=trabajo: self._pdf_listo(trabajo, futuro))
+
+    def _pdf_listo(self, trabajo, futuro):
+        error = futuro.exception()
+        with trabajo._lock:
+            trabajo._pdfs_pendientes -= 1
+            if error is not None and trabajo.error is None:
+                trabajo.error = f"PDF: {type(error).__name__}: {error}"
+            if trabajo._pdfs_pendientes:
+                return
+        trabajo.estado = 'error' if trabajo.error else 'emitido'
+        trabajo.terminado.set()
+
+    # Función para armar el PDF de un registro en el pool (o leerlo de la caché); devuelve un futuro con los bytes
+    def pdf_async(self, registro_bytes):
+        from concurrent.futures import Future
+
+        clave = clave_render(self.logo_path, self.perfil)
+        sha = sha_blob(registro_bytes)
+        if self.descargas is not None:
+            pdf_bytes = self.descargas.leer(clave, sha)
+            if pdf_bytes is not None:
+                futuro = Future()
+                futuro.set_result(pdf_bytes)
+                return futuro
+        inicio = time.perf_counter()
+        futuro = self._pool.submit(pdf_registro, registro_bytes, self.logo_path, None, self.perfil)
+
+        def guardar(futuro):
+            if futuro.exception() is not None:
+                return
+            self.metricas.observar('remitos_etapa_segundos', time.perf_counter() - inicio, etapa='pdf')
+            self.metricas.observar('remitos_bytes', len(futuro.result()), tipo='pdf')
+            if self.descargas is not None:
+                self.descargas.guardar(clave, futuro.result(), sha)
+
+        futuro.add_done_callback(guardar)
+        return futuro
+
+    # Función para consultar el estado del servicio
+    def estado(self):
+        with self._lock:
+            trabajos = list(self._trabajos.values())
+        return {
+            'cola': self._cola.qsize(),
+            'maximo_pendientes': self._cola.maxsize,
+            'trabajos': len(trabajos),
+            'pendientes': sum(1 for trabajo in trabajos if trabajo.estado == 'pendiente'),
+            'emitidos': self.emitidos,
+            'workers_pdf': self.workers,
+            'maximo_lote': self.maximo_lote,
+        }
+
+    # Función para servir la API en un puerto, en un hilo aparte; devuelve el puerto
+    def servir(self, puerto=PUERTO_SERVICIO, host='127.0.0.1'):
+        self._servidor = ServidorHTTP((host, int(puerto)), _manejador(self))
+        threading.Thread(target=self._servidor.serve_forever, name="servicio-http", daemon=True).start()
+        return self._servidor.server_address[1]
+
+    def detener(self):
+        if self._servidor is not None:
+            self._servidor.shutdown()
+            self._servidor.server_close()
+        if self._pool is not None:
+            self._pool.shutdown(cancel_futures=True)
+
+
+# Función para armar la clase que atiende los pedidos HTTP del servicio
+def _manejador(servicio):
+    from pdf_remito import nombre_pdf
+
+    class Manejador(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def _responder(self, estado, cuerpo, tipo='application/json; charset=utf-8', encabezados=()):
+            if not isinstance(cuerpo, bytes):
+                cuerpo = json.dumps(cuerpo, ensure_ascii=False).encode('utf-8')
+            self.send_response(estado)
+            self.send_header('Content-Type', tipo)
+            self.send_header('Content-Length', str(len(cuerpo)))
+            for clave, valor in encabezados:
+                self.send_header(clave, valor)
+            self.end_headers()
+            self.wfile.write(cuerpo)
+
+        def _error(self, estado, mensaje, encabezados=()):
+            self._responder(estado, {'error': mensaje}, encabezados=encabezados)
+
+        # Función para atender un pedido dentro del límite de pedidos concurrentes
+        def _atender(self, atender):
+            if servicio.token and self.headers.get('Authorization', '') != f'Bearer {servicio.token}':
+                self._error(401, "Falta el token del servicio")
+                return
+            if not servicio._concurrentes.acquire(blocking=False):
+                self._error(503, "Demasiados pedidos en curso; reintentar más tarde", [('Retry-After', '1')])
+                return
+            try:
+                url = urlsplit(self.path)
+                atender(url.path, {clave: valores[-1] for clave, valores in parse_qs(url.query).items()})
+            except Saturado as e:
+                self._error(e.estado, str(e), [('Retry-After', '1')])
+            except Exception as e:
+                self._error(500, f"{type(e).__name__}: {e}")
+            finally:
+                servicio._concurrentes.release()
+
+        def do_GET(self):
+            self._atender(self._get)
+
+        def do_POST(self):
+            self._atender(self._post)
+
+        def _get(self, path, parametros):
+            partes = path.strip('/').split('/')
+            if path == '/salud':
+                self._responder(200, servicio.estado())
+            elif len(partes) == 2 and partes[0] == 'trabajos':
+                trabajo = servicio.trabajo(partes[1])
+                if trabajo is None:
+                    self._error(404, f"No existe el trabajo {partes[1]}")
+                else:
+                    self._responder(200, trabajo.resumen())
+            elif len(partes) == 2 and partes[0] == 'remitos' and partes[1].endswith(('.pdf', '.json')):
+                numero, _, extension = partes[1].rpartition('.')
+                registro = servicio.registro(int(numero)) if numero.isdigit() else None
+                if registro is None:
+                    self._error(404, f"El remito {numero} no fue emitido por este servicio")
+                elif extension == 'json':
+                    self._responder(200, registro[2])
+                else:
+                    self._responder_pdf(int(numero), registro[2])
+            else:
+                self._error(404, f"No existe {path}")
+
+        def _responder_pdf(self, remito_numero, registro_bytes):
+            pdf_bytes = servicio.pdf_async(registro_bytes).result(timeout=ESPERA_MAXIMA)
+            self._responder(200, pdf_bytes, 'application/pdf', [
+                ('Content-Disposition', f'attachment; filename="{nombre_pdf(remito_numero)}"'),
+                ('X-Remito-Numero', str(remito_numero)),
+            ])
+
+        def _post(self, path, parametros):
+            try:
+                longitud = int(self.headers.get('Content-Length') or 0)
+            except ValueError:
+                longitud = -1
+            if not 0 <= longitud <= MAXIMO_CUERPO:
+                # El cuerpo queda sin leer: la conexión no se puede reutilizar
+                self.close_connection = True
+                if longitud < 0:
+                    self._error(400, "Content-Length inválido")
+                else:
+                    self._error(413, f"El pedido tiene {longitud} bytes; el máximo es {MAXIMO_CUERPO}")
+                return
+            cuerpo = self.rfile.read(longitud)
+            if path != '/remitos':
+                self._error(404, f"No existe {path}")
+                return
+            try:
+                remitos, claves = remitos_json(cuerpo)
+            except ValueError as e:
+                self._error(400, str(e))
+                return
+
+            quiere_pdf = len(remitos) == 1 and 'application/pdf' in self.headers.get('Accept', '')
+            esperar = quiere_pdf or parametros.get('esperar') in ('1', 'true', 'si')
+            trabajo = servicio.encolar(remitos, con_pdf=quiere_pdf or parametros.get('pdf') in ('1', 'true', 'si'), claves=claves)
+            if esperar and trabajo.terminado.wait(ESPERA_MAXIMA):
+                if trabajo.estado == 'error':
+                    self._responder(502, trabajo.resumen())
+                elif quiere_pdf:
+                    remito, registro_bytes, _, _ = trabajo.emitidos[0]
+                    self._responder_pdf(remito.numero, registro_bytes)
+                else:
+                    self._responder(201, trabajo.resumen())
+                return
+            self._responder(202, trabajo.resumen(), encabezados=[('Location', f"/trabajos/{trabajo.id}")])
+
+        def log_message(self, *args):
+            pass
+
+    return Manejador
+
+
+if __name__ == '__main__':
+    from bandeja_salida import obtener_bandeja
+    from busqueda_remitos import obtener_busqueda
+    from cache_descargas import obtener_cache_descargas
+    from conexion_github import obtener_recursos
+    from emision_remitos import obtener_emisor
+    from indice_remitos import obtener_indice
+    from libro_publicado import obtener_consolidador
+    from libro_sql import URL_SQL, obtener_libro, obtener_pool
+    from numeracion_remitos import AlmacenGithub, AlmacenSQL, obtener_numerador, semilla_ultimo_remito
+
+    parser = argparse.ArgumentParser(description="Servicio HTTP para crear remitos desde otros sistemas.")
+    parser.add_argument('--puerto', type=int, default=PUERTO_SERVICIO, help="Puerto del servicio (por defecto REMITOS_SERVICIO_PUERTO o 8502)")
+    parser.add_argument('--host', default='127.0.0.1', help="Dirección donde escuchar (0.0.0.0 para aceptar pedidos de otras máquinas)")
+    parser.add_argument('--workers', type=int, default=WORKERS_PDF, help="Procesos que arman los PDFs (por defecto, uno por núcleo)")
+    parser.add_argument('--logo', default=LOGO_PATH, help="Ruta del logo para la marca de agua")
+    parser.add_argument('--bloque', type=int, default=BLOQUE_SERVICIO, help="Números de remito que se reservan de una vez")
+    parser.add_argument('--perfil', default=None, help="Perfil de salida del PDF (por defecto REMITOS_PERFIL_PDF o 'estandar')")
+    parser.add_argument('--repo', default="jgonzalohernandez/ArchivosGenerados")
+    parser.add_argument('--api', default=os.getenv('GITHUB_API_URL', 'https://api.github.com'))
+    args = parser.parse_args()
+
+    # Los mismos recursos que la app de Streamlit
+    metricas = obtener_metricas()
+    recursos = obtener_recursos(args.repo, args.api)
+    bandeja = obtener_bandeja(recursos.repo, reconectar=recursos.reconectar)
+    indice = obtener_indice(os.getenv('PAT_GITHUB'), args.repo, args.api, obtener_sesion=recursos.sesion)
+    bandeja.suscribir(indice.invalidar)
+    descargas = obtener_cache_descargas(recursos.sesion, args.repo, args.api, reconectar=recursos.reconectar)
+    libro = obtener_libro(URL_SQL)
+    busqueda = obtener_busqueda(libro)
+    consolidador = obtener_consolidador(recursos.repo, reconectar=recursos.reconectar)
+    bandeja.suscribir(consolidador.notificar)
+    if URL_SQL:
+        almacen_numeracion = AlmacenSQL(obtener_pool(URL_SQL))
+    else:
+        almacen_numeracion = AlmacenGithub(recursos.repo, semilla=semilla_ultimo_remito, reconectar=recursos.reconectar)
+    numerador = obtener_numerador(almacen_numeracion, args.bloque)
+    emisor = obtener_emisor(numerador, libro, busqueda, bandeja, descargas, metricas)
+
+    servicio = ServicioRemitos(emisor, descargas, logo_path=args.logo, perfil=args.perfil, workers=args.workers, metricas=metricas)
+    inicio = time.perf_counter()
+    servicio.iniciar()
+    puerto = servicio.servir(args.puerto, args.host)
+    print(f"Servicio de remitos en http://{args.host}:{puerto} ({args.workers} procesos de PDF listos en "
+          f"{time.perf_counter() - inicio:.1f} s)")
+    # Al terminar (Ctrl+C o SIGTERM) los números que quedaron en el bloque vuelven al almacén
+    signal.signal(signal.SIGTERM, lambda *args: sys.exit(0))
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        servicio.detener()
@@ -0,0 +1,269 @@
+import argparse
+import bisect
+import json
+import os
+import threading
+import time
+from dataclasses import dataclass
+
+from libro_columnar import a_fecha
+from modelo_remito import a_centavos, a_pesos, porcentaje
+
+# Tarifas de los remitos: el costo del bulto y los recargos, con fecha de
+# vigencia y excepciones por cliente, definidos en un archivo JSON:
+#   {"recargos":  [{"nombre": "lluvia", "etiqueta": "Lluvia", "sobre": "base"}, ...],
+#    "vigencias": [{"desde": "2025-01-01", "bulto": "2500", "porcentajes": {"lluvia": 50}}, ...],
+#    "clientes":  {"Nombre": [{"desde": "2025-03-01", "bulto": "2000", "porcentajes": {"lluvia": 0}}]}}
+# Cada recargo se aplica si el remito tiene marcada la condición del mismo nombre,
+# sobre las direcciones ("direcciones") o sobre direcciones más bultos ("base").
+# La tabla se compila una sola vez en una línea de tiempo por cliente; cotizar un
+# remito es una búsqueda binaria y recotizar el libro entero es una sola pasada
+# vectorizada. El formulario, el PDF, los lotes y el libro cotizan con la misma tabla.
+
+ARCHIVO_TARIFAS = os.getenv('REMITOS_TARIFAS', 'tarifas.json')
+
+# Condiciones del remito que pueden llevar recargo
+CONDICIONES = ('lluvia', 'exclusividad')
+
+# Tarifas que rigen si no hay archivo: bulto a $2500 y 50% por exclusividad y por lluvia
+TARIFAS_BASE = {
+    'recargos': [
+        {'nombre': 'exclusividad', 'etiqueta': 'Exclusividad', 'sobre': 'base'},
+        {'nombre': 'lluvia', 'etiqueta': 'Lluvia', 'sobre': 'base'},
+    ],
+    'vigencias': [
+        {'desde': '2000-01-01', 'bulto': '2500', 'porcentajes': {'exclusividad': 50, 'lluvia': 50}},
+    ],
+    'clientes': {},
+}
+
+
+@dataclass(slots=True, frozen=True)
+class Recargo:
+    nombre: str
+    etiqueta: str
+    porcentaje: int
+    sobre: str
+
+
+@dataclass(slots=True, frozen=True)
+class Tarifa:
+    desde: object
+    centavos_bulto: int
+    recargos: tuple
+
+
+@dataclass(slots=True, frozen=True)
+class Cotizacion:
+    tarifa: Tarifa
+    subtotal_centavos: int
+    bultos_centavos: int
+    recargos: tuple
+    total_centavos: int
+
+    # Direcciones más bultos: la base de los recargos que van "sobre": "base"
+    @property
+    def base_centavos(self):
+        return self.subtotal_centavos + self.bultos_centavos
+
+    # Función para obtener el importe de un recargo (0 si no se aplicó)
+    def recargo(self, nombre):
+        return next((centavos for recargo, centavos in self.recargos if recargo.nombre == nombre), 0)
+
+
+# Función para normalizar el nombre del cliente al buscar sus excepciones
+def clave_cliente(cliente):
+    return (cliente or '').strip().lower()
+
+
+def _porcentaje_entero(valor, nombre):
+    if isinstance(valor, bool) or not isinstance(valor, int) or valor < 0:
+        raise ValueError(f"El porcentaje de {nombre} tiene que ser un entero no negativo: {valor}")
+    return valor
+
+
+class TablaTarifas:
+    def __init__(self, definicion):
+        self.reglas = []
+        for regla in definicion.get('recargos', TARIFAS_BASE['recargos']):
+            if regla['nombre'] not in CONDICIONES:
+                raise ValueError(f"El recargo {regla['nombre']} no corresponde a ninguna condición del remito")
+            if regla.get('sobre', 'base') not in ('base', 'direcciones'):
+                raise ValueError(f"El recargo {regla['nombre']} tiene que ir sobre 'base' o 'direcciones'")
+            self.reglas.append((regla['nombre'], regla.get('etiqueta', regla['nombre'].capitalize()), regla.get('sobre', 'base')))
+
+        vigencias = definicion.get('vigencias') or []
+        if not vigencias:
+            raise ValueError("La tabla de tarifas no tiene vigencias")
+        self._general = self._compilar(vigencias, [])
+        self._clientes = {clave_cliente(cliente): self._compilar(vigencias, excepciones)
+                          for cliente, excepciones in (definicion.get('clientes') or {}).items()}
+
+    # Función para armar la línea de tiempo de tarifas: en cada fecha de cambio, la vigencia general
+    # con la excepción del cliente que rija ese día encima (la excepción más nueva reemplaza a las anteriores)
+    def _compilar(self, vigencias, excepciones):
+        vigencias = sorted(((a_fecha(v['desde']), v) for v in vigencias), key=lambda par: par[0])
+        excepciones = sorted(((a_fecha(e['desde']), e) for e in excepciones), key=lambda par: par[0])
+        inicio = vigencias[0][0]
+        fechas = sorted({desde for desde, _ in vigencias} | {desde for desde, _ in excepciones if desde >= inicio})
+
+        tarifas = []
+        for fecha in fechas:
+            vigencia = [v for desde, v in vigencias if desde <= fecha][-1]
+            excepcion = ([e for desde, e in excepciones if desde <= fecha] or [{}])[-1]
+            porcentajes = dict(vigencia.get('porcentajes') or {}, **(excepcion.get('porcentajes') or {}))
+            recargos = tuple(Recargo(nombre, etiqueta, _porcentaje_entero(porcentajes[nombre], nombre), sobre)
+                             for nombre, etiqueta, sobre in self.reglas if porcentajes.get(nombre))
+            tarifas.append(Tarifa(fecha, a_centavos(excepcion.get('bulto', vigencia.get('bulto', 0))), recargos))
+        return fechas, tarifas
+
+    # Función para obtener la tarifa que rige para un cliente en una fecha
+    def tarifa(self, fecha, cliente=''):
+        fechas, tarifas = self._clientes.get(clave_cliente(cliente), self._general)
+        fecha = a_fecha(fecha)
+        indice = bisect.bisect_right(fechas, fecha) - 1
+        if indice < 0:
+            raise ValueError(f"No hay tarifa vigente el {fecha}")
+        return tarifas[indice]
+
+    # Función para cotizar un remito (cualquier objeto con fecha, cliente, items, cantidad_bultos y las condiciones)
+    def cotizar(self, remito):
+        tarifa = self.tarifa(remito.fecha, remito.cliente)
+        subtotal = sum(item.centavos for item in remito.items)
+        bultos = tarifa.centavos_bulto * remito.cantidad_bultos
+        bases = {'direcciones': subtotal, 'base': subtotal + bultos}
+        aplicados = tuple((recargo, porcentaje(bases[recargo.sobre], recargo.porcentaje))
+                          for recargo in tarifa.recargos if getattr(remito, recargo.nombre))
+        return Cotizacion(tarifa, subtotal, bultos, aplicados, subtotal + bultos + sum(centavos for _, centavos in aplicados))
+
+    # Función para recotizar de una vez los remitos del libro (tablas de Arrow 'remitos' e 'items').
+    # Devuelve una tabla con el total registrado y el recotizado, en centavos, y la tarifa aplicada.
+    def recotizar(self, remitos, items):
+        import numpy as np
+        import pyarrow as pa
+        import pyarrow.compute as pc
+
+        def centavos(columna):
+            return pc.cast(pc.multiply(columna, 100), pa.int64())
+
+        subtotales = pa.table({'numero': items['numero'], 'subtotal': centavos(items['monto'])})
+        subtotales = subtotales.group_by('numero').aggregate([('subtotal', 'sum')])
+        tabla = remitos.join(subtotales, 'numero', join_type='left outer').sort_by('numero').combine_chunks()
+
+        dias = tabla['fecha'].cast(pa.int32()).to_numpy()
+        subtotal = pc.fill_null(tabla['subtotal_sum'], 0).to_numpy()
+        cantidad_bultos = pc.fill_null(tabla['cantidad_bultos'], 0).to_numpy().astype(np.int64)
+        condiciones = {nombre: pc.fill_null(tabla[nombre], False).to_numpy(zero_copy_only=False) for nombre in CONDICIONES}
+
+        # Cada fila toma la tarifa de su fecha; los clientes con excepciones se resuelven aparte con su línea de tiempo
+        filas = tabla.num_rows
+        desde = np.zeros(filas, np.int32)
+        centavos_bulto = np.zeros(filas, np.int64)
+        porcentajes = {nombre: np.zeros(filas, np.int64) for nombre, _, _ in self.reglas}
+        claves = pc.utf8_lower(pc.utf8_trim_whitespace(pc.fill_null(tabla['cliente'], ''))) if self._clientes else None
+        lineas = [(None, self._general)] + list(self._clientes.items())
+        for clave, (fechas, tarifas) in lineas:
+            if clave is None:
+                mascara = np.ones(filas, bool)
+            else:
+                mascara = pc.equal(claves, clave).to_numpy(zero_copy_only=False)
+                if not mascara.any():
+                    continue
+            dias_linea = pa.array(fechas, pa.date32()).cast(pa.int32()).to_numpy()
+            indices = np.searchsorted(dias_linea, dias[mascara], side='right') - 1
+            if (indices < 0).any():
+                raise ValueError(f"Hay {(indices < 0).sum()} remitos anteriores a la primera tarifa vigente")
+            desde[mascara] = dias_linea[indices]
+            centavos_bulto[mascara] = np.array([tarifa.centavos_bulto for tarifa in tarifas], np.int64)[indices]
+            for nombre in porcentajes:
+                tasas = np.array([next((r.porcentaje for r in tarifa.recargos if r.nombre == nombre), 0) for tarifa in tarifas], np.int64)
+                porcentajes[nombre][mascara] = tasas[indices]
+
+        bultos = centavos_bulto * cantidad_bultos
+        base = subtotal + bultos
+        total = base.copy()
+        for nombre, _, sobre in self.reglas:
+            sobre_que = subtotal if sobre == 'direcciones' else base
+            total += np.where(condiciones[nombre], (sobre_que * porcentajes[nombre] + 50) // 100, 0)
+
+        registrado = centavos(tabla['total'])
+        return pa.table({
+            'numero': tabla['numero'],
+            'fecha': tabla['fecha'],
+            'cliente': tabla['cliente'],
+            'tarifa_desde': pa.array(desde, pa.int32()).cast(pa.date32()),
+            'total_centavos': registrado,
+            'recotizado_centavos': pa.array(total, pa.int64()),
+            'diferencia_centavos': pc.subtract(pa.array(total, pa.int64()), registrado),
+        })
+
+
+# Función para leer una tabla de tarifas de un archivo JSON (la tabla base si el archivo no existe)
+def cargar_tarifas(ruta=ARCHIVO_TARIFAS):
+    if not ruta or not os.path.exists(ruta):
+        return TablaTarifas(TARIFAS_BASE)
+    with open(ruta, 'r', encoding='utf-8') as file:
+        return TablaTarifas(json.load(file))
+
+
+# Una tabla compilada por archivo, compartida por todo el proceso (un cambio de tarifas requiere reiniciar)
+_tarifas = {}
+_tarifas_lock = threading.Lock()
+
+
+# Función para obtener la tabla de tarifas del proceso
+def obtener_tarifas(ruta=ARCHIVO_TARIFAS):
+    with _tarifas_lock:
+        if ruta not in _tarifas:
+            _tarifas[ruta] = cargar_tarifas(ruta)
+        return _tarifas[ruta]
+
+
+if __name__ == '__main__':
+    import pyarrow.compute as pc
+
+    parser = argparse.ArgumentParser(description="Consulta las tarifas y recotiza el libro de remitos.")
+    parser.add_argument('--tarifas', default=ARCHIVO_TARIFAS, help="Archivo JSON de tarifas")
+    subcomandos = parser.add_subparsers(dest='comando', required=True)
+    ver = subcomandos.add_parser('ver', help="Muestra la tarifa vigente para una fecha y un cliente")
+    ver.add_argument('fecha')
+    ver.add_argument('--cliente', default='')
+    recotizar = subcomandos.add_parser('recotizar', help="Recotiza los remitos del libro y compara con lo registrado")
+    recotizar.add_argument('--libro', default=None, help="Carpeta del libro en Parquet o URL de la base SQL")
+    recotizar.add_argument('--desde', default=None)
+    recotizar.add_argument('--hasta', default=None)
+    recotizar.add_argument('--por-cliente', action='store_true', help="Muestra la diferencia por cliente")
+    recotizar.add_argument('--salida', default=None, help="CSV con el detalle por remito")
+    args = parser.parse_args()
+
+    tabla_tarifas = cargar_tarifas(args.tarifas)
+    if args.comando == 'ver':
+        tarifa = tabla_tarifas.tarifa(args.fecha, args.cliente)
+        print(f"Vigente desde {tarifa.desde}: bulto ${a_pesos(tarifa.centavos_bulto)}")
+        for recargo in tarifa.recargos:
+            print(f"  {recargo.etiqueta}: {recargo.porcentaje}% sobre {recargo.sobre}")
+    else:
+        from libro_sql import URL_SQL, obtener_libro
+
+        libro = obtener_libro(args.libro or URL_SQL)
+        remitos = libro.leer(args.desde, args.hasta)
+        items = libro.leer(args.desde, args.hasta, tabla='items', columnas=['numero', 'monto'])
+        inicio = time.perf_counter()
+        resultado = tabla_tarifas.recotizar(remitos, items)
+        milisegundos = (time.perf_counter() - inicio) * 1000
+
+        registrado = pc.sum(resultado['total_centavos']).as_py() or 0
+        recotizado = pc.sum(resultado['recotizado_centavos']).as_py() or 0
+        cambiados = pc.sum(pc.not_equal(resultado['diferencia_centavos'], 0)).as_py() or 0
+        print(f"{resultado.num_rows} remitos recotizados en {milisegundos:.1f} ms, {cambiados} cambian de importe")
+        print(f"Registrado ${a_pesos(registrado)}, recotizado ${a_pesos(recotizado)}, diferencia ${a_pesos(recotizado - registrado)}")
+        if args.por_cliente:
+            por_cliente = resultado.group_by('cliente').aggregate([('total_centavos', 'sum'), ('diferencia_centavos', 'sum')])
+            por_cliente = por_cliente.sort_by([('diferencia_centavos_sum', 'descending')])
+            for fila in por_cliente.to_pylist():
+                print(f"  {fila['cliente']}: ${a_pesos(fila['total_centavos_sum'])} -> diferencia ${a_pesos(fila['diferencia_centavos_sum'])}")
+        if args.salida:
+            import pyarrow.csv as pa_csv
+
+            pa_csv.write_csv(resultado, args.salida)
+            print(f"Detalle en {args.salida}")
@@ -0,0 +1,31 @@
+import os
+import sys
+
+import pytest
+
+# Los módulos de la app están en la raíz del repositorio, sin paquete
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from github_falso import ServidorGithubFalso  # noqa: E402
+
+
+# Servidor de GitHub falso, uno por prueba; cada prueba corre en su propia carpeta
+@pytest.fixture
+def servidor(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    with ServidorGithubFalso() as servidor:
+        yield servidor
+
+
+# Función para conectarse al repositorio del servidor falso (sin los reintentos ni las pausas de PyGithub,
+# para que cada falla llegue a quien hace la llamada)
+@pytest.fixture
+def obtener_repo(servidor):
+    from github import Auth, Github
+
+    def obtener():
+        cliente = Github(auth=Auth.Token('token'), base_url=servidor.url, retry=None,
+                         seconds_between_requests=None, seconds_between_writes=None)
+        return cliente.get_repo(f"{servidor.owner}/{servidor.repo}")
+
+    return obtener
@@ -0,0 +1,54 @@
+import time
+
+from bandeja_salida import BandejaSalida
+
+
+def _meta(bandeja, path):
+    return next(meta for meta in bandeja._pendientes() if meta['path'] == path)
+
+
+def test_reintenta_con_espera_creciente_hasta_subir(servidor, obtener_repo, tmp_path):
+    bandeja = BandejaSalida(obtener_repo, carpeta=str(tmp_path / 'bandeja'), espera_inicial=0.05, espera_maxima=1.0)
+    bandeja.agregar('registros/a.json', b'{"numero": 1}')
+
+    servidor.fallar_proximas(1)
+    assert bandeja.procesar_pendientes() == 0
+    primera = _meta(bandeja, 'registros/a.json')
+    assert primera['intentos'] == 1
+    assert '502' in primera['error']
+    assert bandeja.estado()['reintentando'] == 1
+
+    # Antes de que venza la espera no se vuelve a llamar a GitHub
+    llamadas = len(servidor.llamadas)
+    assert bandeja.procesar_pendientes() == 0
+    assert len(servidor.llamadas) == llamadas
+
+    time.sleep(primera['proximo_intento'] - time.time() + 0.01)
+    servidor.fallar_proximas(1)
+    inicio = time.time()
+    assert bandeja.procesar_pendientes() == 0
+    segunda = _meta(bandeja, 'registros/a.json')
+    assert segunda['intentos'] == 2
+    # La espera se duplica en cada falla (con ±20 % de variación)
+    assert segunda['proximo_intento'] - inicio > 0.05 * 1.2
+
+    time.sleep(segunda['proximo_intento'] - time.time() + 0.01)
+    assert bandeja.procesar_pendientes() == 1
+    assert servidor.archivos['registros/a.json'] == b'{"numero": 1}'
+    assert bandeja.cantidad_pendiente() == 0
+    assert bandeja.ultimo_error is None
+
+
+def test_los_anexos_se_suben_una_sola_vez_despues_de_una_falla(servidor, obtener_repo, tmp_path):
+    servidor.escribir('indice_remitos/2026-10.jsonl', b'{"numero":1}\n')
+    bandeja = BandejaSalida(obtener_repo, carpeta=str(tmp_path / 'bandeja'), espera_inicial=0.01)
+    bandeja.agregar_varios([], "Remito 2", anexos=[('indice_remitos/2026-10.jsonl', b'{"numero":2}\n')])
+
+    servidor.fallar_proximas(1)
+    assert bandeja.procesar_pendientes() == 0
+    # Mientras tanto se encola otra línea para el mismo índice: se acumula sobre la pendiente
+    bandeja.agregar_varios([], "Remito 3", anexos=[('indice_remitos/2026-10.jsonl', b'{"numero":3}\n')])
+    time.sleep(0.05)
+
+    assert bandeja.procesar_pendientes() == 1
+    assert servidor.archivos['indice_remitos/2026-10.jsonl'] == b'{"numero":1}\n{"numero":2}\n{"numero":3}\n'
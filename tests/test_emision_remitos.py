@@ -0,0 +1,126 @@
+import json
+import time
+
+import pytest
+
+import numeracion_remitos
+from bandeja_salida import BandejaSalida
+from busqueda_remitos import IndiceBusqueda
+from emision_remitos import EmisorRemitos
+from indice_remitos import ruta_indice
+from libro_columnar import LibroRemitos
+from modelo_remito import ItemRemito, Remito
+from numeracion_remitos import NUMERO_INICIAL, AlmacenGithub, Numerador
+from registro_remito import ruta_registro
+
+FECHA = '2026-10-18'
+
+
+@pytest.fixture(autouse=True)
+def sin_esperas(monkeypatch):
+    monkeypatch.setattr(numeracion_remitos.time, 'sleep', lambda segundos: None)
+
+
+@pytest.fixture
+def bandeja(obtener_repo, tmp_path):
+    return BandejaSalida(obtener_repo, carpeta=str(tmp_path / 'bandeja'), espera_inicial=0.01, espera_maxima=0.05)
+
+
+@pytest.fixture
+def emisor(obtener_repo, bandeja, tmp_path):
+    numerador = Numerador(AlmacenGithub(obtener_repo), 5)
+    return EmisorRemitos(numerador, LibroRemitos(str(tmp_path / 'libro')), IndiceBusqueda(str(tmp_path / 'busqueda.db')), bandeja)
+
+
+def remito(cliente):
+    return Remito(0, FECHA, cliente, 'Domicilio', 'Sector', 'Solicitante', 'Moto', (ItemRemito('Envío', 100),))
+
+
+def numeros_en_libro(emisor):
+    return sorted(emisor.libro.leer()['numero'].to_pylist())
+
+
+# Función para subir lo que quedó en la bandeja, esperando a que venzan los reintentos
+def subir_todo(bandeja, limite=2.0):
+    hasta = time.monotonic() + limite
+    while bandeja.cantidad_pendiente() and time.monotonic() < hasta:
+        bandeja.procesar_pendientes()
+        time.sleep(0.01)
+    assert bandeja.cantidad_pendiente() == 0
+
+
+def test_emite_y_publica_registro_e_indice(servidor, emisor, bandeja):
+    [(emitido, registro_bytes, linea, repetido)] = emisor.emitir([remito('Cliente')])
+    subir_todo(bandeja)
+
+    assert emitido.numero == NUMERO_INICIAL and not repetido
+    assert servidor.archivos[ruta_registro(emitido.numero, FECHA)] == registro_bytes
+    indice = [json.loads(fila) for fila in servidor.archivos[ruta_indice(FECHA)].splitlines()]
+    assert [fila['numero'] for fila in indice] == [emitido.numero]
+    assert linea['path'] == ruta_registro(emitido.numero, FECHA)
+    assert numeros_en_libro(emisor) == [emitido.numero]
+    assert emisor.busqueda.cantidad() == 1
+
+
+def test_si_no_se_puede_encolar_el_numero_vuelve_al_bloque(servidor, emisor, bandeja, monkeypatch):
+    def sin_disco(*args, **kwargs):
+        raise OSError("Disco lleno")
+
+    monkeypatch.setattr(bandeja, 'agregar_varios', sin_disco)
+    with pytest.raises(OSError):
+        emisor.emitir([remito('Cliente')])
+    assert emisor.libro.meses() == []
+    monkeypatch.undo()
+
+    [(emitido, _, _, _)] = emisor.emitir([remito('Cliente')])
+    assert emitido.numero == NUMERO_INICIAL
+
+
+def test_una_falla_de_github_queda_en_la_bandeja(servidor, emisor, bandeja):
+    [(emitido, _, _, _)] = emisor.emitir([remito('Cliente')])
+
+    servidor.fallar_proximas(3)
+    assert bandeja.procesar_pendientes() == 0
+    assert ruta_registro(emitido.numero, FECHA) in bandeja.paths_pendientes()
+    assert bandeja.ultimo_error is not None
+    # El remito ya está emitido aunque todavía no se haya subido
+    assert numeros_en_libro(emisor) == [emitido.numero]
+
+    subir_todo(bandeja)
+    assert ruta_registro(emitido.numero, FECHA) in servidor.archivos
+
+
+def test_si_falla_el_libro_el_remito_igual_se_emite(servidor, emisor, bandeja, monkeypatch):
+    agregar = emisor.libro.agregar
+
+    def falla_una_vez(registros):
+        monkeypatch.setattr(emisor.libro, 'agregar', agregar)
+        raise OSError("Libro bloqueado")
+
+    monkeypatch.setattr(emisor.libro, 'agregar', falla_una_vez)
+    [(primero, _, _, _)] = emisor.emitir([remito('Primero')])
+    assert 'Libro bloqueado' in emisor.error_guardado
+    assert emisor.libro.meses() == []
+    subir_todo(bandeja)
+    assert ruta_registro(primero.numero, FECHA) in servidor.archivos
+
+    # La próxima emisión guarda también el que quedó pendiente
+    [(segundo, _, _, _)] = emisor.emitir([remito('Segundo')])
+    assert emisor.error_guardado is None
+    assert numeros_en_libro(emisor) == [primero.numero, segundo.numero]
+    assert emisor.busqueda.cantidad() == 2
+
+
+def test_la_misma_clave_devuelve_el_mismo_remito(servidor, emisor, bandeja):
+    [(primero, registro_bytes, _, repetido)] = emisor.emitir([remito('Cliente')], claves=['envio-1'])
+    [(otra_vez, mismo_bytes, _, repetido_otra_vez)] = emisor.emitir([remito('Cliente')], claves=['envio-1'])
+    [(sin_clave, _, _, _)] = emisor.emitir([remito('Cliente')])
+
+    assert not repetido and repetido_otra_vez
+    assert (otra_vez.numero, mismo_bytes) == (primero.numero, registro_bytes)
+    assert sin_clave.numero == primero.numero + 1
+    with pytest.raises(ValueError):
+        emisor.emitir([remito('Otro cliente')], claves=['envio-1'])
+
+    subir_todo(bandeja)
+    assert numeros_en_libro(emisor) == [primero.numero, sin_clave.numero]
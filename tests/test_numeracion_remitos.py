@@ -0,0 +1,71 @@
+import json
+
+import pytest
+
+import numeracion_remitos
+from numeracion_remitos import NUMERO_INICIAL, AlmacenGithub, ConflictoNumeracion, Numerador, _serializar
+
+
+@pytest.fixture(autouse=True)
+def sin_esperas(monkeypatch):
+    monkeypatch.setattr(numeracion_remitos.time, 'sleep', lambda segundos: None)
+
+
+# Función para que otro despachador reserve números justo después de cada lectura del almacén
+def _adelantar_despues_de_leer(monkeypatch, servidor, almacen, veces):
+    leer = almacen.leer
+    pendientes = [veces]
+
+    def leer_y_adelantar():
+        estado, version = leer()
+        if pendientes[0]:
+            pendientes[0] -= 1
+            ajeno = dict(estado, siguiente=estado['siguiente'] + 20)
+            servidor.escribir(almacen.path, _serializar(ajeno), "Reserva de otro despachador")
+        return estado, version
+
+    monkeypatch.setattr(almacen, 'leer', leer_y_adelantar)
+
+
+def _estado(servidor, almacen):
+    return json.loads(servidor.archivos[almacen.path])
+
+
+def test_reserva_bloques_sin_repetir(servidor, obtener_repo):
+    almacen = AlmacenGithub(obtener_repo)
+    primero, segundo = Numerador(almacen, 5), Numerador(AlmacenGithub(obtener_repo), 5)
+
+    assert primero.siguientes(2) == [NUMERO_INICIAL, NUMERO_INICIAL + 1]
+    assert segundo.siguiente() == NUMERO_INICIAL + 5
+    primero.liberar()
+    assert _estado(servidor, almacen)['devueltos'] == [NUMERO_INICIAL + 2, NUMERO_INICIAL + 3, NUMERO_INICIAL + 4]
+
+
+def test_relee_y_reintenta_si_otro_cambio_el_archivo(servidor, obtener_repo, monkeypatch):
+    almacen = AlmacenGithub(obtener_repo)
+    Numerador(almacen, 5).reservar(1)
+    _adelantar_despues_de_leer(monkeypatch, servidor, almacen, 1)
+
+    assert Numerador(almacen, 5).reservar(5) == list(range(NUMERO_INICIAL + 21, NUMERO_INICIAL + 26))
+    assert _estado(servidor, almacen)['siguiente'] == NUMERO_INICIAL + 26
+
+
+def test_se_rinde_despues_de_los_reintentos(servidor, obtener_repo, monkeypatch):
+    almacen = AlmacenGithub(obtener_repo)
+    Numerador(almacen, 5).reservar(1)
+    _adelantar_despues_de_leer(monkeypatch, servidor, almacen, 3)
+
+    with pytest.raises(ConflictoNumeracion):
+        Numerador(almacen, 5, reintentos=3).reservar(5)
+    assert _estado(servidor, almacen)['siguiente'] == NUMERO_INICIAL + 61
+
+
+def test_una_falla_del_servidor_no_consume_numeros(servidor, obtener_repo):
+    from github import GithubException
+
+    almacen = AlmacenGithub(obtener_repo)
+    numerador = Numerador(almacen, 5)
+    servidor.fallar_proximas(1)
+    with pytest.raises(GithubException):
+        numerador.siguiente()
+    assert numerador.siguiente() == NUMERO_INICIAL
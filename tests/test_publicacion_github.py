@@ -0,0 +1,56 @@
+import pytest
+
+import publicacion_github
+from publicacion_github import ConflictoPublicacion, PublicadorCommits
+
+
+def _patches(servidor):
+    return sum(1 for metodo, path in servidor.llamadas if metodo == 'PATCH' and '/git/refs/' in path)
+
+
+@pytest.fixture(autouse=True)
+def sin_esperas(monkeypatch):
+    monkeypatch.setattr(publicacion_github.time, 'sleep', lambda segundos: None)
+
+
+def test_reintenta_cuando_la_rama_avanzo(servidor, obtener_repo):
+    publicador = PublicadorCommits(obtener_repo())
+    publicador.publicar({'registros/a.json': b'a'}, "Remito a")
+
+    # Otro operador publica: el commit propio ya no es la punta y el PATCH no es fast-forward
+    servidor.escribir('externo.txt', b'externo')
+    patches = _patches(servidor)
+    sha = publicador.publicar({'registros/b.json': b'b'}, "Remito b")
+
+    assert _patches(servidor) - patches == 2
+    assert servidor.head == sha
+    assert servidor.archivos['externo.txt'] == b'externo'
+    assert servidor.archivos['registros/a.json'] == b'a'
+    assert servidor.archivos['registros/b.json'] == b'b'
+
+
+def test_el_anexo_se_agrega_sobre_lo_que_escribio_otro(servidor, obtener_repo):
+    publicador = PublicadorCommits(obtener_repo())
+    publicador.publicar({}, "Índice", anexos={'indice.jsonl': b'1\n'})
+
+    servidor.escribir('indice.jsonl', b'1\n2\n')
+    publicador.publicar({}, "Índice", anexos={'indice.jsonl': b'3\n'})
+
+    assert servidor.archivos['indice.jsonl'] == b'1\n2\n3\n'
+
+
+def test_se_rinde_si_la_rama_siempre_avanza(servidor, obtener_repo, monkeypatch):
+    publicador = PublicadorCommits(obtener_repo(), reintentos=3)
+    crear_commit = publicador.repo.create_git_commit
+
+    # Entre el commit propio y el PATCH siempre se cuela otro
+    def crear_y_adelantar(*args, **kwargs):
+        commit = crear_commit(*args, **kwargs)
+        servidor.escribir('externo.txt', str(len(servidor.llamadas)).encode())
+        return commit
+
+    monkeypatch.setattr(publicador.repo, 'create_git_commit', crear_y_adelantar)
+    with pytest.raises(ConflictoPublicacion):
+        publicador.publicar({'registros/a.json': b'a'}, "Remito a")
+    assert _patches(servidor) == 3
+    assert 'registros/a.json' not in servidor.archivos